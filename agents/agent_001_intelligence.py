@@ -1,11 +1,14 @@
 import streamlit as st
-import requests
-import json
 import pandas as pd
 import os
+import sys
 from newsapi import NewsApiClient
 from datetime import datetime, timedelta
-import re
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from news_analyst import stream_articles
+from http_client import get_session
+import keyword_matcher
 
 # ตั้งค่าหน้าเว็บ
 st.set_page_config(page_title="Gold AI Specialist v2.5", page_icon="💰", layout="wide")
@@ -23,137 +26,167 @@ NEWS_API_KEY = "0a47175d76d1481596c418e474739272"
 OUTPUT_FILE = "data/news_intelligence.csv"
 if not os.path.exists("data"): os.makedirs("data")
 
+# ข่าวจาก NewsAPI ใช้ซ้ำได้กี่วินาทีก่อนดึงใหม่ (กด 🔄 เพื่อดึงใหม่ทันที)
+NEWS_CACHE_TTL = 15 * 60
+
+# คำค้นที่ส่งให้ NewsAPI และ watchlist ที่ใช้กรองผลซ้ำ (ชุดเดียวกับ app.py ทั้งสองหน้า)
+KEYWORDS = [
+    "Gold Price impact Trump",
+    "Trump Greenland",
+    "Trump 10 percent tariff",
+    "Trump trade war",
+    "Federal Reserve interest rate"
+]
+WATCHLIST_NAME = "gold_news"
+
 # ==============================================================================
 # ฟังก์ชันการทำงาน
 # ==============================================================================
 
+@st.cache_resource
+def get_newsapi():
+    # สร้าง client ครั้งเดียวต่อโปรเซส ไม่ต้องสร้างใหม่ทุกครั้งที่หน้าเว็บ rerun
+    return NewsApiClient(api_key=NEWS_API_KEY, session=get_session())
+
+@st.cache_data(ttl=NEWS_CACHE_TTL, show_spinner=False)
+def fetch_articles(query_text, from_date, page_size):
+    all_articles = get_newsapi().get_everything(
+        q=query_text,
+        from_param=from_date,
+        language='en',
+        sort_by='publishedAt',
+        page_size=page_size
+    )
+    return all_articles.get('articles', [])
+
 def get_detailed_analysis(news_list):
     # เปลี่ยนมาใช้โมเดลล่าสุด Gemini 2.5 Flash
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-    headers = {'Content-Type': 'application/json'}
-    
-    news_input = ""
-    for i, n in enumerate(news_list):
-        news_input += f"ข่าวที่ {i+1} [เวลา: {n['publishedAt']}]: {n['title']} - {n['description']}\n\n"
-
-    prompt = f"""
-    ในฐานะนักกลยุทธ์ทองคำ วิเคราะห์ข่าวต่อไปนี้ โดยเน้นนโยบาย Trump (Tariff/Greenland)
-    และตอบในรูปแบบ JSON ภาษาไทยเท่านั้น:
-    {news_input}
-    
-    รูปแบบที่ต้องการ:
-    {{
-        "individual_news": [
-            {{
-                "title": "หัวข้อข่าวภาษาไทย",
-                "summary": "สรุปเนื้อหาสำคัญสั้นๆ",
-                "weight": 0-100
-            }}
-        ],
-        "overall_sentiment_score": 0-100,
-        "overall_summary": "สรุปสภาวะตลาด",
-        "action_plan": "คำแนะนำการลงทุน"
-    }}
-    """
-    
-    data = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "safetySettings": [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-        ]
-    }
-    
+    # ข่าวที่เคยวิเคราะห์แล้วดึงผลจาก cache ในเครื่อง ส่งเฉพาะข่าวใหม่ไปให้ Gemini
+    # คืน generator: ผลรายข่าวทยอยมาทีละข่าว แล้วปิดท้ายด้วยภาพรวม
+    return stream_articles(news_list, GEMINI_API_KEY, "gemini-2.5-flash")
+
+def render_news_card(news):
+    with st.container(border=True):
+        c1, c2 = st.columns([4, 1])
+        with c1:
+            st.write(f"**{news.get('title')}**")
+            st.write(news.get('summary'))
+        with c2:
+            weight = int(news.get('weight', 50))
+            st.subheader(f"{weight}")
+            if weight >= 60: st.write("🟢 Bullish")
+            elif weight <= 40: st.write("🔴 Bearish")
+            else: st.write("🟡 Neutral")
+
+def overview_slots():
+    # จองที่ของภาพรวมไว้ก่อน แล้วค่อยเติมค่าเมื่อได้ผล
+    st.divider()
+    col_a, col_b = st.columns([1, 2])
+    with col_a:
+        score_box = st.empty()
+    with col_b:
+        summary_box = st.empty()
+        plan_box = st.empty()
+    return score_box, summary_box, plan_box
+
+def fill_overview(slots, analysis):
+    score_box, summary_box, plan_box = slots
+    score_box.metric("Overall Score", f"{analysis.get('overall_sentiment_score')}/100")
+    summary_box.info(f"**วิเคราะห์ภาพรวม:** {analysis.get('overall_summary')}")
+    plan_box.success(f"**กลยุทธ์แนะนำ:** {analysis.get('action_plan')}")
+
+@st.fragment
+def show_news_cards(items):
+    # เปลี่ยนตัวกรอง -> rerun เฉพาะส่วนการ์ดนี้ ไม่แตะส่วนอื่นของหน้า
+    view = st.radio("แสดงข่าว", ["ทั้งหมด", "🟢 Bullish", "🔴 Bearish", "🟡 Neutral"], horizontal=True)
+    if view == "🟢 Bullish":
+        items = [n for n in items if n.get('weight', 50) >= 60]
+    elif view == "🔴 Bearish":
+        items = [n for n in items if n.get('weight', 50) <= 40]
+    elif view == "🟡 Neutral":
+        items = [n for n in items if 40 < n.get('weight', 50) < 60]
+    for news in items:
+        render_news_card(news)
+
+def run_analysis(articles):
+    # การ์ดรายข่าวโผล่ทันทีที่แต่ละข่าววิเคราะห์เสร็จ ภาพรวมเติมทีหลังสุด
+    slots = overview_slots()
+    slots[0].metric("Overall Score", "...")
+    slots[1].info("**วิเคราะห์ภาพรวม:** ⏳ กำลังรอผลรายข่าว...")
+    st.subheader("📰 รายงานการวิเคราะห์รายข่าว")
+
+    items, analysis = {}, None
     try:
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code == 200:
-            res_data = response.json()
-            return res_data['candidates'][0]['content']['parts'][0]['text']
-        return None
+        for kind, payload in get_detailed_analysis(articles):
+            if kind == "item":
+                idx, news = payload
+                items[idx] = news
+                render_news_card(news)
+            else:
+                analysis = payload
     except Exception as e:
         st.error(f"AI Error: {e}")
-        return None
 
-def clean_json_text(text):
-    if not text: return None
-    text = re.sub(r'```json\s*', '', text)
-    text = re.sub(r'```', '', text)
-    return text.strip()
+    if not analysis:
+        return
+    # --- แสดงผลหน้าเว็บ ---
+    fill_overview(slots, analysis)
+    if analysis.get('failed_articles'):
+        st.warning(f"⚠️ วิเคราะห์ไม่สำเร็จ {len(analysis['failed_articles'])} จาก {len(articles)} ข่าว "
+                   f"(คะแนนรวมคิดจากข่าวที่เหลือ): {analysis.get('error')}")
+
+    # --- 💾 ส่วนบันทึกลง CSV เพื่อ Mega Project ---
+    ordered = [items[i] for i in sorted(items)]
+    rows = []
+    for news in ordered:
+        rows.append({
+            "Date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "Title": news.get('title'),
+            "Summary": news.get('summary'),
+            "Weight": news.get('weight'),
+            "Overall_Score": analysis.get('overall_sentiment_score'),
+            "Action": analysis.get('action_plan')
+        })
+    
+    df = pd.DataFrame(rows)
+    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    st.toast("✅ บันทึกข้อมูลเข้า War Room เรียบร้อย!", icon="💾")
+
+    # เก็บผลไว้ใน session: กดปุ่ม/เลือกตัวกรองต่อจากนี้ก็แสดงผลเดิมได้โดยไม่ยิง API ใหม่
+    st.session_state["last_result"] = {
+        "at": datetime.now().strftime("%H:%M:%S"),
+        "items": ordered,
+        "analysis": analysis
+    }
 
 # ==============================================================================
 # ส่วนแสดงผล Dashboard
 # ==============================================================================
 
-if st.button("🚀 เริ่มการวิเคราะห์เชิงลึก (Gemini 2.5 Engine)", type="primary"):
+col_run, col_refresh = st.columns([3, 1])
+with col_run:
+    run_clicked = st.button("🚀 เริ่มการวิเคราะห์เชิงลึก (Gemini 2.5 Engine)", type="primary")
+with col_refresh:
+    refresh_clicked = st.button("🔄 ดึงข่าวใหม่")
+
+if refresh_clicked:
+    fetch_articles.clear()
+
+if run_clicked or refresh_clicked:
     with st.spinner('📡 กำลังดึงข้อมูลข่าวกรองล่าสุด...'):
-        newsapi = NewsApiClient(api_key=NEWS_API_KEY)
-        
-        keywords = [
-            "Gold Price impact Trump",
-            "Trump Greenland", 
-            "Trump 10 percent tariff", 
-            "Trump trade war",
-            "Federal Reserve interest rate"
-        ]
-        
-        query_text = " OR ".join([f'"{k}"' for k in keywords])
-        
-        all_articles = newsapi.get_everything(
-            q=query_text,
-            from_param=(datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d'),
-            language='en',
-            sort_by='publishedAt',
-            page_size=10
-        )
-        articles = all_articles.get('articles', [])
-
-        if articles:
-            raw_res = get_detailed_analysis(articles)
-            
-            if raw_res:
-                try:
-                    analysis = json.loads(clean_json_text(raw_res))
-                    
-                    # --- แสดงผลหน้าเว็บ ---
-                    st.divider()
-                    col_a, col_b = st.columns([1, 2])
-                    with col_a:
-                        st.metric("Overall Score", f"{analysis.get('overall_sentiment_score')}/100")
-                    with col_b:
-                        st.info(f"**วิเคราะห์ภาพรวม:** {analysis.get('overall_summary')}")
-                        st.success(f"**กลยุทธ์แนะนำ:** {analysis.get('action_plan')}")
-
-                    # --- 💾 ส่วนบันทึกลง CSV เพื่อ Mega Project ---
-                    rows = []
-                    for news in analysis.get('individual_news', []):
-                        rows.append({
-                            "Date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                            "Title": news.get('title'),
-                            "Summary": news.get('summary'),
-                            "Weight": news.get('weight'),
-                            "Overall_Score": analysis.get('overall_sentiment_score'),
-                            "Action": analysis.get('action_plan')
-                        })
-                    
-                    df = pd.DataFrame(rows)
-                    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
-                    st.toast("✅ บันทึกข้อมูลเข้า War Room เรียบร้อย!", icon="💾")
-
-                    st.subheader("📰 รายงานการวิเคราะห์รายข่าว")
-                    for news in analysis.get('individual_news', []):
-                        with st.container(border=True):
-                            c1, c2 = st.columns([4, 1])
-                            with c1:
-                                st.write(f"**{news.get('title')}**")
-                                st.write(news.get('summary'))
-                            with c2:
-                                weight = int(news.get('weight', 50))
-                                st.subheader(f"{weight}")
-                                if weight >= 60: st.write("🟢 Bullish")
-                                elif weight <= 40: st.write("🔴 Bearish")
-                                else: st.write("🟡 Neutral")
-
-                except Exception as e:
-                    st.error(f"การถอดรหัสข้อมูลผิดพลาด: {e}")
-        else:
-            st.warning("ไม่พบข่าวใหม่ในฐานข้อมูล")
\ No newline at end of file
+        query_text = " OR ".join([f'"{k}"' for k in KEYWORDS])
+        from_date = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
+        articles = fetch_articles(query_text, from_date, 10)
+        # ส่งให้ Gemini เฉพาะข่าวที่หัวข้อ/คำโปรยมีคำเฝ้าระวังจริง (ไม่เปลือง token กับข่าวหลุดหัวข้อ)
+        articles = keyword_matcher.filter_articles(WATCHLIST_NAME, articles, KEYWORDS)
+
+    if articles:
+        run_analysis(articles)
+    else:
+        st.warning("ไม่พบข่าวใหม่ในฐานข้อมูล")
+elif "last_result" in st.session_state:
+    result = st.session_state["last_result"]
+    st.caption(f"🕒 ผลวิเคราะห์ล่าสุดเมื่อ {result['at']} (กด 🔄 เพื่อดึงข่าวใหม่)")
+    fill_overview(overview_slots(), result["analysis"])
+    st.subheader("📰 รายงานการวิเคราะห์รายข่าว")
+    show_news_cards(result["items"])
\ No newline at end of file
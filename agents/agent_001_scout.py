@@ -1,11 +1,23 @@
-import feedparser
-import pandas as pd
 from datetime import datetime
 import os
+import sys
+import io
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit
+from history_store import append_records
+import http_client
+import metrics
+import seen_index
+import keyword_matcher
 
 # --- 1. ตั้งค่าเป้าหมาย (Mission Config) ---
-# คำค้นหาที่เราต้องการให้สายลับจับตาดู
+# คำค้นหาที่เราต้องการให้สายลับจับตาดู (ค่าตั้งต้น ถ้าไม่มี config/watchlist.json)
 KEYWORDS = ["Trump", "Greenland", "NATO", "Gold", "War", "Fed", "Russia", "BRICS"]
+WATCHLIST_NAME = "political_scout"
+AGENT_NAME = "agent_001_scout"  # ป้าย agent ใน metrics (ตรงกับชื่อโหนดใน orchestrator)
 
 # แหล่งข่าว (เราใช้ Google News RSS แบบเจาะจงข่าวโลก)
 RSS_FEEDS = [
@@ -18,26 +30,143 @@ RSS_FEEDS = [
 DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
 OUTPUT_FILE = "political_intelligence.csv"
 
+# ETag / Last-Modified และ id ข่าวที่เคยเห็นของแต่ละ feed (ใช้ข้ามการโหลด/แกะซ้ำ)
+FEED_STATE_FILE = os.path.join(DATA_FOLDER, 'cache', 'rss_feed_state.json')
+MAX_SEEN_PER_FEED = 300
+
+# ดัชนี hash ของข่าวที่บันทึกลง CSV แล้ว (กันบันทึกข่าวเดิมซ้ำทุกรอบที่รัน)
+SEEN_INDEX_FILE = os.path.join(DATA_FOLDER, 'cache', 'political_seen.idx')
+
+def load_feed_state():
+    if os.path.exists(FEED_STATE_FILE):
+        try:
+            with open(FEED_STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def save_feed_state(state):
+    os.makedirs(os.path.dirname(FEED_STATE_FILE), exist_ok=True)
+    with open(FEED_STATE_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(FEED_STATE_FILE + '.tmp', FEED_STATE_FILE)
+
+def iter_rss_items(content):
+    # แกะ RSS ทีละ <item> แบบ streaming: ผู้เรียก break เมื่อไหร่ก็หยุดแกะส่วนที่เหลือทันที
+    # คืน (ชื่อ feed, item) ; ชื่อ feed อยู่ก่อน item แรกเสมอใน RSS 2.0
+    channel_title = None
+    depth = 0
+    for event, elem in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if elem.tag == "title" and depth == 2:  # rss > channel > title
+            channel_title = elem.text
+        elif elem.tag == "item":
+            yield channel_title, {
+                "id": elem.findtext("guid") or elem.findtext("link"),
+                "title": elem.findtext("title") or "",
+                "link": elem.findtext("link") or "",
+                "published": elem.findtext("pubDate") or "",
+            }
+            elem.clear()
+
+def iter_feed_items(content):
+    # RSS ใช้ตัวแกะ streaming ด้านบน ส่วน feed แบบอื่น (เช่น Atom) ส่งให้ feedparser
+    if b"<rss" in content[:512]:
+        yield from iter_rss_items(content)
+        return
+    import feedparser  # ใช้เฉพาะ feed ที่ไม่ใช่ RSS -> โหลดเมื่อเจอจริงเท่านั้น
+    feed = feedparser.parse(content)
+    source = feed.feed.get('title')
+    for entry in feed.entries:
+        yield source, {
+            "id": entry.get('id') or entry.get('link'),
+            "title": entry.get('title', ''),
+            "link": entry.get('link', ''),
+            "published": entry.get('published', ''),
+        }
+
+async def poll_feed(url, feed_state):
+    # โหลดแบบมีเงื่อนไข: ถ้า feed ไม่เปลี่ยน เซิร์ฟเวอร์ตอบ 304 และเราไม่ต้องแกะอะไรเลย
+    # คืน (url, HTTP status, ชื่อ feed, ข่าวใหม่, ขนาด body)
+    headers = {}
+    if feed_state.get('etag'):
+        headers['If-None-Match'] = feed_state['etag']
+    if feed_state.get('last_modified'):
+        headers['If-Modified-Since'] = feed_state['last_modified']
+
+    host = urlsplit(url).netloc
+    response = await http_client.aget(url, headers=headers)
+    if response.status_code == 304:
+        metrics.count("cache_hits", stage="fetch", upstream=host)
+        return url, response.status_code, None, [], 0
+    response.raise_for_status()
+    metrics.count("cache_misses", stage="fetch", upstream=host)
+
+    feed_state['etag'] = response.headers.get('ETag')
+    feed_state['last_modified'] = response.headers.get('Last-Modified')
+
+    # แกะเฉพาะข่าวใหม่: เจอข่าวที่เคยเห็นแล้วก็หยุด (feed เรียงข่าวใหม่ไว้บนสุด)
+    with metrics.timer("parse", upstream=host):
+        seen = set(feed_state.get('seen', []))
+        source, new_items = None, []
+        for channel_title, item in iter_feed_items(response.content):
+            source = source or channel_title
+            if item['id'] in seen:
+                break
+            new_items.append(item)
+
+    feed_state['seen'] = ([item['id'] for item in new_items] + feed_state.get('seen', []))[:MAX_SEEN_PER_FEED]
+    return url, response.status_code, source, new_items, len(response.content)
+
+async def poll_all_feeds(feeds, state):
+    tasks = [poll_feed(url, state.setdefault(url, {})) for url in feeds]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
 # --- 2. สมองของหุ่นยนต์ (Core Logic) ---
-def fetch_and_filter_news():
+async def afetch_and_filter_news():
+    # ตัวหลักแบบ coroutine: ผู้เรียกที่มี event loop อยู่แล้ว await ตัวนี้ได้ตรงๆ
+    # คืน (ข่าวที่ตรงเป้า, state ใหม่ของ feed) -> ผู้เรียกต้อง save_feed_state เองหลังบันทึกข่าวสำเร็จ
     print(f"\n🕵️‍♂️  Agent 001 (Political Scout): กำลังออกลาดตระเวน... ({datetime.now().strftime('%H:%M:%S')})")
-    print(f"🎯 เป้าหมายการค้นหา: {KEYWORDS}")
+    watchlist = keyword_matcher.load_watchlist(WATCHLIST_NAME, KEYWORDS)
+    matcher = keyword_matcher.get_matcher(WATCHLIST_NAME, KEYWORDS)
+    print(f"🎯 เป้าหมายการค้นหา: {len(watchlist)} คำ/วลี ({', '.join(watchlist[:8])}{' ...' if len(watchlist) > 8 else ''})")
     
     collected_news = []
-    
-    for url in RSS_FEEDS:
-        print(f"   📡 กำลังสแกนคลื่นสัญญาณ: {url[:60]}...")
-        try:
-            feed = feedparser.parse(url)
+    state = load_feed_state()
+
+    # ยิงทุก feed พร้อมกัน แทนการไล่ทีละ URL
+    print(f"   📡 กำลังสแกนคลื่นสัญญาณ {len(RSS_FEEDS)} ช่องพร้อมกัน...")
+    with metrics.timer("fetch", agent=AGENT_NAME):
+        results = await poll_all_feeds(RSS_FEEDS, state)
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors and len(errors) == len(RSS_FEEDS):
+        # ล่มทุกช่อง = รอบนี้ล้มเหลวจริง (ไม่ใช่แค่ไม่มีข่าว) -> ให้ orchestrator/scheduler เห็นเป็น FAILED
+        raise RuntimeError(f"ดึงข่าวไม่ได้ทุก feed ({errors[0]})")
+
+    with metrics.timer("compute", agent=AGENT_NAME):
+        for url, result in zip(RSS_FEEDS, results):
+            if isinstance(result, Exception):
+                print(f"   ❌ เกิดข้อผิดพลาดที่ URL นี้: {url[:60]}... ({result})")
+                continue
+
+            _, status, source, items, size = result
+            if status == 304:
+                print(f"   💤 ไม่มีอะไรใหม่ (304): {url[:60]}...")
+                continue
+            print(f"   📥 {url[:60]}... ข่าวใหม่ {len(items)} รายการ ({size / 1024:.1f} KB)")
+
+            for entry in items:
+                title = entry['title']
+                link = entry['link']
+            
+                # กรองข่าว: สแกนหัวข้อข่าวรอบเดียวหาทุก Keyword ของเรา (จับทั้งคำ ไม่สนตัวพิมพ์)
+                found_keywords = keyword_matcher.find_matches(matcher, title)
             
-            for entry in feed.entries:
-                title = entry.title
-                link = entry.link
-                pub_date = entry.published
-                
-                # กรองข่าว: ตรวจดูว่าหัวข้อข่าวมี Keyword ของเราไหม
-                found_keywords = [kw for kw in KEYWORDS if kw.lower() in title.lower()]
-                
                 if found_keywords:
                     # ถ้าเจอข่าวที่ตรงเงื่อนไข ให้เก็บเข้ากระเป๋า
                     news_item = {
@@ -45,15 +174,27 @@ def fetch_and_filter_news():
                         "Title": title,
                         "Matched_Keywords": ", ".join(found_keywords),
                         "Link": link,
-                        "Source": feed.feed.get('title', 'Unknown Source')
+                        "Source": source or 'Unknown Source'
                     }
                     collected_news.append(news_item)
-        except Exception as e:
-            print(f"   ❌ เกิดข้อผิดพลาดที่ URL นี้: {e}")
 
-    return collected_news
+    metrics.count("rows", len(collected_news), stage="compute", agent=AGENT_NAME)
+    return collected_news, state
 
+def fetch_and_filter_news():
+    # ตัวเรียกแบบ sync (orchestrator / scheduler / CLI)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(afetch_and_filter_news())
+    # มี event loop วิ่งอยู่ใน thread นี้แล้ว (เช่น Jupyter) -> asyncio.run ใช้ไม่ได้ ไปรัน loop ใหม่ใน thread แยก
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, afetch_and_filter_news()).result()
+
+@metrics.timer("persist", agent=AGENT_NAME)
 def save_intelligence(news_list):
+    import pandas as pd
+
     if not news_list:
         print("🤷‍♂️ Agent 001: รายงานผล - ไม่พบความเคลื่อนไหวตามเป้าหมายครับ")
         return
@@ -64,6 +205,17 @@ def save_intelligence(news_list):
         print(f"📁 สร้างห้องเก็บข้อมูลใหม่ที่: {DATA_FOLDER}")
 
     file_path = os.path.join(DATA_FOLDER, OUTPUT_FILE)
+
+    # ครั้งแรกที่ยังไม่มีดัชนี: ล้างแถวซ้ำใน CSV เดิมและสร้างดัชนีจากไฟล์นั้นก่อน
+    if not os.path.exists(SEEN_INDEX_FILE):
+        compact_intelligence()
+
+    total = len(news_list)
+    news_list = seen_index.filter_unseen(SEEN_INDEX_FILE, news_list)
+    if not news_list:
+        print(f"🤷‍♂️ Agent 001: ข่าวที่เจอ {total} รายการ บันทึกไว้แล้วทั้งหมด ไม่มีข่าวใหม่ครับ")
+        return
+
     df = pd.DataFrame(news_list)
     
     # ถ้ามีไฟล์อยู่แล้ว ให้บันทึกต่อท้าย (Append)
@@ -71,16 +223,38 @@ def save_intelligence(news_list):
         df.to_csv(file_path, mode='a', header=False, index=False)
     else:
         df.to_csv(file_path, mode='w', header=True, index=False)
+    # เก็บสำเนาแบบ columnar แบ่งรายวันไว้ค้นย้อนหลัง (เร็วกว่าอ่าน CSV ทั้งไฟล์)
+    append_records("political_intelligence", news_list)
+    # จดลงดัชนีหลังบันทึกสำเร็จทั้งสองที่เท่านั้น (พังก่อนหน้านี้ รอบหน้าจะบันทึกข่าวชุดนี้ใหม่)
+    seen_index.mark_seen(SEEN_INDEX_FILE, news_list)
+    metrics.count("rows", len(news_list), stage="persist")
         
-    print(f"✅ Agent 001: บันทึกข่าวสำคัญ {len(news_list)} รายการ เรียบร้อย!")
+    print(f"✅ Agent 001: บันทึกข่าวสำคัญ {len(news_list)} รายการ เรียบร้อย! (ข้ามข่าวซ้ำ {total - len(news_list)} รายการ)")
     print(f"📂 เก็บไว้ที่: {file_path}")
     print("\n--- 📝 ตัวอย่างข่าวล่าสุด 3 หัวข้อ ---")
     print(df[['Title', 'Matched_Keywords']].head(3).to_string(index=False))
     print("-" * 50)
 
+def run_scout():
+    # จด ETag / ข่าวล่าสุดที่เห็นของ feed หลังบันทึกข่าวสำเร็จเท่านั้น
+    # (จดก่อนแล้วบันทึกพัง -> รอบหน้าได้ 304 หรือหยุดที่ข่าว "เห็นแล้ว" ข่าวชุดนี้จะหายไปเลย)
+    news_list, feed_state = fetch_and_filter_news()
+    save_intelligence(news_list)
+    save_feed_state(feed_state)
+
+def compact_intelligence():
+    # ล้างข่าวซ้ำที่สะสมใน CSV และสร้างดัชนีใหม่ (รันเองเป็นระยะด้วย --compact)
+    file_path = os.path.join(DATA_FOLDER, OUTPUT_FILE)
+    total, kept = seen_index.compact_csv(file_path, SEEN_INDEX_FILE)
+    if total:
+        print(f"🧹 Agent 001: จัดระเบียบ {OUTPUT_FILE} เหลือ {kept}/{total} แถว (ลบข่าวซ้ำ {total - kept} แถว)")
+
 # --- 3. เริ่มภารกิจ (Execution) ---
 if __name__ == "__main__":
+    if "--compact" in sys.argv:
+        compact_intelligence()
+        sys.exit(0)
+
     print("--- 🦅 STARTING MEGA PROJECT: AGENT 001 ---")
-    news_data = fetch_and_filter_news()
-    save_intelligence(news_data)
+    run_scout()
     print("--- 😴 MISSION COMPLETE (Sleeping) ---")
\ No newline at end of file
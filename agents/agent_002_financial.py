@@ -1,15 +1,50 @@
-import yfinance as yf
-import pandas as pd
 import os
 from datetime import datetime
+from price_cache import get_history
+import indicator_engine
+import metrics
+from history_store import append_records
 
 # --- ตั้งค่า Path ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 # ชื่อไฟล์ต้องตรงกับที่ War Room รออ่าน
 OUTPUT_FILE = os.path.join(DATA_DIR, 'market_price_data.csv') 
+SYMBOL = "GC=F"
+AGENT_NAME = "agent_002_financial"  # ป้าย agent ใน metrics
 
+def classify_trend(snap):
+    # อ่านค่าจาก state ของ indicator_engine (ไม่ต้องคำนวณย้อนหลังใหม่)
+    price, ma10, ma50 = snap['close'], snap['sma10'], snap['sma50']
+
+    # Sniper Logic เดิม (War Room อ่านคำว่า UPTREND/DOWNTREND/RECOVERY/CORRECTION)
+    if price > ma10 and price > ma50:
+        trend, signal = "UPTREND (ขาขึ้นแข็งแกร่ง)", "BUY"
+    elif price < ma10 and price < ma50:
+        trend, signal = "DOWNTREND (ขาลงชัดเจน)", "SELL"
+    elif price > ma10:
+        trend, signal = "RECOVERY (ฟื้นตัวระยะสั้น)", "WAIT/BUY"
+    else:
+        trend, signal = "CORRECTION (ย่อตัวระยะสั้น)", "WAIT"
+
+    # โมเมนตัมเสริมจาก RSI / Bollinger
+    rsi = snap['rsi']
+    if rsi is not None and rsi >= 70:
+        momentum = "OVERBOUGHT (RSI ร้อนแรง)"
+    elif rsi is not None and rsi <= 30:
+        momentum = "OVERSOLD (RSI ขายมากเกิน)"
+    elif price > snap['bb_upper']:
+        momentum = "ABOVE BAND (ทะลุกรอบบน)"
+    elif price < snap['bb_lower']:
+        momentum = "BELOW BAND (หลุดกรอบล่าง)"
+    else:
+        momentum = "NORMAL"
+    return trend, signal, momentum
+
+@metrics.timer("run", agent=AGENT_NAME)
 def analyze_market_price():
+    import pandas as pd
+
     print(f"\n📊 Agent 002 (Financial): กำลังเล็งเป้ากราฟเทคนิค...")
     
     try:
@@ -18,44 +53,41 @@ def analyze_market_price():
 
         # 1. ดึงข้อมูลทองคำ (Gold Futures)
         # ใช้ GC=F (Gold Futures) หรือ GLD ก็ได้ แต่ GC=F จะใกล้เคียง Spot มากกว่า
-        ticker = yf.Ticker("GC=F")
-        hist = ticker.history(period="60d") # ดึงย้อนหลัง 60 วันเพื่อให้ชัวร์เรื่องเส้น MA
+        # ผ่าน price_cache: รอบแรกดึง 60 วันเต็ม รอบถัดไปดึงเฉพาะแท่งใหม่
+        with metrics.timer("fetch", upstream="yahoo"):
+            hist = get_history(SYMBOL, period="60d") # ดึงย้อนหลัง 60 วันเพื่อให้ชัวร์เรื่องเส้น MA
         
         if hist.empty:
             print("❌ ไม่พบข้อมูลราคา (เช็คเน็ต)")
-            return
+            return False
+
+        # 2. ป้อนเฉพาะแท่งใหม่เข้า indicator engine (state เก็บ running sum ไว้ข้ามรอบ)
+        with metrics.timer("compute"):
+            state = indicator_engine.load_state(SYMBOL)
+            snap = indicator_engine.feed_bars(state, hist)
+            indicator_engine.save_state(state)
+        if snap is None or snap['prev_close'] is None:
+            print("❌ ข้อมูลราคายังไม่พอคำนวณ")
+            return False
 
-        # 2. คำนวณตัวเลขทางเทคนิค
-        current_price = hist['Close'].iloc[-1]
-        prev_price = hist['Close'].iloc[-2]
+        current_price = snap['close']
+        prev_price = snap['prev_close']
         change = current_price - prev_price
         pct_change = (change / prev_price) * 100
         
         # Moving Averages (เส้นค่าเฉลี่ย)
-        ma10 = hist['Close'].tail(10).mean() # เส้นระยะสั้น (10 วัน)
-        ma50 = hist['Close'].tail(50).mean() # เส้นระยะกลาง (50 วัน)
+        ma10 = snap['sma10'] # เส้นระยะสั้น (10 วัน)
+        ma50 = snap['sma50'] # เส้นระยะกลาง (50 วัน)
 
         # 3. วิเคราะห์เทรนด์ (Sniper Logic)
-        trend = "SIDEWAY"
-        signal = "WAIT"
-        
-        if current_price > ma10 and current_price > ma50:
-            trend = "UPTREND (ขาขึ้นแข็งแกร่ง)"
-            signal = "BUY"
-        elif current_price < ma10 and current_price < ma50:
-            trend = "DOWNTREND (ขาลงชัดเจน)"
-            signal = "SELL"
-        elif current_price > ma10:
-            trend = "RECOVERY (ฟื้นตัวระยะสั้น)"
-            signal = "WAIT/BUY"
-        else:
-            trend = "CORRECTION (ย่อตัวระยะสั้น)"
-            signal = "WAIT"
+        trend, signal, momentum = classify_trend(snap)
 
         # 4. แสดงผล
         print(f"   💰 ราคาทอง (Spot): ${current_price:.2f}")
         print(f"   📈 เส้นค่าเฉลี่ย: MA10=${ma10:.1f} | MA50=${ma50:.1f}")
-        print(f"   🚩 สถานะกราฟ: {trend}")
+        rsi_text = f"{snap['rsi']:.1f}" if snap['rsi'] is not None else "-"
+        print(f"   📉 RSI14={rsi_text} | ATR14=${snap['atr']:.1f} | BB=${snap['bb_lower']:.1f}-${snap['bb_upper']:.1f}")
+        print(f"   🚩 สถานะกราฟ: {trend} | โมเมนตัม: {momentum}")
 
         # 5. บันทึกข้อมูลส่งต่อให้ War Room
         data = [{
@@ -65,15 +97,30 @@ def analyze_market_price():
             "Change": round(change, 2),
             "Pct_Change": round(pct_change, 2),
             "Trend": trend,
-            "Signal": signal
+            "Signal": signal,
+            "MA10": round(ma10, 2),
+            "MA50": round(ma50, 2),
+            "EMA20": round(snap['ema20'], 2),
+            "RSI14": round(snap['rsi'], 2) if snap['rsi'] is not None else None,
+            "ATR14": round(snap['atr'], 2),
+            "BB_Upper": round(snap['bb_upper'], 2),
+            "BB_Lower": round(snap['bb_lower'], 2),
+            "Momentum": momentum
         }]
         
-        df = pd.DataFrame(data)
-        df.to_csv(OUTPUT_FILE, index=False)
+        with metrics.timer("persist"):
+            df = pd.DataFrame(data)
+            # เขียนไฟล์ชั่วคราวแล้วสลับทีเดียว: War Room ที่อ่านอยู่พร้อมกันไม่เจอไฟล์ครึ่งๆ กลางๆ
+            df.to_csv(OUTPUT_FILE + ".tmp", index=False)
+            os.replace(OUTPUT_FILE + ".tmp", OUTPUT_FILE)
+            append_records("market_price", data) # เก็บประวัติแบบ append ไม่ให้หายตอนเขียนทับ CSV
+        metrics.count("rows", len(data), stage="persist")
         print(f"✅ ส่งข้อมูลเข้าศูนย์บัญชาการเรียบร้อยที่: {OUTPUT_FILE}")
+        return True
 
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
 
 if __name__ == "__main__":
     analyze_market_price()
\ No newline at end of file
@@ -1,14 +1,51 @@
-import yfinance as yf
-import pandas as pd
 import os
+import json
 from datetime import datetime
+from price_cache import get_closes
+from history_store import append_records
+import metrics
 
 # --- ตั้งค่า Path ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 OUTPUT_FILE = os.path.join(DATA_DIR, 'intermarket_analysis.csv')
+AGENT_NAME = "agent_002_intermarket"  # ป้าย agent ใน metrics
+# รายชื่อ ticker เพิ่ม/ลดได้ที่ไฟล์นี้โดยไม่ต้องแก้โค้ด (ชื่อเรียก -> symbol ของ Yahoo)
+TICKERS_CONFIG = os.path.join(BASE_DIR, 'config', 'intermarket_tickers.json')
 
+# ชุดหลักที่กฎวิเคราะห์ด้านล่างต้องใช้เสมอ
+CORE_TICKERS = {
+    'Gold': 'GC=F',
+    'Dollar_DXY': 'DX-Y.NYB',
+    'US10Y_Bond': '^TNX',
+    'Crude_Oil': 'CL=F',
+    'Bitcoin': 'BTC-USD'
+}
+
+def load_tickers():
+    tickers = dict(CORE_TICKERS)
+    if os.path.exists(TICKERS_CONFIG):
+        with open(TICKERS_CONFIG, 'r', encoding='utf-8') as f:
+            tickers.update(json.load(f))
+    return tickers
+
+def compute_changes(closes):
+    # คำนวณทุกคอลัมน์ในทีเดียว: หาแท่งล่าสุดที่มีข้อมูลและแท่งก่อนหน้าของแต่ละ symbol
+    # (ตลาดเปิดปิดไม่พร้อมกัน เช่น BTC เทรดเสาร์อาทิตย์ -> ห้าม ffill ข้ามคอลัมน์)
+    import pandas as pd
+
+    valid = closes.notna()
+    rank_from_end = valid[::-1].cumsum()[::-1]
+    current = closes.where(valid & (rank_from_end == 1)).max()
+    prev = closes.where(valid & (rank_from_end == 2)).max()
+    change_pct = (current - prev) / prev * 100
+    # symbol ที่ไม่มีข้อมูลพอ -> 0 เหมือนพฤติกรรมเดิม
+    return pd.DataFrame({'price': current, 'change_pct': change_pct}).fillna(0)
+
+@metrics.timer("run", agent=AGENT_NAME)
 def analyze_intermarket():
+    import pandas as pd
+
     print(f"\n🔗 Agent 002: กำลังเชื่อมโยงข้อมูลจักรวาลการเงิน (Inter-market)...")
     
     try:
@@ -16,44 +53,26 @@ def analyze_intermarket():
             os.makedirs(DATA_DIR)
 
         # 1. กำหนดเป้าหมาย (Tickers)
-        tickers = {
-            'Gold': 'GC=F',
-            'Dollar_DXY': 'DX-Y.NYB',
-            'US10Y_Bond': '^TNX',
-            'Crude_Oil': 'CL=F',
-            'Bitcoin': 'BTC-USD'
-        }
+        tickers = load_tickers()
         
+        # 2. ดึงข้อมูลทุกตัวในคำขอเดียว แล้วคำนวณ % เปลี่ยนแปลงแบบ vectorized
+        print(f"   ...กำลังดึงข้อมูล {len(tickers)} สินทรัพย์พร้อมกัน")
+        with metrics.timer("fetch", upstream="yahoo"):
+            closes = get_closes(list(tickers.values()), period="5d")
+        with metrics.timer("compute"):
+            changes = compute_changes(closes)
+
         results = {}
-        
-        # 2. วนลูปดึงข้อมูล
         for name, symbol in tickers.items():
-            print(f"   ...กำลังดึงข้อมูล {name} ({symbol})")
-            try:
-                t = yf.Ticker(symbol)
-                hist = t.history(period="5d")
-                
-                if hist.empty:
-                    print(f"      ⚠️ ไม่พบข้อมูล {name}")
-                    results[name] = {'price': 0, 'change_pct': 0}
-                    continue
-                    
-                current = hist['Close'].iloc[-1]
-                prev = hist['Close'].iloc[-2]
-                change_pct = ((current - prev) / prev) * 100
-                
-                results[name] = {
-                    'price': current,
-                    'change_pct': change_pct
-                }
-            except Exception as e:
-                print(f"      ❌ Error {name}: {e}")
-                results[name] = {'price': 0, 'change_pct': 0}
+            row = changes.loc[symbol]
+            if row['price'] == 0:
+                print(f"      ⚠️ ไม่พบข้อมูล {name} ({symbol})")
+            results[name] = {'price': row['price'], 'change_pct': row['change_pct']}
 
         # 3. ตรวจสอบว่ามีข้อมูลทองคำไหม
         if 'Gold' not in results or results['Gold']['price'] == 0:
             print("❌ ไม่สามารถดึงราคาทองคำได้ จบการทำงาน")
-            return
+            return False
 
         # 4. วิเคราะห์ความสัมพันธ์
         print("\n🧠 วิเคราะห์ความสัมพันธ์ต่อทองคำ:")
@@ -90,18 +109,30 @@ def analyze_intermarket():
             "DXY_Correlation": dxy_status,
             "Yield_Correlation": yield_status
         }
+
+        # สินทรัพย์เสริมจาก config ต่อท้ายเป็นคอลัมน์ <ชื่อ>_Price / <ชื่อ>_Chg
+        for name in tickers:
+            if name not in CORE_TICKERS:
+                data_row[f"{name}_Price"] = results[name]['price']
+                data_row[f"{name}_Chg"] = results[name]['change_pct']
         
         # สร้าง List ของ Dictionary
         data_list = [data_row]
         
         # บันทึกเป็น CSV
-        df = pd.DataFrame(data_list)
-        df.to_csv(OUTPUT_FILE, index=False)
+        with metrics.timer("persist"):
+            df = pd.DataFrame(data_list)
+            df.to_csv(OUTPUT_FILE + ".tmp", index=False)
+            os.replace(OUTPUT_FILE + ".tmp", OUTPUT_FILE)
+            append_records("intermarket", data_list) # เก็บประวัติแบบ append ไม่ให้หายตอนเขียนทับ CSV
+        metrics.count("rows", len(data_list), stage="persist")
         print("-" * 50)
         print(f"✅ บันทึกข้อมูลเรียบร้อยที่: {OUTPUT_FILE}")
+        return True
 
     except Exception as e:
         print(f"❌ Critical Error: {e}")
+        return False
 
 if __name__ == "__main__":
     analyze_intermarket()
\ No newline at end of file
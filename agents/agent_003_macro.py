@@ -1,15 +1,40 @@
-import requests
-import pandas as pd
 import io
 import os
-from datetime import datetime
+import csv
+import json
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from history_store import append_records
+import http_client
+import metrics
 
 # --- 1. ตั้งค่าเป้าหมาย ---
-DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FOLDER = os.path.join(BASE_DIR, 'data')
 OUTPUT_FILE = "economic_calendar.csv"
+AGENT_NAME = "agent_003_macro"  # ป้าย agent ใน metrics
 
-# URL ของ Forex Factory (แหล่งขุมทรัพย์ของคุณ)
-URL = "https://nfs.faireconomy.media/ff_calendar_thisweek.xml"
+# URL ของ Forex Factory (แหล่งขุมทรัพย์ของคุณ): สัปดาห์ก่อน/นี้/หน้า รวมเป็นปฏิทินเดียว
+FEEDS = {
+    "lastweek": "https://nfs.faireconomy.media/ff_calendar_lastweek.xml",
+    "thisweek": "https://nfs.faireconomy.media/ff_calendar_thisweek.xml",
+    "nextweek": "https://nfs.faireconomy.media/ff_calendar_nextweek.xml",
+}
+
+# ประเทศ/ความแรงที่ติดตาม ปรับได้ที่ไฟล์นี้โดยไม่ต้องแก้โค้ด (ลิสต์ว่าง = เอาทุกค่า)
+CALENDAR_CONFIG = os.path.join(BASE_DIR, 'config', 'macro_calendar.json')
+DEFAULT_CONFIG = {
+    "feeds": ["lastweek", "thisweek", "nextweek"],
+    "countries": ["USD"],
+    "impacts": ["High"],
+    "utc_offset_hours": 0,  # เวลาใน feed XML เป็น GMT -> Event_Time เก็บเป็น UTC
+}
+
+# ETag / Last-Modified + event ที่แกะแล้วของแต่ละ feed (ได้ 304 ก็ใช้ของเดิม ไม่ต้องแกะซ้ำ)
+FEED_STATE_FILE = os.path.join(DATA_FOLDER, 'cache', 'ff_calendar_state.json')
+EVENT_FIELDS = ("title", "country", "date", "time", "impact", "forecast", "previous")
+OUTPUT_COLUMNS = ["Date", "Time", "Event_Time", "Country", "Impact", "Title", "Thai_Title",
+                  "Forecast", "Previous", "Strategy", "Timestamp"]
 
 # --- 2. สมองกลวิเคราะห์ข่าว (Logic ของสหายที่เยี่ยมยอดอยู่แล้ว) ---
 def analyze_impact(title, forecast):
@@ -33,56 +58,153 @@ def analyze_impact(title, forecast):
         return title, f"รอติดตามตัวเลขจริง {forecast_text}"
 
 # --- 3. ระบบดึงข้อมูล (Core Function) ---
+def load_config():
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(CALENDAR_CONFIG):
+        with open(CALENDAR_CONFIG, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    return config
+
+def load_feed_state():
+    if os.path.exists(FEED_STATE_FILE):
+        try:
+            with open(FEED_STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def save_feed_state(state):
+    os.makedirs(os.path.dirname(FEED_STATE_FILE), exist_ok=True)
+    with open(FEED_STATE_FILE + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(FEED_STATE_FILE + '.tmp', FEED_STATE_FILE)
+
+def iter_calendar_events(content, countries=None, impacts=None):
+    # แกะทีละ <event> แบบ streaming และกรองประเทศ/ความแรงตั้งแต่ตอนแกะ
+    # คืน dict ข้อความดิบของ event ที่ผ่านตัวกรอง (ตัวที่ไม่ผ่านถูกทิ้งทันที ไม่ค้างในหน่วยความจำ)
+    countries = set(countries or ())
+    impacts = set(impacts or ())
+    for _, elem in ET.iterparse(io.BytesIO(content), events=("end",)):
+        if elem.tag != "event":
+            continue
+        country = (elem.findtext("country") or "").strip()
+        impact = (elem.findtext("impact") or "").strip()
+        if (not countries or country in countries) and (not impacts or impact in impacts):
+            yield {field: (elem.findtext(field) or "").strip() for field in EVENT_FIELDS}
+        elem.clear()
+
+def event_time(date_text, time_text, utc_offset_hours=0):
+    # date 'MM-DD-YYYY' + time '8:30am' -> (วันที่, เวลาออกข่าวแบบ UTC)
+    # เวลาแบบ 'All Day' / 'Tentative' / ว่าง -> รู้แค่วัน เวลาเป็น None
+    day = datetime.strptime(date_text, "%m-%d-%Y").date()
+    try:
+        clock = datetime.strptime(time_text.replace(" ", "").lower(), "%I:%M%p").time()
+    except ValueError:
+        return day, None
+    return day, datetime.combine(day, clock) - timedelta(hours=utc_offset_hours)
+
+def to_record(raw, stamp, utc_offset_hours=0):
+    # event ดิบ -> แถวของปฏิทิน (วันที่/เวลาแปลงชนิดแล้ว + คำแปลและกลยุทธ์)
+    day, released = event_time(raw['date'], raw['time'], utc_offset_hours)
+    thai_title, strategy = analyze_impact(raw['title'], raw['forecast'])
+    return {
+        "Date": day.isoformat(),
+        "Time": raw['time'],
+        "Event_Time": released,
+        "Country": raw['country'],
+        "Impact": raw['impact'],
+        "Title": raw['title'],
+        "Thai_Title": thai_title,
+        "Forecast": raw['forecast'],
+        "Previous": raw['previous'],
+        "Strategy": strategy, # คำแนะนำการเทรด
+        "Timestamp": stamp,
+    }
+
+def event_key(raw):
+    return raw['date'], raw['time'], raw['title']
+
+def fetch_feed(url, feed_state, filter_key):
+    # โหลดแบบมีเงื่อนไข: feed ไม่เปลี่ยน (304) -> ใช้ event ที่แกะไว้รอบก่อน
+    # ตัวกรองใน config เปลี่ยน -> ของเดิมใช้ไม่ได้ ต้องโหลดและแกะใหม่
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if feed_state.get('filter') == filter_key:
+        if feed_state.get('etag'):
+            headers['If-None-Match'] = feed_state['etag']
+        if feed_state.get('last_modified'):
+            headers['If-Modified-Since'] = feed_state['last_modified']
+
+    with metrics.timer("fetch", agent=AGENT_NAME):
+        response = http_client.get(url, headers=headers)
+    if response.status_code == 304:
+        metrics.count("cache_hits", stage="fetch", agent=AGENT_NAME)
+        return feed_state.get('events', []), True
+    response.raise_for_status()
+    metrics.count("cache_misses", stage="fetch", agent=AGENT_NAME)
+
+    # ตัดซ้ำตั้งแต่ในแต่ละ feed ด้วย key เดียวกับตอนรวม (state จะได้เก็บแค่ event ที่ไม่ซ้ำ)
+    with metrics.timer("parse", agent=AGENT_NAME):
+        unique = {}
+        for raw in iter_calendar_events(response.content, filter_key['countries'], filter_key['impacts']):
+            unique[event_key(raw)] = raw
+        events = list(unique.values())
+    feed_state.update(etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                      filter=filter_key, events=events)
+    return events, False
+
 def fetch_economic_data():
     print(f"\n📅 Agent 003 (Macro Economist): กำลังดึงปฏิทินเศรษฐกิจ... ({datetime.now().strftime('%H:%M:%S')})")
-    
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(URL, headers=headers)
-        # อ่าน XML แปลงเป็น DataFrame
-        df = pd.read_xml(io.BytesIO(response.content))
-        
-        # กรองเฉพาะข่าว USD และความแรงระดับ High (ตามสูตรของสหาย)
-        # และกรองเฉพาะข่าววันนี้หรืออนาคต (ไม่เอาอดีตที่ไกลเกินไป)
-        today = datetime.now().date()
-        
-        # แปลงวันที่ใน xml เป็น format ที่ python เข้าใจ
-        # หมายเหตุ: date ใน xml ของ ff เป็น format 'YYYY-MM-DD' หรือใกล้เคียง
-        # ถ้ามีปัญหาเรื่อง timezone อาจจะต้องจูนเพิ่ม แต่เบื้องต้นเอาแบบนี้ก่อน
-        
-        relevant_news = df[
-            (df['country'] == 'USD') & 
-            (df['impact'] == 'High')
-        ].copy()
 
-        if relevant_news.empty:
-            print("   🤷‍♂️ สัปดาห์นี้ไม่มีข่าวแดง USD ที่น่าสนใจเลยครับ")
-            return []
+    config = load_config()
+    filter_key = {"countries": sorted(config['countries']), "impacts": sorted(config['impacts'])}
+    print(f"   🎯 ประเทศ: {', '.join(filter_key['countries']) or 'ทั้งหมด'} | "
+          f"ความแรง: {', '.join(filter_key['impacts']) or 'ทั้งหมด'}")
+    state = load_feed_state()
 
-        processed_data = []
-        for index, row in relevant_news.iterrows():
-            # ใช้สมองกลวิเคราะห์
-            thai_title, strategy = analyze_impact(row['title'], row.get('forecast', ''))
-            
-            item = {
-                "Date": row['date'],
-                "Time": row['time'],
-                "Title": row['title'],
-                "Thai_Title": thai_title,
-                "Forecast": row.get('forecast', '-'),
-                "Previous": row.get('previous', '-'),
-                "Strategy": strategy, # คำแนะนำการเทรด
-                "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            processed_data.append(item)
-            
-        return processed_data
-
-    except Exception as e:
-        print(f"   ❌ เกิดข้อผิดพลาดในการดึงข้อมูล: {e}")
+    # รวมทุกสัปดาห์เป็นชุดเดียว: event เดียวกัน (วัน, เวลา, หัวข้อ) ที่โผล่หลาย feed เก็บครั้งเดียว
+    # feed ที่อยู่ทีหลังในลิสต์ทับของเดิม (ตัวเลขคาดการณ์ล่าสุด)
+    calendar = {}
+    failed = []
+    for name in config['feeds']:
+        url = FEEDS.get(name, name)
+        feed_state = state.setdefault(name, {})
+        try:
+            events, cached = fetch_feed(url, feed_state, filter_key)
+        except Exception as e:
+            # ดึงไม่ได้ -> ใช้ของที่แกะไว้รอบก่อน (ถ้าตัวกรองยังตรง) ดีกว่าปฏิทินหายทั้งสัปดาห์
+            events = feed_state.get('events', []) if feed_state.get('filter') == filter_key else []
+            print(f"   ❌ ดึง {name} ไม่ได้: {e} (ใช้ข้อมูลเดิม {len(events)} รายการ)")
+            failed.append(e)
+        else:
+            print(f"   {'💤' if cached else '📥'} {name}: {len(events)} รายการ{' (304 ไม่เปลี่ยน)' if cached else ''}")
+        for raw in events:
+            calendar[event_key(raw)] = raw
+    save_feed_state(state)
+
+    if failed and len(failed) == len(config['feeds']) and not calendar:
+        # ล่มทุก feed และไม่มีของเดิมให้ใช้ -> ล้มเหลวจริง (ไม่ใช่สัปดาห์ที่ไม่มีข่าว)
+        raise RuntimeError(f"ดึงปฏิทินไม่ได้ทุก feed ({failed[0]})")
+
+    if not calendar:
+        print("   🤷‍♂️ ช่วงนี้ไม่มีข่าวที่ตรงเงื่อนไขเลยครับ")
         return []
 
+    with metrics.timer("compute", agent=AGENT_NAME):
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        processed_data = []
+        for raw in calendar.values():
+            try:
+                processed_data.append(to_record(raw, stamp, config['utc_offset_hours']))
+            except ValueError:
+                continue  # วันที่ผิดรูปแบบ: ข้ามเฉพาะ event นั้น
+        processed_data.sort(key=lambda r: (r['Date'], r['Event_Time'] or datetime.min))
+
+    metrics.count("rows", len(processed_data), stage="compute", agent=AGENT_NAME)
+    return processed_data
+
 # --- 4. บันทึกข้อมูล ---
+@metrics.timer("persist", agent=AGENT_NAME)
 def save_data(data_list):
     if not data_list: return
 
@@ -90,16 +212,24 @@ def save_data(data_list):
         os.makedirs(DATA_FOLDER)
 
     file_path = os.path.join(DATA_FOLDER, OUTPUT_FILE)
-    df = pd.DataFrame(data_list)
     
     # เขียนทับไปเลยสำหรับปฏิทิน (เพราะมัน update เป็นรายสัปดาห์) 
     # หรือจะ append ก็ได้ แต่ปฏิทินมักจะดู "อนาคต" ผมแนะนำเขียนทับ (mode='w') จะได้ไม่ซ้ำซ้อน
-    df.to_csv(file_path, mode='w', header=True, index=False)
+    # แถวเป็น dict อยู่แล้ว -> เขียนด้วย csv ตรงๆ ไม่ต้องแปลงเป็น DataFrame
+    with open(file_path + '.tmp', 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(data_list)
+    os.replace(file_path + '.tmp', file_path)
+    # ส่วนประวัติทุกครั้งที่ดึง เก็บแยกแบบ append (ย้อนดูได้ว่าตัวเลขคาดการณ์เปลี่ยนไปอย่างไร)
+    append_records("economic_calendar", data_list)
+    metrics.count("rows", len(data_list), stage="persist")
         
     print(f"✅ Agent 003: อัปเดตปฏิทินเศรษฐกิจ {len(data_list)} รายการ เรียบร้อย!")
     print(f"📂 เก็บไว้ที่: {file_path}")
-    print("\n--- 📅 ปฏิทินข่าวแดงสัปดาห์นี้ ---")
-    print(df[['Date', 'Time', 'Thai_Title', 'Forecast']].to_string(index=False))
+    print("\n--- 📅 ปฏิทินข่าวที่ติดตาม (สัปดาห์ก่อน - สัปดาห์หน้า) ---")
+    for row in data_list:
+        print(f"   {row['Date']}  {row['Time']:>9}  {row['Country']:<4} {row['Thai_Title']}  {row['Forecast'] or '-'}")
     print("-" * 50)
 
 # --- 5. สั่งทำงาน ---
@@ -1,14 +1,19 @@
-import yfinance as yf
-import pandas as pd
 import os
 from datetime import datetime
+from price_cache import get_history
+from history_store import append_records
+import metrics
 
 # --- ตั้งค่า Path ให้ตรงกับเพื่อนๆ ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # ถอยออกไป 1 ชั้นจาก agents
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 OUTPUT_FILE = os.path.join(DATA_DIR, 'spdr_gold_flows.csv')
+AGENT_NAME = "agent_005_spdr"  # ป้าย agent ใน metrics
 
+@metrics.timer("run", agent=AGENT_NAME)
 def fetch_and_save_spdr():
+    import pandas as pd
+
     print(f"\n📦 Agent 005: กำลังดึงข้อมูลกองทุน SPDR (GLD)...")
     
     try:
@@ -17,12 +22,12 @@ def fetch_and_save_spdr():
             os.makedirs(DATA_DIR)
 
         # 2. ดึงข้อมูลจาก Yahoo Finance
-        ticker = yf.Ticker("GLD")
-        hist = ticker.history(period="5d")
+        with metrics.timer("fetch", upstream="yahoo"):
+            hist = get_history("GLD", period="5d")
         
         if hist.empty:
             print("❌ ไม่พบข้อมูล GLD (เช็คอินเทอร์เน็ต)")
-            return
+            return False
 
         # 3. คำนวณค่า
         latest = hist.iloc[-1]
@@ -44,14 +49,21 @@ def fetch_and_save_spdr():
             "Status": status
         }]
         
-        df = pd.DataFrame(data)
-        df.to_csv(OUTPUT_FILE, index=False) # เขียนทับไฟล์เก่าไปเลยเพื่อความสดใหม่
+        with metrics.timer("persist"):
+            df = pd.DataFrame(data)
+            # เขียนทับไฟล์เก่าไปเลยเพื่อความสดใหม่ (ผ่านไฟล์ชั่วคราว: War Room ที่อ่านอยู่ไม่เจอไฟล์ครึ่งๆ กลางๆ)
+            df.to_csv(OUTPUT_FILE + ".tmp", index=False)
+            os.replace(OUTPUT_FILE + ".tmp", OUTPUT_FILE)
+            append_records("spdr_flows", data) # ส่วนประวัติเก็บแยกแบบ append
+        metrics.count("rows", len(data), stage="persist")
         
         print(f"✅ บันทึกข้อมูลสำเร็จที่: {OUTPUT_FILE}")
         print(f"📊 ราคา: ${price:.2f} | สถานะ: {status}")
+        return True
 
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
 
 if __name__ == "__main__":
     fetch_and_save_spdr()
\ No newline at end of file
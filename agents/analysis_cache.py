@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+
+# --- ตั้งค่า Path ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+CACHE_FILE = os.path.join(DATA_DIR, 'cache', 'gemini_analysis.sqlite')
+
+# นโยบายล้าง cache: เก็บไม่เกิน MAX_ENTRIES รายการ (ทิ้งตัวที่ไม่ได้ใช้นานสุดก่อน)
+# และไม่ใช้ผลที่เก่ากว่า TTL_SECONDS
+MAX_ENTRIES = 5000
+TTL_SECONDS = 3 * 24 * 3600
+
+
+def make_key(*parts):
+    # hash ของทุกอย่างที่มีผลต่อคำตอบ (ข่าว + โมเดล + เวอร์ชัน prompt)
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    # เปิด connection ใหม่ทุกครั้ง: Streamlit รันสคริปต์คนละ thread แชร์ connection ไม่ได้
+    conn = sqlite3.connect(CACHE_FILE, timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+        " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed_at)")
+    return conn
+
+
+@contextmanager
+def _session():
+    conn = _connect()
+    try:
+        with conn:  # commit อัตโนมัติเมื่อจบ block
+            yield conn
+    finally:
+        conn.close()
+
+
+def get_many(keys, ttl=TTL_SECONDS):
+    # คืน {key: value} เฉพาะตัวที่ยังไม่หมดอายุ และต่ออายุ LRU ให้ตัวที่ถูกใช้
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    now = time.time()
+    found = {}
+    with _session() as conn:
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            marks = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({marks}) AND created_at >= ?",
+                batch + [now - ttl],
+            ).fetchall()
+            for key, value in rows:
+                found[key] = json.loads(value)
+        if found:
+            conn.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", [(now, k) for k in found])
+    return found
+
+
+def get(key, ttl=TTL_SECONDS):
+    return get_many([key], ttl).get(key)
+
+
+def put_many(items):
+    # items = {key: value ที่ json ได้}
+    if not items:
+        return
+    now = time.time()
+    with _session() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            [(k, json.dumps(v, ensure_ascii=False), now, now) for k, v in items.items()],
+        )
+    evict()
+
+
+def put(key, value):
+    put_many({key: value})
+
+
+def evict(max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+    with _session() as conn:
+        conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - ttl,))
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (max_entries,),
+        )
@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import scoring_engine
+import cot_history
+from agent_004_whale import TARGET_MARKETS, positioning_status
+from price_cache import get_history
+
+# ==============================================================================
+# Backtest คำตัดสินของ War Room: แต้มของแต่ละ agent (COT / GLD flow / เทรนด์) ย้อนหลังรายวัน
+# สร้างใหม่จากข้อมูลดิบย้อนหลัง (ราคา GC=F, ราคา/วอลุ่ม GLD, คลัง cot_history) ด้วยกฎเดียวกับ agent
+# วันที่ข้อมูลดิบยังไม่ครอบคลุม (วันล่าสุดที่ agent รันสด) ค่อยใช้ประวัติจาก history_store
+# -> ถือสถานะตาม position ของช่วงคำตัดสิน -> กำไรจากผลตอบแทนวันถัดไปของ GC=F
+# ทุกชุดพารามิเตอร์ในก้อนเดียวคิดพร้อมกันด้วยเมทริกซ์ (วัน x ชุดพารามิเตอร์) ไม่วนทีละวัน
+# แล้วกระจายก้อนไปหลาย process
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+OUTPUT_FILE = os.path.join(DATA_DIR, 'backtest_results.csv')
+
+SYMBOL = "GC=F"
+GLD_SYMBOL = "GLD"
+SMA_FAST, SMA_SLOW = 10, 50   # เส้นเดียวกับที่ classify_trend ใช้
+COT_RELEASE_LAG_DAYS = 3      # COT ของวันอังคารประกาศวันศุกร์ -> ใช้ได้ตั้งแต่วันประกาศ (ไม่แอบดูอนาคต)
+TRADING_DAYS = 252
+COST_BPS = 2.0          # ค่าใช้จ่ายต่อการเปลี่ยนสถานะ 1 หน่วย (basis points)
+BATCH_SIZE = 512        # ชุดพารามิเตอร์ต่อก้อนที่ส่งให้แต่ละ process
+
+# ช่วงค่าที่ใช้ sweep
+WEIGHT_GRID = [0.0, 0.5, 1.0, 1.5, 2.0]
+THRESHOLD_GRID = list(range(-9, 10))
+
+# ข้อมูลที่ทุกก้อนใช้ร่วมกัน: ส่งให้แต่ละ process ครั้งเดียวตอนเริ่ม ไม่ pickle ซ้ำทุกก้อน
+_shared = {}
+
+
+def _daily(frame):
+    frame = frame.copy()
+    frame.index = frame.index.normalize()
+    return frame[~frame.index.duplicated(keep='last')]
+
+
+def trend_history(closes):
+    # กฎเดียวกับ classify_trend (ราคาเทียบ SMA10/SMA50) แต่คิดทุกวันในครั้งเดียว
+    # คืนแค่คำที่กฎใน scoring.json อ่าน; วันที่ SMA ยังไม่ครบ = ไม่มีข้อมูล
+    ma_fast = closes.rolling(SMA_FAST).mean()
+    ma_slow = closes.rolling(SMA_SLOW).mean()
+    labels = np.select(
+        [(closes > ma_fast) & (closes > ma_slow), (closes < ma_fast) & (closes < ma_slow), closes > ma_fast],
+        ["UPTREND", "DOWNTREND", "RECOVERY"], default="CORRECTION")
+    return pd.Series(labels, index=closes.index, dtype=object).where(ma_slow.notna())
+
+
+def spdr_history(years):
+    # กฎเดียวกับ agent_005_spdr: ปิดบวกจากวันก่อน = BUY ไม่งั้น SELL (ข้ามวันที่ไม่มีวอลุ่ม)
+    hist = _daily(get_history(GLD_SYMBOL, period=f"{years}y"))
+    change = hist['Close'].diff()
+    labels = np.where(change > 0, "BUY", "SELL")
+    return pd.Series(labels, index=hist.index, dtype=object).where(change.notna() & (hist['Volume'] > 0))
+
+
+def whale_history(market):
+    # สถานะกองทุนรายสัปดาห์จากคลัง cot_history ด้วย positioning_status ตัวเดียวกับ agent_004_whale
+    codes = [code for code, name in TARGET_MARKETS.items() if name == market]
+    store = cot_history.load_store(columns=["Date", "MM_Net", "Net_Pct_3Y"], codes=codes)
+    if store.empty:
+        return pd.Series(dtype=object)
+    days = pd.to_datetime(store['Date']) + pd.Timedelta(days=COT_RELEASE_LAG_DAYS)
+    labels = [positioning_status(net, pct) for net, pct in zip(store['MM_Net'], store['Net_Pct_3Y'])]
+    return pd.Series(labels, index=days, dtype=object).groupby(level=0).last()
+
+
+def load_signals(config, prices, start=None, end=None, years=10):
+    # {ชื่อ signal: Series ข้อความรายวัน}: ข้อมูลดิบย้อนหลังก่อน ต่อท้ายด้วยวันสดจาก history_store
+    builders = {
+        "whale": lambda signal: whale_history(signal.get('where', {}).get('Market', 'GOLD')),
+        "spdr": lambda signal: spdr_history(years),
+        "trend": lambda signal: trend_history(prices),
+    }
+    live = scoring_engine.load_signal_history(config, start, end)
+    series = {}
+    for name, signal in config['signals'].items():
+        past = builders[name](signal).dropna() if name in builders else pd.Series(dtype=object)
+        recent = live.get(name, pd.Series(dtype=object))
+        if len(past) and len(recent):
+            recent = recent[recent.index > past.index.max()]
+        series[name] = pd.concat([past, recent]) if len(recent) else past
+    return series
+
+
+def load_inputs(config, start=None, end=None, years=10):
+    # คืน (แต้มดิบ [วัน x agent], ผลตอบแทนวันถัดไป [วัน]) บนวันทำการของ GC=F
+    prices = _daily(get_history(SYMBOL, period=f"{years}y")['Close'].dropna())
+    aligned = scoring_engine.align_signals(config, load_signals(config, prices, start, end, years))
+    raw = scoring_engine.points_frame(config, aligned)
+
+    # สัญญาณของวัน t ใช้ถือจากราคาปิดวัน t ถึงราคาปิดวัน t+1 (ไม่แอบดูอนาคต)
+    forward = prices.shift(-1) / prices - 1
+
+    raw = raw.reindex(prices.index).fillna(0.0)
+    keep = forward.notna() & raw.index.isin(aligned.index)
+    if start:
+        keep &= raw.index >= pd.Timestamp(start)
+    if end:
+        keep &= raw.index <= pd.Timestamp(end)
+    return raw[keep], forward[keep]
+
+
+def baseline_params(config):
+    bounded = [b for b in config['bands'] if b['min'] is not None]
+    return {"weights": scoring_engine.weights_vector(config), "mins": np.array([b['min'] for b in bounded], dtype=float)}
+
+
+def grid_params(n_signals, n_bands):
+    # ทุกชุดน้ำหนัก x ทุกชุดเกณฑ์ที่เรียงจากสูงไปต่ำจริงๆ
+    weights = np.array(list(itertools.product(WEIGHT_GRID, repeat=n_signals)), dtype=float)
+    mins = np.array([c[::-1] for c in itertools.combinations(THRESHOLD_GRID, n_bands)], dtype=float)
+    w_idx, m_idx = np.meshgrid(np.arange(len(weights)), np.arange(len(mins)), indexing='ij')
+    return weights[w_idx.ravel()], mins[m_idx.ravel()]
+
+
+def random_params(n_signals, n_bands, samples, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = rng.uniform(0, max(WEIGHT_GRID), size=(samples, n_signals))
+    mins = -np.sort(-rng.uniform(min(THRESHOLD_GRID), max(THRESHOLD_GRID), size=(samples, n_bands)), axis=1)
+    return weights, mins
+
+
+def evaluate_batch(raw, forward, weights, mins, inclusive, positions, cost_bps=COST_BPS):
+    # raw [T x S], forward [T], weights [K x S], mins [K x B] -> ตัวชี้วัดของ K ชุดพร้อมกัน
+    scores = raw @ weights.T                                   # [T x K]
+    held = np.full(scores.shape, positions[-1])
+    # ไล่จากช่วงต่ำขึ้นสูง: ช่วงที่สูงกว่าทับค่าเดิม -> ได้ช่วงที่สูงสุดที่ผ่านเกณฑ์
+    for b in range(mins.shape[1] - 1, -1, -1):
+        hit = scores >= mins[:, b] if inclusive[b] else scores > mins[:, b]
+        held = np.where(hit, positions[b], held)
+
+    turnover = np.abs(np.diff(held, axis=0, prepend=0.0))
+    pnl = held * forward[:, None] - turnover * cost_bps / 10000.0
+    equity = np.cumprod(1.0 + pnl, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1.0
+
+    active = held != 0
+    n_active = active.sum(axis=0)
+    std = pnl.std(axis=0)
+    years = len(forward) / TRADING_DAYS
+    return {
+        "total_return": equity[-1] - 1.0,
+        # พอร์ตติดลบ/หมดตัว (equity <= 0) -> CAGR = -100% แทน NaN จากการถอดรากเลขลบ
+        "cagr": np.maximum(equity[-1], 0.0) ** (1.0 / years) - 1.0 if years > 0 else np.zeros(len(weights)),
+        "sharpe": np.divide(pnl.mean(axis=0), std, out=np.zeros_like(std), where=std > 0) * np.sqrt(TRADING_DAYS),
+        "max_drawdown": drawdown.min(axis=0),
+        "hit_rate": np.divide(((pnl > 0) & active).sum(axis=0), n_active,
+                              out=np.zeros(len(weights)), where=n_active > 0),
+        "exposure": n_active / len(forward),
+        "trades": (turnover > 0).sum(axis=0),
+    }
+
+
+def _init_worker(raw, forward, inclusive, positions, cost_bps):
+    _shared.update(raw=raw, forward=forward, inclusive=inclusive, positions=positions, cost_bps=cost_bps)
+
+
+def _run_batch(args):
+    weights, mins = args
+    return evaluate_batch(_shared['raw'], _shared['forward'], weights, mins,
+                          _shared['inclusive'], _shared['positions'], _shared['cost_bps'])
+
+
+def sweep(raw, forward, config, weights, mins, workers=None, cost_bps=COST_BPS):
+    # คืนตารางผลของทุกชุดพารามิเตอร์ เรียงตาม Sharpe
+    bounded = [b for b in config['bands'] if b['min'] is not None]
+    inclusive = [b['inclusive'] for b in bounded]
+    positions = np.array([b.get('position', 0.0) for b in bounded] + [config['bands'][-1].get('position', 0.0)])
+    raw_values = raw.to_numpy(dtype=float)
+    forward_values = forward.to_numpy(dtype=float)
+
+    batches = [(weights[i:i + BATCH_SIZE], mins[i:i + BATCH_SIZE]) for i in range(0, len(weights), BATCH_SIZE)]
+    init_args = (raw_values, forward_values, inclusive, positions, cost_bps)
+    if workers == 1 or len(batches) == 1:
+        _init_worker(*init_args)
+        results = [_run_batch(b) for b in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            results = list(pool.map(_run_batch, batches))
+
+    table = pd.DataFrame({k: np.concatenate([r[k] for r in results]) for k in results[0]})
+    for i, name in enumerate(raw.columns):
+        table.insert(i, f"w_{name}", weights[:, i])
+    for i, band in enumerate(bounded):
+        table.insert(len(raw.columns) + i, f"min_{band['key']}", mins[:, i])
+    return table.sort_values("sharpe", ascending=False, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest คำตัดสิน War Room เทียบผลตอบแทน GC=F")
+    parser.add_argument("--mode", choices=["grid", "random"], default="random")
+    parser.add_argument("--samples", type=int, default=5000, help="จำนวนชุดพารามิเตอร์ (โหมด random)")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cost-bps", type=float, default=COST_BPS)
+    args = parser.parse_args(argv)
+
+    config = scoring_engine.load_config()
+    raw, forward = load_inputs(config, args.start, args.end, args.years)
+    if len(forward) < 2:
+        print("⚠️ ข้อมูลย้อนหลังไม่พอ (เช็คราคา GC=F/GLD และรัน cot_history ingest ก่อน)")
+        return None
+    print(f"📚 ข้อมูล {len(forward)} วันทำการ ({forward.index[0]:%Y-%m-%d} → {forward.index[-1]:%Y-%m-%d})")
+
+    base = baseline_params(config)
+    n_signals, n_bands = len(raw.columns), len(base['mins'])
+    if args.mode == "grid":
+        weights, mins = grid_params(n_signals, n_bands)
+    else:
+        weights, mins = random_params(n_signals, n_bands, args.samples)
+    # ชุดปัจจุบันใน config อยู่แถวแรกเสมอ ไว้เทียบ
+    weights = np.vstack([base['weights'], weights])
+    mins = np.vstack([base['mins'], mins])
+
+    started = time.perf_counter()
+    table = sweep(raw, forward, config, weights, mins, args.workers, args.cost_bps)
+    elapsed = time.perf_counter() - started
+    print(f"⚡ ทดสอบ {len(table):,} ชุดพารามิเตอร์ใน {elapsed:.2f} วินาที")
+
+    weight_cols = [f"w_{name}" for name in raw.columns]
+    min_cols = [c for c in table.columns if c.startswith("min_")]
+    is_base = np.isclose(table[weight_cols].to_numpy(), base['weights']).all(axis=1) & \
+        np.isclose(table[min_cols].to_numpy(), base['mins']).all(axis=1)
+    print("\n--- 📌 ชุดปัจจุบันใน config/scoring.json ---")
+    print(table[is_base].head(1).to_string(index=False))
+    print("\n--- 🏆 10 อันดับแรก (Sharpe) ---")
+    print(table.head(10).to_string(index=False))
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    table.to_csv(OUTPUT_FILE, index=False)
+    print(f"\n📂 บันทึกผลทั้งหมดที่: {OUTPUT_FILE}")
+    return table
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
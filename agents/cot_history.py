@@ -0,0 +1,310 @@
+import io
+import os
+import sys
+import csv
+import json
+import mmap
+import time
+import zipfile
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import agent_004_whale as whale
+
+# ==============================================================================
+# คลังประวัติ COT หลายปีของทุกตลาดในรายงาน (GOLD, MICRO GOLD, SILVER, PLATINUM, PALLADIUM ...)
+# - ไฟล์รายงาน fixed-width แบบเดียวกับ agents/deacomes.txt หรือไฟล์ประวัติรายปีแบบคั่นจุลภาคของ CFTC
+#   (fut_disagg_txt_YYYY.zip / com_disagg_txt_YYYY.zip) หรือ .zip ที่มีไฟล์แบบนั้นข้างใน
+#   วางไว้ใน data/cot_archive/ -> แกะขนานกันหลาย process (ไฟล์ละงาน)
+# - เก็บเป็น parquet ไฟล์เดียว เรียงตาม (CFTC_Code, Date) = 1 แถวต่อตลาดต่อสัปดาห์ (ซ้ำ = ใช้ไฟล์หลังสุด)
+# - ตัวชี้วัดของ Managed Money คิดทุกตลาดในรอบเดียวตอน ingest แล้วเก็บลงคลังด้วย
+#   -> ฝั่ง agent อ่านแถวล่าสุดของตลาดที่สนใจได้ในไม่กี่ ms ไม่ต้องคำนวณใหม่
+#
+#   python agents/cot_history.py                   # ingest ไฟล์ใหม่ใน data/cot_archive + รายงานล่าสุด
+#   python agents/cot_history.py --rebuild         # แกะทุกไฟล์ใหม่หมด
+#   python agents/cot_history.py --market 088691   # ดูประวัติของตลาดเดียว
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'cot_archive')
+STORE_FILE = os.path.join(DATA_DIR, 'cot_history', 'cot_positions.parquet')
+MANIFEST_FILE = os.path.join(DATA_DIR, 'cache', 'cot_archive_manifest.json')  # ไฟล์ที่ ingest แล้ว (ขนาด + mtime)
+
+WINDOW_DAYS = 3 * 365   # หน้าต่างเทียบสถานะ 3 ปี
+MIN_WEEKS = 52          # ประวัติน้อยกว่านี้ยังไม่คิดเปอร์เซ็นไทล์/z-score
+KEY_COLUMNS = ["CFTC_Code", "Date"]
+STORE_COLUMNS = KEY_COLUMNS + [
+    "Market", "Open_Interest", "MM_Long", "MM_Short", "MM_Spread", "MM_Net",
+    "Producer_Net", "Swap_Net", "Other_Net", "MM_Long_Pct_OI", "MM_Short_Pct_OI",
+    "MM_Traders_Long", "MM_Traders_Short", "Source",
+]
+DERIVED_COLUMNS = ["Net_Change_WoW", "Net_Pct_3Y", "Net_Z_3Y"]
+
+# ไฟล์ประวัติแบบคั่นจุลภาคของ CFTC: ชื่อช่องที่ใช้ -> หัวคอลัมน์ในไฟล์ (บางปีสะกดไม่เหมือนกัน ลองตามลำดับ)
+CSV_HEADER = b"Market_and_Exchange_Names"
+CSV_FIELDS = {
+    "CFTC_Code": ("CFTC_Contract_Market_Code",),
+    "Date": ("Report_Date_as_YYYY-MM-DD",),
+    "Market": ("Market_and_Exchange_Names",),
+    "Open_Interest": ("Open_Interest_All",),
+    "MM_Long": ("M_Money_Positions_Long_All",),
+    "MM_Short": ("M_Money_Positions_Short_All",),
+    "MM_Spread": ("M_Money_Positions_Spread_All",),
+    "Producer_Long": ("Prod_Merc_Positions_Long_All",),
+    "Producer_Short": ("Prod_Merc_Positions_Short_All",),
+    "Swap_Long": ("Swap_Positions_Long_All",),
+    "Swap_Short": ("Swap__Positions_Short_All", "Swap_Positions_Short_All"),
+    "Other_Long": ("Other_Rept_Positions_Long_All",),
+    "Other_Short": ("Other_Rept_Positions_Short_All",),
+    "MM_Long_Pct_OI": ("Pct_of_OI_M_Money_Long_All",),
+    "MM_Short_Pct_OI": ("Pct_of_OI_M_Money_Short_All",),
+    "MM_Traders_Long": ("Traders_M_Money_Long_All",),
+    "MM_Traders_Short": ("Traders_M_Money_Short_All",),
+}
+
+
+def _flat_row(record, source):
+    pos, pct, traders = record["positions"], record["pct_oi"], record["traders"]
+    return (
+        record["CFTC_Code"], record["Report_Date"], record["Market"], record["Open_Interest"],
+        pos["MM_Long"], pos["MM_Short"], pos["MM_Spread"], pos["MM_Long"] - pos["MM_Short"],
+        pos["Producer_Long"] - pos["Producer_Short"], pos["Swap_Long"] - pos["Swap_Short"],
+        pos["Other_Long"] - pos["Other_Short"], pct["MM_Long"], pct["MM_Short"],
+        traders["MM_Long"], traders["MM_Short"], source,
+    )
+
+
+def parse_report(content, source):
+    # รายงานหนึ่งก้อน (mmap หรือ bytes) -> ทุกบล็อกของทุกตลาดทุกสัปดาห์เป็น tuple ตาม STORE_COLUMNS
+    rows = []
+    for code, entries in whale.build_cot_index(content).items():
+        for report_date, offset in entries:
+            if report_date is None:
+                continue
+            try:
+                record = whale.parse_cot_block(content, offset)
+            except (ValueError, KeyError, IndexError):
+                continue  # บล็อกที่ผิดรูปแบบ (เช่นตลาดที่ไม่มีแถว Managed Money) ข้ามเฉพาะบล็อกนั้น
+            if "positions" not in record or "traders" not in record or "pct_oi" not in record:
+                continue
+            record["Report_Date"] = report_date
+            rows.append(_flat_row(record, source))
+    return rows
+
+
+def is_csv_report(content):
+    # ไฟล์คั่นจุลภาคขึ้นต้นด้วยหัวคอลัมน์ (อาจมีเครื่องหมายคำพูด/BOM) ; fixed-width ขึ้นต้นด้วยชื่อรายงาน
+    return content[:64].lstrip(b"\xef\xbb\xbf \r\n\"").startswith(CSV_HEADER)
+
+
+def parse_csv_report(content, source):
+    # ไฟล์ประวัติรายปีแบบคั่นจุลภาค: 1 แถว = 1 ตลาด 1 สัปดาห์ -> tuple ตาม STORE_COLUMNS
+    from datetime import date
+
+    reader = csv.DictReader(io.TextIOWrapper(io.BytesIO(bytes(content)), encoding="utf-8-sig", errors="ignore"))
+    header = set(reader.fieldnames or [])
+    fields = {}
+    for name, candidates in CSV_FIELDS.items():
+        found = next((c for c in candidates if c in header), None)
+        if found is None:
+            print(f"   ⚠️ cot_history: {source} ไม่มีคอลัมน์ {candidates[0]}")
+            return []
+        fields[name] = found
+
+    rows = []
+    for row in reader:
+        try:
+            value = {name: row[col].strip() for name, col in fields.items()}
+            number = {name: whale._to_number(value[name]) for name in CSV_FIELDS
+                      if name not in ("CFTC_Code", "Date", "Market", "MM_Long_Pct_OI", "MM_Short_Pct_OI")}
+            rows.append((
+                value["CFTC_Code"], date.fromisoformat(value["Date"]),
+                value["Market"].split(" - ")[0].strip(), number["Open_Interest"],
+                number["MM_Long"], number["MM_Short"], number["MM_Spread"], number["MM_Long"] - number["MM_Short"],
+                number["Producer_Long"] - number["Producer_Short"], number["Swap_Long"] - number["Swap_Short"],
+                number["Other_Long"] - number["Other_Short"],
+                whale._to_number(value["MM_Long_Pct_OI"], float), whale._to_number(value["MM_Short_Pct_OI"], float),
+                number["MM_Traders_Long"], number["MM_Traders_Short"], source,
+            ))
+        except (ValueError, AttributeError):
+            continue  # แถวที่ผิดรูปแบบ ข้ามเฉพาะแถวนั้น
+    return rows
+
+
+def _parse_content(content, source):
+    if is_csv_report(content):
+        return parse_csv_report(content, source)
+    return parse_report(content, source)
+
+
+def parse_archive_file(path):
+    # งานของแต่ละ process: ไฟล์ .txt/.csv เปิดด้วย mmap ; .zip แกะทุกไฟล์ข้างในทีละไฟล์
+    # (ทั้งสองแบบดูจากหัวไฟล์ว่าเป็น fixed-width หรือคั่นจุลภาค)
+    source = os.path.basename(path)
+    if path.lower().endswith(".zip"):
+        rows = []
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if not name.endswith("/"):
+                    rows.extend(_parse_content(archive.read(name), f"{source}:{name}"))
+        return rows
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _parse_content(mm, source)
+
+
+def archive_files(archive_dir=None):
+    archive_dir = archive_dir or ARCHIVE_DIR
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(os.path.join(archive_dir, name) for name in os.listdir(archive_dir)
+                  if name.lower().endswith((".txt", ".csv", ".zip")))
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_FILE), exist_ok=True)
+    with open(MANIFEST_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(MANIFEST_FILE + ".tmp", MANIFEST_FILE)
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_store(columns=None, codes=None):
+    # อ่านคลัง (เฉพาะคอลัมน์/ตลาดที่ขอ) เป็น DataFrame เรียงตาม (CFTC_Code, Date)
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(STORE_FILE):
+        return pd.DataFrame(columns=columns or STORE_COLUMNS + DERIVED_COLUMNS)
+    filters = [("CFTC_Code", "in", list(codes))] if codes else None
+    return pq.read_table(STORE_FILE, columns=columns, filters=filters).to_pandas()
+
+
+def save_store(frame):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(STORE_FILE), exist_ok=True)
+    # เรียงตาม CFTC_Code แล้ว row group ละ 4096 แถว (~4 ตลาด x 20 ปี)
+    # -> filter ตาม CFTC_Code ข้าม row group ที่ไม่เกี่ยวได้จากสถิติ min/max
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    pq.write_table(table, STORE_FILE + ".tmp", row_group_size=4096)
+    os.replace(STORE_FILE + ".tmp", STORE_FILE)
+
+
+def compute_positioning(frame):
+    # ตัวชี้วัดของทุกตลาดในรอบเดียว: กางเป็นตาราง (สัปดาห์ x ตลาด) แล้วใช้ rolling ทั้งตาราง
+    # - Net_Change_WoW : MM_Net เทียบสัปดาห์ก่อนหน้า
+    # - Net_Pct_3Y     : MM_Net อยู่เปอร์เซ็นไทล์ที่เท่าไหร่ของ 3 ปีที่ผ่านมา (0-1)
+    # - Net_Z_3Y       : ห่างค่าเฉลี่ย 3 ปีกี่ส่วนเบี่ยงเบนมาตรฐาน
+    wide = frame.pivot(index="Date", columns="CFTC_Code", values="MM_Net").astype("float64").sort_index()
+    window = wide.rolling(f"{WINDOW_DAYS}D", min_periods=MIN_WEEKS)
+    derived = {
+        "Net_Change_WoW": wide.diff(),
+        "Net_Pct_3Y": window.rank(pct=True),
+        "Net_Z_3Y": (wide - window.mean()) / window.std(),
+    }
+    # กลับเป็นแถวยาวด้วยตำแหน่ง (แถว = สัปดาห์, คอลัมน์ = ตลาด) ของแต่ละแถวเดิม
+    rows = wide.index.get_indexer(frame["Date"])
+    cols = wide.columns.get_indexer(frame["CFTC_Code"])
+    out = frame.copy()
+    for name, table in derived.items():
+        out[name] = table.to_numpy()[rows, cols]
+    return out
+
+
+def ingest(paths=None, rebuild=False, workers=None):
+    # แกะเฉพาะไฟล์ที่ใหม่/เปลี่ยนตั้งแต่รอบก่อน -> รวมเข้าคลัง -> คิดตัวชี้วัดใหม่ทั้งคลัง
+    # คืนจำนวนแถวที่แกะได้ในรอบนี้ (0 = ไม่มีอะไรเปลี่ยน)
+    import pandas as pd
+
+    paths = [os.path.abspath(p) for p in (paths if paths is not None else archive_files() + [whale.REPORT_FILE])
+             if os.path.exists(p)]
+    manifest = {} if rebuild else load_manifest()
+    todo = [p for p in paths if manifest.get(p) != _signature(p)]
+    if not todo and os.path.exists(STORE_FILE):
+        return 0
+
+    if workers == 1 or len(todo) <= 1:
+        results = [parse_archive_file(p) for p in todo]
+    else:
+        # spawn แทน fork: ถูกเรียกจาก thread ของ orchestrator/scheduler ได้ fork ตอนที่ thread อื่นถือ lock อยู่
+        # (metrics, latest_record) -> process ลูกค้างตลอดกาล
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = list(pool.map(parse_archive_file, todo))
+    for path, rows in zip(todo, results):
+        if not rows:
+            # รูปแบบไฟล์ที่ไม่รู้จัก / ไฟล์ว่าง -> บอกให้รู้ แทนที่จะถูกจดว่า ingest แล้วแบบเงียบๆ
+            print(f"   ⚠️ cot_history: {os.path.basename(path)} แกะได้ 0 แถว (รูปแบบไฟล์ไม่ตรง?)")
+
+    new_rows = pd.DataFrame([row for rows in results for row in rows], columns=STORE_COLUMNS)
+    new_rows["Date"] = pd.to_datetime(new_rows["Date"])
+    old = pd.DataFrame(columns=STORE_COLUMNS) if rebuild else load_store(columns=STORE_COLUMNS)
+    if new_rows.empty and old.empty:
+        return 0
+    frame = pd.concat([old, new_rows], ignore_index=True) if len(old) else new_rows
+    frame = frame.drop_duplicates(KEY_COLUMNS, keep="last").sort_values(KEY_COLUMNS, ignore_index=True)
+    save_store(compute_positioning(frame))
+
+    for path in todo:
+        manifest[path] = _signature(path)
+    save_manifest(manifest)
+    return len(new_rows)
+
+
+def latest_positioning(codes):
+    # แถวล่าสุดของแต่ละตลาดที่ขอ -> {code: dict}
+    frame = load_store(codes=codes)
+    if frame.empty:
+        return {}
+    latest = frame.sort_values(KEY_COLUMNS).groupby("CFTC_Code").tail(1)
+    return {row["CFTC_Code"]: row for row in latest.to_dict("records")}
+
+
+def print_latest(frame):
+    latest = frame.sort_values(KEY_COLUMNS).groupby("CFTC_Code").tail(1).sort_values("Net_Pct_3Y", ascending=False)
+    print(f"{'ตลาด':<34} {'วันที่':<10} {'MM Net':>10} {'WoW':>9} {'Pct 3Y':>7} {'Z 3Y':>6}")
+    for row in latest.itertuples():
+        pct = f"{row.Net_Pct_3Y:.0%}" if row.Net_Pct_3Y == row.Net_Pct_3Y else "-"
+        z = f"{row.Net_Z_3Y:+.2f}" if row.Net_Z_3Y == row.Net_Z_3Y else "-"
+        wow = f"{row.Net_Change_WoW:+,.0f}" if row.Net_Change_WoW == row.Net_Change_WoW else "-"
+        print(f"{row.Market[:34]:<34} {row.Date:%Y-%m-%d} {row.MM_Net:>10,} {wow:>9} {pct:>7} {z:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="คลังประวัติ COT หลายปี + ตัวชี้วัดสถานะ Managed Money ทุกตลาด")
+    parser.add_argument("paths", nargs="*", help="ไฟล์รายงาน (ค่าเริ่มต้น: ทุกไฟล์ใน data/cot_archive + รายงานล่าสุด)")
+    parser.add_argument("--rebuild", action="store_true", help="ไม่สนไฟล์ที่เคย ingest แล้ว แกะใหม่ทั้งหมด")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--market", help="แสดงประวัติของ CFTC Code นี้")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    added = ingest(args.paths or None, rebuild=args.rebuild, workers=args.workers)
+    print(f"📚 ingest {added:,} แถวใน {time.perf_counter() - started:.2f} วินาที -> {STORE_FILE}")
+
+    if args.market:
+        history = load_store(codes=[args.market])
+        print(history[["Date", "Market", "MM_Net", *DERIVED_COLUMNS]].tail(30).to_string(index=False))
+        sys.exit(0)
+    store = load_store()
+    if store.empty:
+        print("⚠️ คลังยังว่าง (วางไฟล์รายงานไว้ใน data/cot_archive ก่อน)")
+        sys.exit(0)
+    print_latest(store)
@@ -0,0 +1,317 @@
+import os
+import re
+import sys
+import csv
+import time
+import signal
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+from price_cache import get_quote, get_history
+from history_store import append_records
+import metrics
+
+# ==============================================================================
+# เก็บราคาตามปฏิทินข่าว: ช่วงใกล้ข่าวแดง USD (CPI / NFP / FOMC ...) เก็บราคาสดถี่ทุกไม่กี่วินาที
+# นอกช่วงไม่ยิงอะไรเลย แค่ตื่นมาดูปฏิทินเป็นระยะ -> งบการยิง Yahoo ไปลงตรงช่วงที่ราคาวิ่งจริง
+# จบหน้าต่างของข่าวแล้วดึงแท่ง 1 นาทีมาสรุปราคาก่อน/หลังข่าว (เวลาแท่งมาจากตลาด ไม่ใช่นาฬิกาเครื่อง
+# และไม่โดนความหน่วงของ quote) เก็บคู่กับ Forecast / Previous ของข่าวนั้น
+# tick สดช่วงข่าวเก็บไว้ดูตอนข่าวออก และใช้สรุปแทนเฉพาะตอนที่ไม่มีแท่ง 1 นาทีของช่วงนั้นแล้ว
+#
+#   python agents/event_sampler.py           # วนเก็บไปเรื่อยๆ (Ctrl+C หยุด)
+#   python agents/event_sampler.py --plan    # ดูหน้าต่างเก็บถี่ที่จะมาถึง + งบการยิงต่อสัปดาห์
+#   python agents/event_sampler.py --once    # เก็บ 1 ครั้ง + สรุปข่าวที่จบหน้าต่างแล้ว
+#
+# เวลาทั้งหมดเป็น UTC แบบไม่มี tz (ตรงกับ Event_Time ที่ agent_003_macro เขียนไว้)
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+CALENDAR_FILE = os.path.join(DATA_DIR, 'economic_calendar.csv')
+OUTPUT_FILE = os.path.join(DATA_DIR, 'event_reactions.csv')
+TICKS_DIR = os.path.join(DATA_DIR, 'cache', 'price_ticks')  # ราคาทุกครั้งที่เก็บ แยกไฟล์รายวัน
+AGENT_NAME = "event_sampler"  # ป้าย agent ใน metrics
+
+SYMBOL = "GC=F"
+BURST_COUNTRIES = {"USD"}
+BURST_IMPACTS = {"High"}
+PRE_MINUTES = 15        # เริ่มเก็บถี่ก่อนข่าวออกกี่นาที
+POST_MINUTES = 30       # เก็บถี่ต่อหลังข่าวออกกี่นาที
+BURST_SECONDS = 5       # ระยะห่างการเก็บในหน้าต่างข่าว
+IDLE_SECONDS = 300      # นอกหน้าต่าง: ตื่นมาอ่านปฏิทิน/สรุปข่าวที่ค้างทุกเท่านี้ (ไม่ดึงราคา)
+REACTION_MINUTES = [1, 5, 15, 30]  # จุดวัดราคาหลังข่าว
+BAR_INTERVAL = "1m"
+BARS_PERIOD = "5d"      # Yahoo เก็บแท่ง 1 นาทีย้อนหลังราว 7 วัน -> หยุดไปไม่กี่วันก็ยังสรุปย้อนได้
+BARS_GRACE_MINUTES = 120  # แท่งยังมาไม่ครบหลังหน้าต่างปิดเกินนี้ -> สรุปจาก tick สดแทน
+
+OUTPUT_COLUMNS = ["Event_Id", "Date", "Event_Time", "Title", "Forecast", "Previous", "Price_Pre"] + \
+    [f"Price_Post_{m}m" for m in REACTION_MINUTES] + \
+    ["Move_5m_Pct", "Move_30m_Pct", "Max_Up_Pct", "Max_Down_Pct", "Samples"]
+
+# ปฏิทินที่อ่านแล้ว: (mtime_ns, events) อ่านใหม่เฉพาะตอนไฟล์เปลี่ยน
+_calendar = {"mtime": None, "events": []}
+
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def event_id(event):
+    slug = re.sub(r'[^a-z0-9]+', '-', event['Title'].lower()).strip('-')
+    return f"{event['Event_Time']:%Y%m%dT%H%M}_{slug}"
+
+
+def load_events(path=None):
+    # ข่าวที่ต้องเก็บถี่ (ประเทศ/ความแรงตามด้านบน และรู้เวลาออกแน่นอน) เรียงตามเวลา
+    path = path or CALENDAR_FILE
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return []
+    if _calendar["mtime"] == mtime:
+        return _calendar["events"]
+
+    events = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if row.get('Country') not in BURST_COUNTRIES or row.get('Impact') not in BURST_IMPACTS:
+                continue
+            if not row.get('Event_Time'):
+                continue  # All Day / Tentative: ไม่รู้ว่าจะเปิดหน้าต่างตอนไหน
+            row['Event_Time'] = datetime.fromisoformat(row['Event_Time'])
+            row['Event_Id'] = event_id(row)
+            events.append(row)
+    events.sort(key=lambda e: e['Event_Time'])
+    _calendar.update(mtime=mtime, events=events)
+    return events
+
+
+def window(event):
+    return (event['Event_Time'] - timedelta(minutes=PRE_MINUTES),
+            event['Event_Time'] + timedelta(minutes=POST_MINUTES))
+
+
+def active_events(events, now):
+    return [e for e in events if window(e)[0] <= now <= window(e)[1]]
+
+
+def next_interval(events, now):
+    # อยู่ในหน้าต่างข่าว -> ถี่ ; นอกหน้าต่าง -> ห่าง แต่ไม่ข้ามจุดเริ่มหน้าต่างถัดไป
+    if active_events(events, now):
+        return BURST_SECONDS
+    upcoming = [window(e)[0] for e in events if window(e)[0] > now]
+    if upcoming:
+        return max(1.0, min(IDLE_SECONDS, (upcoming[0] - now).total_seconds()))
+    return IDLE_SECONDS
+
+
+def append_tick(moment, price, ids):
+    os.makedirs(TICKS_DIR, exist_ok=True)
+    path = os.path.join(TICKS_DIR, f"{moment:%Y-%m-%d}.csv")
+    new_file = not os.path.exists(path)
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["Time", "Price", "Events"])
+        writer.writerow([moment.strftime("%Y-%m-%d %H:%M:%S"), price, " ".join(ids)])
+
+
+def load_ticks(start, end):
+    # [(เวลา, ราคา)] ในช่วง [start, end] (หน้าต่างอาจคร่อมเที่ยงคืน UTC -> อ่านทุกวันที่เกี่ยว)
+    ticks = []
+    day = start.date()
+    while day <= end.date():
+        path = os.path.join(TICKS_DIR, f"{day:%Y-%m-%d}.csv")
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    moment = datetime.fromisoformat(row['Time'])
+                    if start <= moment <= end and row['Price']:
+                        ticks.append((moment, float(row['Price'])))
+        day += timedelta(days=1)
+    return sorted(ticks)
+
+
+def load_bar_points(start, end):
+    # แท่ง 1 นาทีของช่วง [start, end] เป็น [(เวลาปิดแท่ง, ราคาปิด)] หรือ None ถ้าแท่งยังมาไม่ถึง end
+    # แท่งที่ขึ้นต้นเวลา t ครอบคลุม [t, t+1 นาที) -> ราคาปิดเป็นราคา ณ t+1 นาที
+    with metrics.timer("bars", agent=AGENT_NAME, upstream="yahoo"):
+        bars = get_history(SYMBOL, period=BARS_PERIOD, interval=BAR_INTERVAL)
+    if bars.empty:
+        return None
+    closes = bars['Close'].dropna()
+    ends = closes.index + timedelta(minutes=1)
+    points = [(t.to_pydatetime(), float(p)) for t, p in zip(ends, closes) if start <= t <= end]
+    if not points or points[-1][0] < end:
+        return None
+    return points
+
+
+def summarize_reaction(event, ticks):
+    # ticks = [(เวลา UTC, ราคา)] จากแท่ง 1 นาที (เวลาปิดแท่ง) หรือ tick สด
+    # ราคาก่อนข่าว = จุดสุดท้ายก่อนเวลาออก ; หลังข่าว n นาที = จุดแรกตั้งแต่นาทีนั้น
+    released = event['Event_Time']
+    before = [p for t, p in ticks if t <= released]
+    after = [(t, p) for t, p in ticks if t > released]
+    if not before or not after:
+        return None
+    pre = before[-1]
+
+    def price_at(minutes):
+        target = released + timedelta(minutes=minutes)
+        return next((p for t, p in after if t >= target), None)
+
+    def move(price):
+        return round((price - pre) / pre * 100, 3) if price is not None else None
+
+    record = {
+        "Event_Id": event['Event_Id'],
+        "Date": event['Date'],
+        "Event_Time": released.strftime("%Y-%m-%d %H:%M:%S"),
+        "Title": event['Title'],
+        "Forecast": event.get('Forecast', ''),
+        "Previous": event.get('Previous', ''),
+        "Price_Pre": pre,
+    }
+    for minutes in REACTION_MINUTES:
+        record[f"Price_Post_{minutes}m"] = price_at(minutes)
+    record["Move_5m_Pct"] = move(record["Price_Post_5m"])
+    record["Move_30m_Pct"] = move(record["Price_Post_30m"])
+    record["Max_Up_Pct"] = move(max(p for _, p in after))
+    record["Max_Down_Pct"] = move(min(p for _, p in after))
+    record["Samples"] = len(ticks)
+    return record
+
+
+def load_done_ids(path=None):
+    path = path or OUTPUT_FILE
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return {row['Event_Id'] for row in csv.DictReader(f)}
+
+
+def save_reactions(records, path=None):
+    path = path or OUTPUT_FILE
+    new_file = not os.path.exists(path)
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(records)
+    append_records("event_reactions", records)
+
+
+def finalize_events(events, now, done):
+    # ข่าวที่หน้าต่างปิดแล้วและยังไม่ได้สรุป -> คำนวณปฏิกิริยาราคาจากแท่ง 1 นาทีแล้วบันทึก
+    records = []
+    for event in events:
+        start, end = window(event)
+        if end > now or event['Event_Id'] in done:
+            continue
+        try:
+            points = load_bar_points(start, end)
+        except Exception as e:
+            print(f"   ⚠️ ดึงแท่ง 1 นาทีไม่สำเร็จ: {e}")
+            points = None
+        if points is None:
+            if now - end < timedelta(minutes=BARS_GRACE_MINUTES):
+                continue  # แท่งของ Yahoo มาช้ากว่าราคาจริงเล็กน้อย -> รอบหน้าค่อยลองใหม่
+            points = load_ticks(start, end)
+        done.add(event['Event_Id'])
+        record = summarize_reaction(event, points)
+        if record is None:
+            print(f"   ⚠️ {event['Title']} ({event['Event_Time']:%m-%d %H:%M}): ไม่มีราคาก่อน/หลังข่าว ข้าม")
+            continue
+        records.append(record)
+        print(f"   📰 {record['Title']}: ${record['Price_Pre']} -> 5 นาที {record['Move_5m_Pct']}% | "
+              f"30 นาที {record['Move_30m_Pct']}% (คาด {record['Forecast'] or '-'} / ก่อนหน้า {record['Previous'] or '-'})")
+    if records:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        save_reactions(records)
+        metrics.count("rows", len(records), stage="persist", agent=AGENT_NAME)
+    return records
+
+
+def sample_once(events, now):
+    # tick สดเฉพาะในหน้าต่างข่าว (นอกหน้าต่างไม่มีใครใช้ -> ไม่ยิง)
+    active = [e['Event_Id'] for e in active_events(events, now)]
+    if not active:
+        return None
+    stage = "burst"
+    try:
+        with metrics.timer(stage, agent=AGENT_NAME):
+            price = get_quote(SYMBOL)
+    except Exception as e:
+        metrics.count("errors", stage=stage, agent=AGENT_NAME)
+        print(f"   ❌ ดึงราคาไม่สำเร็จ: {e}")
+        return None
+    if price is None:
+        return None
+    append_tick(now, price, active)
+    metrics.count("samples", stage=stage, agent=AGENT_NAME)
+    return price
+
+
+def print_plan(events, now, days=7):
+    # หน้าต่างเก็บถี่ที่จะมาถึง + เทียบจำนวนครั้งที่ยิงกับการเก็บถี่ตลอดสัปดาห์
+    horizon = now + timedelta(days=days)
+    upcoming = [e for e in events if window(e)[1] >= now and e['Event_Time'] <= horizon]
+    print(f"🗓️  หน้าต่างเก็บถี่ {len(upcoming)} ข่าวใน {days} วันข้างหน้า "
+          f"(-{PRE_MINUTES}/+{POST_MINUTES} นาที ทุก {BURST_SECONDS} วิ, นอกหน้าต่างไม่ดึงราคา)")
+    for event in upcoming:
+        start, end = window(event)
+        print(f"   {start:%a %m-%d %H:%M} → {end:%H:%M} UTC  {event['Title']} "
+              f"(คาด {event.get('Forecast') or '-'} / ก่อนหน้า {event.get('Previous') or '-'})")
+
+    # tick สดในหน้าต่าง + ดึงแท่ง 1 นาที 1 ครั้งต่อข่าวตอนสรุป
+    burst_seconds = len(upcoming) * (PRE_MINUTES + POST_MINUTES) * 60
+    planned = burst_seconds / BURST_SECONDS + len(upcoming)
+    uniform = days * 86400 / BURST_SECONDS
+    print(f"   📡 ยิงราว {planned:,.0f} ครั้ง (ถ้าเก็บถี่ตลอด {uniform:,.0f} ครั้ง = ประหยัด {1 - planned / uniform:.0%})")
+
+
+def run_sampler(once=False):
+    print(f"\n⏱️  Event Sampler: เก็บราคา {SYMBOL} ตามปฏิทินข่าว ({datetime.now().strftime('%H:%M:%S')})")
+    done = load_done_ids()
+    stop = threading.Event()
+
+    def handle_stop(signum, frame):
+        print("\n🛑 ได้รับสัญญาณหยุด")
+        stop.set()
+
+    signal.signal(signal.SIGINT, handle_stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_stop)
+
+    was_burst = False
+    while not stop.is_set():
+        started = time.monotonic()
+        now = utc_now()
+        events = load_events()
+        active = active_events(events, now)
+        if active and not was_burst:
+            print(f"   🔥 เข้าหน้าต่างข่าว: {', '.join(e['Title'] for e in active)} -> เก็บทุก {BURST_SECONDS} วิ")
+        elif was_burst and not active:
+            print(f"   💤 ออกจากหน้าต่างข่าว -> หยุดดึงราคา รอสรุปจากแท่ง 1 นาที")
+        was_burst = bool(active)
+
+        sample_once(events, now)
+        finalize_events(events, now, done)
+        if once:
+            break
+        metrics.flush()
+        # นับเวลาที่ใช้ดึงราคาไปแล้วด้วย จังหวะจะได้ไม่เลื่อนช้าลงเรื่อยๆ
+        stop.wait(max(0.0, next_interval(events, utc_now()) - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="เก็บราคาถี่ช่วงข่าวแดงตามปฏิทินเศรษฐกิจ ห่างช่วงปกติ")
+    parser.add_argument("--once", action="store_true", help="เก็บ 1 ครั้งแล้วจบ")
+    parser.add_argument("--plan", action="store_true", help="แสดงหน้าต่างข่าวที่จะมาถึงแล้วจบ")
+    args = parser.parse_args()
+
+    if args.plan:
+        print_plan(load_events(), utc_now())
+        sys.exit(0)
+    run_sampler(once=args.once)
@@ -0,0 +1,264 @@
+import os
+import uuid
+from datetime import datetime
+
+# pandas/pyarrow import ในฟังก์ชันที่ใช้จริง: agent ที่ import โมดูลนี้ไว้บันทึกประวัติไม่ต้องโหลดตั้งแต่เปิดสคริปต์
+
+# --- ตั้งค่า Path ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+HISTORY_DIR = os.path.join(DATA_DIR, 'history')
+# ไฟล์จดวันที่รวม part ของวันก่อนๆ ไปแล้ว (ต่อ dataset) -> append_records รวมให้วันละครั้ง
+COMPACT_MARKER = ".compacted"
+
+# ==============================================================================
+# Schema ของแต่ละ agent: ชื่อคอลัมน์ -> ชนิดข้อมูลแบบ Arrow
+# partition_by = คอลัมน์เวลาที่ใช้แบ่งโฟลเดอร์รายวัน (date=YYYY-MM-DD)
+# คอลัมน์ที่ไม่ได้ประกาศ (เช่น ticker เสริมของ intermarket) จะถูกเก็บตามชนิดที่ pandas เดาได้
+# ==============================================================================
+SCHEMAS = {
+    "market_price": {
+        "partition_by": "Date",
+        "columns": {
+            "Date": "timestamp[s]", "Asset": "string", "Price": "float64", "Change": "float64",
+            "Pct_Change": "float64", "Trend": "string", "Signal": "string",
+            "MA10": "float64", "MA50": "float64", "EMA20": "float64", "RSI14": "float64",
+            "ATR14": "float64", "BB_Upper": "float64", "BB_Lower": "float64", "Momentum": "string",
+        },
+    },
+    "intermarket": {
+        "partition_by": "Date",
+        "columns": {
+            "Date": "timestamp[s]", "Gold_Price": "float64", "Gold_Chg": "float64",
+            "DXY_Price": "float64", "DXY_Chg": "float64", "Yield_Price": "float64", "Yield_Chg": "float64",
+            "Oil_Price": "float64", "BTC_Price": "float64",
+            "DXY_Correlation": "string", "Yield_Correlation": "string",
+        },
+    },
+    "spdr_flows": {
+        "partition_by": "Date",
+        "columns": {
+            "Date": "timestamp[s]", "Price": "float64", "Change": "float64",
+            "Volume": "int64", "Status": "string",
+        },
+    },
+    "whale_cot": {
+        "partition_by": "Date",
+        "columns": {
+            "Date": "timestamp[s]", "Market": "string", "CFTC_Code": "string", "Open_Interest": "int64",
+            "MM_Long": "int64", "MM_Short": "int64", "MM_Spread": "int64",
+            "Net_Position": "int64", "Net_Change": "int64",
+            "MM_Long_Pct_OI": "float64", "MM_Short_Pct_OI": "float64",
+            "MM_Traders_Long": "int64", "MM_Traders_Short": "int64",
+            "Producer_Net": "int64", "Swap_Net": "int64", "Other_Net": "int64",
+            "Net_Pct_3Y": "float64", "Net_Z_3Y": "float64", "Status": "string",
+        },
+    },
+    "economic_calendar": {
+        "partition_by": "Timestamp",
+        "columns": {
+            "Date": "string", "Time": "string", "Event_Time": "timestamp[s]", "Country": "string",
+            "Impact": "string", "Title": "string", "Thai_Title": "string",
+            "Forecast": "string", "Previous": "string", "Strategy": "string", "Timestamp": "timestamp[s]",
+        },
+    },
+    "event_reactions": {
+        "partition_by": "Event_Time",
+        "columns": {
+            "Event_Id": "string", "Date": "string", "Event_Time": "timestamp[s]", "Title": "string",
+            "Forecast": "string", "Previous": "string", "Price_Pre": "float64",
+            "Price_Post_1m": "float64", "Price_Post_5m": "float64", "Price_Post_15m": "float64",
+            "Price_Post_30m": "float64", "Move_5m_Pct": "float64", "Move_30m_Pct": "float64",
+            "Max_Up_Pct": "float64", "Max_Down_Pct": "float64", "Samples": "int64",
+        },
+    },
+    "political_intelligence": {
+        "partition_by": "Timestamp",
+        "columns": {
+            "Timestamp": "timestamp[s]", "Title": "string", "Matched_Keywords": "string",
+            "Link": "string", "Source": "string",
+        },
+    },
+}
+
+
+def _dataset_dir(dataset):
+    if dataset not in SCHEMAS:
+        raise ValueError(f"ไม่รู้จัก dataset: {dataset}")
+    return os.path.join(HISTORY_DIR, dataset)
+
+
+def _to_table(dataset, records):
+    import pandas as pd
+    import pyarrow as pa
+
+    spec = SCHEMAS[dataset]
+    df = pd.DataFrame(records)
+    fields = []
+    for name, type_name in spec["columns"].items():
+        arrow_type = pa.type_for_alias(type_name)
+        if name not in df.columns:
+            df[name] = None
+        if pa.types.is_timestamp(arrow_type):
+            df[name] = pd.to_datetime(df[name], errors="coerce").dt.floor("s")
+        elif pa.types.is_integer(arrow_type):
+            df[name] = pd.to_numeric(df[name], errors="coerce").round().astype("Int64")
+        elif pa.types.is_floating(arrow_type):
+            df[name] = pd.to_numeric(df[name], errors="coerce").astype("float64")
+        else:
+            df[name] = df[name].where(df[name].isna(), df[name].astype(str))
+        fields.append(pa.field(name, arrow_type))
+
+    extras = [c for c in df.columns if c not in spec["columns"]]
+    if extras:
+        fields.extend(pa.Table.from_pandas(df[extras], preserve_index=False).schema)
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+
+def append_records(dataset, records):
+    # เพิ่มข้อมูลต่อท้าย (ไม่เขียนทับประวัติ): 1 ครั้ง = 1 ไฟล์ part ในโฟลเดอร์ของวันนั้น
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not records:
+        return []
+    table = _to_table(dataset, records)
+    key = SCHEMAS[dataset]["partition_by"]
+    days = pd.Series(table.column(key).to_pandas()).dt.strftime("%Y-%m-%d").fillna("unknown")
+
+    written = []
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    for day in sorted(days.unique()):
+        part = table.filter(pa.array((days == day).to_numpy()))
+        folder = os.path.join(_dataset_dir(dataset), f"date={day}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(part, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        written.append(path)
+    compact_daily(dataset)
+    return written
+
+
+def compact_daily(dataset):
+    # ครั้งแรกของวันที่มีการบันทึก: รวม part ของวันก่อนหน้าทั้งหมด (วันนี้ยังเขียนต่ออยู่ ไม่แตะ)
+    today = datetime.now().strftime("%Y-%m-%d")
+    marker = os.path.join(_dataset_dir(dataset), COMPACT_MARKER)
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            if f.read().strip() == today:
+                return 0
+    except OSError:
+        pass
+    try:
+        merged = compact(dataset, before=today)
+    except Exception as e:
+        # รวมไม่สำเร็จก็แค่อ่านช้าลง ไม่ควรทำให้การบันทึกประวัติพัง
+        print(f"   ⚠️ history_store: รวมไฟล์ {dataset} ไม่สำเร็จ ({e})")
+        return 0
+    with open(marker + ".tmp", "w", encoding="utf-8") as f:
+        f.write(today)
+    os.replace(marker + ".tmp", marker)
+    return merged
+
+
+def _declared_schema(dataset):
+    # schema ตอนอ่านตามที่ประกาศไว้ (parquet เก็บ timestamp[s] เป็นหน่วย ms -> อ่านกลับเป็น ms)
+    import pyarrow as pa
+
+    fields = []
+    for name, type_name in SCHEMAS[dataset]["columns"].items():
+        arrow_type = pa.type_for_alias(type_name)
+        if pa.types.is_timestamp(arrow_type):
+            arrow_type = pa.timestamp("ms")
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _open_dataset(dataset, columns=None, start=None, end=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    from pyarrow import fs
+
+    root = _dataset_dir(dataset)
+    if not os.path.isdir(root):
+        return None
+    # use_mmap: อ่านไฟล์ผ่าน memory map แทนการ copy เข้า buffer
+    local = fs.LocalFileSystem(use_mmap=True)
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    # ตัดโฟลเดอร์วันที่อยู่นอกช่วงทิ้งตั้งแต่ตอนไล่ไฟล์
+    days = [d for d in os.listdir(root) if d.startswith("date=")
+            and (not start or d[5:] >= start) and (not end or d[5:] <= end)]
+    files = [os.path.join(root, d, f) for d in sorted(days) for f in os.listdir(os.path.join(root, d))
+             if f.endswith(".parquet")]
+    if not files:
+        return None
+    schema = pa.unify_schemas([_declared_schema(dataset), partitioning.schema])
+    if columns is None or any(c not in schema.names for c in columns):
+        # ขอคอลัมน์เสริมที่ไม่ได้ประกาศ (เช่น ticker เสริมของ intermarket) -> ต้องดู schema จริงของไฟล์
+        # ในช่วงที่ตัดแล้ว; ปกติอ่านตาม SCHEMAS ได้เลยไม่ต้องเปิดไฟล์ทีละไฟล์
+        schema = pa.unify_schemas([schema] + [pq.read_schema(f, memory_map=True) for f in files])
+    return ds.dataset(files, schema=schema, format="parquet", filesystem=local,
+                      partitioning=partitioning, partition_base_dir=root)
+
+
+def read_history(dataset, columns=None, start=None, end=None, as_arrow=False):
+    # อ่านเฉพาะคอลัมน์ที่ขอ + ตัดโฟลเดอร์วันที่อยู่นอกช่วงทิ้งก่อนอ่าน (partition pruning)
+    # start / end = "YYYY-MM-DD" (รวมวันปลายทาง)
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    data = _open_dataset(dataset, columns, start, end)
+    if data is None:
+        return pa.table({}) if as_arrow else pd.DataFrame(columns=columns or list(SCHEMAS[dataset]["columns"]))
+
+    condition = None
+    if start:
+        condition = ds.field("date") >= start
+    if end:
+        upper = ds.field("date") <= end
+        condition = upper if condition is None else condition & upper
+
+    # คอลัมน์ date มาจากชื่อโฟลเดอร์ (ใช้ตัดช่วงเท่านั้น) -> ไม่คืนให้ผู้เรียก ยกเว้นขอมาเอง
+    if columns is None:
+        columns = [c for c in data.schema.names if c != "date"]
+    else:
+        columns = [c for c in columns if c in data.schema.names]
+    table = data.to_table(columns=columns, filter=condition)
+    key = SCHEMAS[dataset]["partition_by"]
+    if key in table.column_names:
+        table = table.sort_by(key)
+    return table if as_arrow else table.to_pandas()
+
+
+def compact(dataset, before=None):
+    # รวมไฟล์ part เล็กๆ ของแต่ละวันให้เหลือไฟล์เดียว (ค่าเริ่มต้น: ทุกวันก่อนวันนี้)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    before = before or datetime.now().strftime("%Y-%m-%d")
+    root = _dataset_dir(dataset)
+    if not os.path.isdir(root):
+        return 0
+    merged = 0
+    for folder in sorted(os.listdir(root)):
+        day = folder.replace("date=", "")
+        path = os.path.join(root, folder)
+        # ข้ามไฟล์อื่นใน root (เช่น COMPACT_MARKER) เอาเฉพาะโฟลเดอร์วัน
+        if not folder.startswith("date=") or not os.path.isdir(path):
+            continue
+        parts = sorted(f for f in os.listdir(path) if f.endswith(".parquet"))
+        if day >= before or len(parts) < 2:
+            continue
+        tables = [pq.read_table(os.path.join(path, p)) for p in parts]
+        table = pa.concat_tables(tables, promote_options="default")
+        target = os.path.join(path, f"part-compact-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(table, target + ".tmp")
+        os.replace(target + ".tmp", target)
+        for p in parts:
+            os.remove(os.path.join(path, p))
+        merged += 1
+    return merged
@@ -0,0 +1,165 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+import metrics
+
+# ==============================================================================
+# ท่อส่งข้อมูลกลางของทุก agent: ต่อ connection ค้างไว้ใช้ซ้ำ (keep-alive),
+# มี timeout เสมอ, ลองใหม่แบบสุ่มหน่วงเวลาเมื่อเจอ 429/5xx และจับเวลาแยกตามปลายทาง
+# ==============================================================================
+CONNECT_TIMEOUT = 5     # วินาทีที่ยอมรอเปิด connection
+READ_TIMEOUT = 30       # วินาทีที่ยอมรอข้อมูลแต่ละช่วง
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5      # รอบที่ n รอสุ่มระหว่าง 0 ถึง BACKOFF_BASE * 2^n วินาที (full jitter)
+BACKOFF_CAP = 20
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+POOL_SIZE = 20
+
+# requests ถอด gzip/deflate ให้เอง ส่วน br ต้องมีแพ็กเกจ brotli ติดตั้งอยู่
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_session = None
+_session_lock = threading.Lock()
+
+# สถิติความหน่วง: "host/path" -> ข้อมูลสะสม (ไม่เก็บ query string เพราะมี API key)
+_stats = {}
+_stats_lock = threading.Lock()
+STATS_SAMPLES = 500
+
+
+def get_session():
+    # import requests ตอนสร้าง session ครั้งแรก: agent ที่ยังไม่ยิงเน็ตไม่ต้องโหลด (~150 ms)
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "User-Agent": "Mozilla/5.0 (GoldWarRoom)",
+                "Accept-Encoding": ACCEPT_ENCODING,
+            })
+            _session = session
+        return _session
+
+
+def _endpoint(url):
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def _record(endpoint, elapsed, ok):
+    with _stats_lock:
+        s = _stats.setdefault(endpoint, {
+            "count": 0, "errors": 0, "total": 0.0, "max": 0.0, "last": 0.0,
+            "samples": deque(maxlen=STATS_SAMPLES),
+        })
+        s["count"] += 1
+        s["errors"] += 0 if ok else 1
+        s["total"] += elapsed
+        s["max"] = max(s["max"], elapsed)
+        s["last"] = elapsed
+        s["samples"].append(elapsed)
+    # ส่งต่อให้ metrics ด้วย: แยกตาม host (และ agent ที่กำลังทำงานอยู่)
+    host = endpoint.split("/", 1)[0]
+    metrics.observe("http", elapsed, upstream=host)
+    if not ok:
+        metrics.count("errors", stage="http", upstream=host)
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def get_latency_stats():
+    # คืน {endpoint: {count, errors, sum, avg, p50, p99, max, last}} หน่วยวินาที
+    with _stats_lock:
+        return {
+            endpoint: {
+                "count": s["count"],
+                "errors": s["errors"],
+                "sum": s["total"],
+                "avg": s["total"] / s["count"],
+                "p50": _percentile(s["samples"], 0.50),
+                "p99": _percentile(s["samples"], 0.99),
+                "max": s["max"],
+                "last": s["last"],
+            }
+            for endpoint, s in _stats.items()
+        }
+
+
+def backoff_delay(attempt, response=None):
+    # เคารพ Retry-After ของเซิร์ฟเวอร์ก่อน ไม่มีค่อยสุ่มหน่วงแบบ exponential
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(method, url, timeout=None, retries=MAX_RETRIES, **kwargs):
+    # เหมือน requests.request แต่ผ่าน connection pool กลาง มี timeout และ retry เสมอ
+    # คืน Response สุดท้าย (อาจเป็น 4xx/5xx ให้ผู้เรียกตัดสินเอง) หรือ raise ถ้าต่อไม่ได้เลย
+    import requests
+
+    session = get_session()
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    endpoint = _endpoint(url)
+
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            _record(endpoint, time.perf_counter() - started, False)
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        _record(endpoint, time.perf_counter() - started, response.status_code < 400)
+        if not kwargs.get("stream"):
+            # แบบ stream ยังไม่ได้อ่าน body (อ่านตรงนี้จะกินข้อมูลของผู้เรียก)
+            metrics.count("bytes", len(response.content), stage="http", upstream=endpoint.split("/", 1)[0])
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            delay = backoff_delay(attempt, response)
+            # คืน connection ให้ pool ก่อนรอ (แบบ stream ยังไม่ได้อ่าน body จะค้าง connection ไว้)
+            response.close()
+            time.sleep(delay)
+            continue
+        return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+# --- ฝั่ง asyncio: รันตัว sync ใน thread pool ของ event loop (ใช้ connection pool เดียวกัน) ---
+async def arequest(method, url, **kwargs):
+    return await asyncio.to_thread(request, method, url, **kwargs)
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url, **kwargs):
+    return await arequest("POST", url, **kwargs)
@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import math
+
+# --- ตั้งค่า Path ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+STATE_DIR = os.path.join(DATA_DIR, 'cache', 'indicators')
+
+# --- ตั้งค่าอินดิเคเตอร์ ---
+SMA_WINDOWS = (10, 50)
+EMA_WINDOWS = (20,)
+BOLL_WINDOW = 20
+BOLL_K = 2
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+
+# ring buffer ยาวเท่าหน้าต่างที่ยาวที่สุด -> ทุก SMA/Bollinger ใช้ buffer เดียวกัน
+RING_SIZE = max(SMA_WINDOWS + (BOLL_WINDOW,))
+SUM_WINDOWS = sorted(set(SMA_WINDOWS + (BOLL_WINDOW,)))
+
+
+def new_state(symbol):
+    return {
+        "symbol": symbol,
+        "last_ts": None,
+        "count": 0,
+        "ring": [0.0] * RING_SIZE,
+        "head": 0,
+        "sums": {str(n): 0.0 for n in SUM_WINDOWS},
+        "sumsq": 0.0,  # ผลรวมกำลังสองในหน้าต่าง Bollinger
+        "ema": {str(n): None for n in EMA_WINDOWS},
+        "prev_close": None,
+        "atr": None,
+        "tr_count": 0,
+        "avg_gain": None,
+        "avg_loss": None,
+        "rsi_count": 0,
+        "last_snapshot": None,
+    }
+
+
+def _state_path(symbol):
+    safe = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+    return os.path.join(STATE_DIR, f"{safe}.json")
+
+
+def load_state(symbol):
+    path = _state_path(symbol)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            # ตั้งค่าหน้าต่างเปลี่ยน -> state เดิมใช้ไม่ได้ เริ่มสะสมใหม่
+            if len(state["ring"]) == RING_SIZE and sorted(int(n) for n in state["sums"]) == SUM_WINDOWS:
+                return state
+        except (OSError, ValueError, KeyError):
+            pass
+    return new_state(symbol)
+
+
+def save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = _state_path(state["symbol"])
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def _wilder(prev_avg, seed_count, value, period):
+    # ช่วงแรกใช้ค่าเฉลี่ยธรรมดา ครบ period แล้วค่อยเป็น Wilder smoothing
+    if prev_avg is None:
+        return value
+    if seed_count < period:
+        return (prev_avg * seed_count + value) / (seed_count + 1)
+    return (prev_avg * (period - 1) + value) / period
+
+
+def update(state, ts, high, low, close, commit=True):
+    # เพิ่มแท่งใหม่ 1 แท่ง: ทุกอินดิเคเตอร์อัปเดตแบบ O(1)
+    # commit=False = แค่ "ดู" ค่าของแท่งที่ยังไม่ปิด โดยไม่แตะ state
+    # ราคา NaN/inf เข้า running sum แล้วจะพังทุกค่าหลังจากนั้นจนกว่าจะลบไฟล์ state -> ไม่รับ
+    if not all(math.isfinite(v) for v in (high, low, close)):
+        raise ValueError(f"{state['symbol']} {ts}: ราคาไม่ใช่ตัวเลขจำกัด (H={high} L={low} C={close})")
+    ring, head, count = state["ring"], state["head"], state["count"]
+    prev_close = state["prev_close"]
+
+    # SMA / Bollinger จาก running sum: บวกค่าใหม่ ลบค่าที่หลุดหน้าต่าง
+    sums, sma = {}, {}
+    for n in SUM_WINDOWS:
+        leaving = ring[(head - n) % RING_SIZE] if count >= n else 0.0
+        sums[n] = state["sums"][str(n)] + close - leaving
+        sma[n] = sums[n] / min(count + 1, n)
+    leaving = ring[(head - BOLL_WINDOW) % RING_SIZE] if count >= BOLL_WINDOW else 0.0
+    sumsq = state["sumsq"] + close * close - leaving * leaving
+    k = min(count + 1, BOLL_WINDOW)
+    boll_mid = sums[BOLL_WINDOW] / k
+    boll_std = math.sqrt(max(sumsq / k - boll_mid * boll_mid, 0.0))
+
+    ema = {}
+    for n in EMA_WINDOWS:
+        prev = state["ema"][str(n)]
+        alpha = 2 / (n + 1)
+        ema[n] = close if prev is None else prev + alpha * (close - prev)
+
+    # ATR (Wilder)
+    if prev_close is None:
+        tr = high - low
+    else:
+        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+    atr = _wilder(state["atr"], state["tr_count"], tr, ATR_PERIOD)
+
+    # RSI (Wilder) ต้องมีราคาปิดก่อนหน้า
+    avg_gain, avg_loss, rsi = state["avg_gain"], state["avg_loss"], None
+    if prev_close is not None:
+        diff = close - prev_close
+        avg_gain = _wilder(avg_gain, state["rsi_count"], max(diff, 0.0), RSI_PERIOD)
+        avg_loss = _wilder(avg_loss, state["rsi_count"], max(-diff, 0.0), RSI_PERIOD)
+        if avg_loss == 0:
+            rsi = 100.0 if avg_gain > 0 else 50.0
+        else:
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+    snapshot = {
+        "ts": ts,
+        "close": close,
+        "prev_close": prev_close,
+        "bars": count + 1,
+        "rsi": rsi,
+        "atr": atr,
+        "bb_mid": boll_mid,
+        "bb_upper": boll_mid + BOLL_K * boll_std,
+        "bb_lower": boll_mid - BOLL_K * boll_std,
+    }
+    for n in SMA_WINDOWS:
+        snapshot[f"sma{n}"] = sma[n]
+    for n in EMA_WINDOWS:
+        snapshot[f"ema{n}"] = ema[n]
+
+    if commit:
+        ring[head] = close
+        state["head"] = (head + 1) % RING_SIZE
+        state["count"] = count + 1
+        state["sums"] = {str(n): v for n, v in sums.items()}
+        state["sumsq"] = sumsq
+        state["ema"] = {str(n): v for n, v in ema.items()}
+        state["prev_close"] = close
+        state["atr"] = atr
+        state["tr_count"] += 1
+        if prev_close is not None:
+            state["avg_gain"], state["avg_loss"] = avg_gain, avg_loss
+            state["rsi_count"] += 1
+        state["last_ts"] = ts
+        state["last_snapshot"] = snapshot
+    return snapshot
+
+
+def feed_bars(state, bars):
+    # bars = DataFrame OHLC (index = เวลา) จาก price_cache
+    # commit เฉพาะแท่งที่ใหม่กว่า state และปิดแล้ว; แท่งสุดท้ายอาจยังวิ่งอยู่ -> แค่ preview
+    # (เทียบเวลาแบบไม่มี tz เพราะ cache เก็บเวลาท้องถิ่นของตลาด)
+    # ข้ามแท่งที่ราคาเป็น NaN (เช่นแท่งที่ yfinance ยังเติมไม่ครบ)
+    rows = [(ts.strftime("%Y-%m-%dT%H:%M:%S"), float(h), float(l), float(c))
+            for ts, h, l, c in zip(bars.index, bars["High"], bars["Low"], bars["Close"])
+            if math.isfinite(h) and math.isfinite(l) and math.isfinite(c)]
+    if state["last_ts"] is not None:
+        # ข้อมูลที่ดึงมาต้องต่อจากแท่งล่าสุดใน state (มีแท่ง last_ts อยู่ด้วย)
+        # ไม่งั้นมีช่องว่าง -> SMA/EMA/RSI จะผิดเงียบๆ เริ่มสะสมใหม่จากข้อมูลชุดนี้ทั้งหมด
+        if rows and rows[-1][0] > state["last_ts"] and all(r[0] != state["last_ts"] for r in rows):
+            print(f"   ⚠️ indicator_engine: {state['symbol']} ข้อมูลไม่ต่อจาก {state['last_ts']} -> คำนวณใหม่ทั้งหมด")
+            fresh = new_state(state["symbol"])
+            state.clear()
+            state.update(fresh)
+        else:
+            rows = [r for r in rows if r[0] > state["last_ts"]]
+    if not rows:
+        return state["last_snapshot"]
+
+    for ts, high, low, close in rows[:-1]:
+        update(state, ts, high, low, close, commit=True)
+    ts, high, low, close = rows[-1]
+    return update(state, ts, high, low, close, commit=False)
@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import threading
+
+# ==============================================================================
+# ตัวจับคำเฝ้าระวังในหัวข้อข่าว: คอมไพล์คำ/วลีทั้งหมดเป็น regex ก้อนเดียวแบบ trie ครั้งเดียว
+# แล้วสแกนข้อความรอบเดียวต่อข่าว (ไม่ต้องวนทีละคำ) และจับเฉพาะ "ทั้งคำ"
+# เช่น "War" ไม่ติด "Warsaw"/"award" อีกต่อไป
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATCHLIST_FILE = os.path.join(BASE_DIR, 'config', 'watchlist.json')
+
+# cache ในโปรเซส: ชื่อ watchlist -> (mtime_ns ของ config, matcher)
+_matchers = {}
+# cache ของไฟล์ config ทั้งไฟล์: (mtime_ns, {ชื่อ: รายการคำ}) -> อ่าน/แกะ JSON ใหม่เฉพาะตอนไฟล์ถูกแก้
+_watchlists = (None, {})
+_lock = threading.Lock()
+
+
+def _normalize(text):
+    # ไม่สนตัวพิมพ์ (casefold) และช่องว่างกี่ตัวก็นับเป็นหนึ่ง -> วลีใน config ตรงกับข่าวได้เสมอ
+    return " ".join((text or "").casefold().split())
+
+
+def _trie_pattern(node):
+    # แปลง trie เป็น regex: คำที่ขึ้นต้นเหมือนกันใช้กิ่งเดียวกัน -> regex ไม่ต้องลองทีละคำ
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch != ""]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    # คำที่จบตรงนี้ได้ -> ส่วนที่เหลือเป็น optional (greedy: ลองวลีที่ยาวกว่าก่อน)
+    return "(?:" + body + ")?" if "" in node else body
+
+
+def build_matcher(terms):
+    # terms = list ของคำ/วลี; คืน matcher (dict) สำหรับ find_matches
+    canonical = {}
+    for term in terms:
+        key = _normalize(term)
+        if key and key not in canonical:
+            canonical[key] = (len(canonical), term)
+
+    trie = {}
+    for key in canonical:
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    # lookahead ทำให้ได้ match ทุกตำแหน่งเริ่ม (คำซ้อนกันอย่าง "trump tariff" กับ "tariff" ก็ได้ทั้งคู่)
+    pattern = re.compile(r"(?=(?<!\w)(" + _trie_pattern(trie) + r")(?!\w))") if canonical else None
+    return {"pattern": pattern, "canonical": canonical}
+
+
+def find_matches(matcher, text):
+    # คืนคำจาก watchlist ที่เจอในข้อความ (ตัวสะกดตาม config, เรียงตามลำดับใน config, ไม่ซ้ำ)
+    if matcher["pattern"] is None:
+        return []
+    canonical = matcher["canonical"]
+    found = {}
+    for hit in matcher["pattern"].findall(_normalize(text)):
+        if hit in canonical:
+            found[hit] = canonical[hit]
+        # วลีที่สั้นกว่าซึ่งขึ้นต้นตำแหน่งเดียวกัน (เช่น "trump" ใน "trump tariff")
+        for cut in (i for i, ch in enumerate(hit) if ch == " "):
+            if hit[:cut] in canonical:
+                found[hit[:cut]] = canonical[hit[:cut]]
+    return [term for _, term in sorted(found.values())]
+
+
+def match_article(matcher, article):
+    # ใช้กับบทความจาก NewsAPI (หัวข้อ + คำโปรย) หรือ dict ข่าวที่มี Title
+    text = f"{article.get('title') or article.get('Title') or ''} {article.get('description') or ''}"
+    return find_matches(matcher, text)
+
+
+def _mtime():
+    return os.stat(WATCHLIST_FILE).st_mtime_ns if os.path.exists(WATCHLIST_FILE) else 0
+
+
+def load_watchlist(name, default=None):
+    global _watchlists
+    mtime = _mtime()
+    with _lock:
+        if _watchlists[0] != mtime:
+            watchlists = {}
+            if mtime:
+                with open(WATCHLIST_FILE, 'r', encoding='utf-8') as f:
+                    watchlists = json.load(f)
+            _watchlists = (mtime, watchlists)
+        watchlists = _watchlists[1]
+    if name in watchlists:
+        return list(watchlists[name])
+    return list(default or [])
+
+
+def filter_articles(name, articles, default=None):
+    # เก็บเฉพาะบทความที่หัวข้อ/คำโปรยมีคำใน watchlist (ติดคำที่เจอไว้ใน matched_keywords)
+    matcher = get_matcher(name, default)
+    if matcher["pattern"] is None:
+        return list(articles)  # ไม่มีคำเฝ้าระวังเลย -> ไม่กรอง
+    kept = []
+    for article in articles:
+        found = match_article(matcher, article)
+        if found:
+            kept.append({**article, "matched_keywords": found})
+    return kept
+
+
+def get_matcher(name, default=None):
+    # คอมไพล์ครั้งเดียวต่อ watchlist และคอมไพล์ใหม่เฉพาะตอนไฟล์ config ถูกแก้
+    mtime = _mtime()
+    with _lock:
+        hit = _matchers.get(name)
+    if hit is None or hit[0] != mtime:
+        hit = (mtime, build_matcher(load_watchlist(name, default)))
+        with _lock:
+            _matchers[name] = hit
+    return hit[1]
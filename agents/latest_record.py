@@ -0,0 +1,88 @@
+import os
+import csv
+import threading
+
+# อ่าน "แถวล่าสุด" ของ CSV โดยไม่ต้อง parse ทั้งไฟล์:
+# อ่านหัวตารางจากต้นไฟล์ แล้ว seek จากท้ายไฟล์ถอยหลังทีละก้อนจนเจอบรรทัดสุดท้าย
+CHUNK_SIZE = 4096
+
+# cache ในโปรเซส: path -> ((mtime_ns, size), record)
+# ไฟล์ไม่เปลี่ยน = ไม่แตะดิสก์เลย (แค่ os.stat)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _read_last_line(f, size, header_end):
+    # ถอยจากท้ายไฟล์ทีละ CHUNK_SIZE จนได้บรรทัดสุดท้ายที่ไม่ว่างครบทั้งบรรทัด
+    tail = b""
+    pos = size
+    while pos > header_end:
+        step = min(CHUNK_SIZE, pos - header_end)
+        pos -= step
+        f.seek(pos)
+        tail = f.read(step) + tail
+        body = tail.rstrip(b"\r\n")
+        cut = body.rfind(b"\n")
+        if cut != -1:
+            return body[cut + 1:]
+        if pos == header_end:
+            return body
+    return b""
+
+
+def _full_scan(path, encoding):
+    # ทางสำรอง: แถวสุดท้ายมีขึ้นบรรทัดใหม่อยู่ในเครื่องหมายคำพูด -> อ่านแบบเต็มด้วย csv
+    last = None
+    with open(path, "r", encoding=encoding, newline="") as f:
+        for row in csv.DictReader(f):
+            last = row
+    return last
+
+
+def _decode_latest(path, size, encoding):
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        header_end = f.tell()
+        if not header_line.strip():
+            return None
+        header = next(csv.reader([header_line.decode(encoding).rstrip("\r\n")]))
+        raw = _read_last_line(f, size, header_end)
+
+    line = raw.decode(encoding).rstrip("\r")
+    if not line.strip():
+        return None
+    # จำนวนเครื่องหมายคำพูดเป็นคี่ = บรรทัดนี้เป็นแค่ท่อนท้ายของช่องที่มีหลายบรรทัด
+    if line.count('"') % 2 == 1:
+        return _full_scan(path, encoding)
+    values = next(csv.reader([line]))
+    if len(values) != len(header):
+        return _full_scan(path, encoding)
+    return dict(zip(header, values))
+
+
+def read_latest_record(path, encoding="utf-8-sig"):
+    # คืน dict ของแถวสุดท้าย (ค่าเป็น string แบบเดียวกับใน CSV) หรือ None ถ้าไม่มีไฟล์/ไม่มีข้อมูล
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        hit = _cache.get(path)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+
+    try:
+        record = _decode_latest(path, stat.st_size, encoding)
+    except (OSError, UnicodeDecodeError, csv.Error, StopIteration):
+        record = None
+
+    with _cache_lock:
+        _cache[path] = (key, record)
+    return record
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,333 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# ==============================================================================
+# จับเวลา/นับของแต่ละขั้นของทุก agent แบบเบาๆ (ไม่ต้องลงอะไรเพิ่ม)
+#   with metrics.timer("fetch", upstream="yahoo"): ...        # หรือใช้เป็น @decorator
+#   metrics.count("rows", len(rows)) / count("bytes", n) / count("cache_hits")
+# ป้ายกำกับ: agent (ตั้งครั้งเดียวที่ timer ชั้นนอกสุด ชั้นในสืบทอดเอง), stage, upstream
+# เก็บสองที่: ในหน่วยความจำ (สะสมตั้งแต่เปิดโปรเซส) และไฟล์ histogram แบบหน้าต่างเลื่อนรายชั่วโมง
+# ดูผล: python agents/metrics.py (p50/p99) หรือ --serve เปิด endpoint แบบ Prometheus ให้ดึงไปทำกราฟ
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+METRICS_FILE = os.environ.get("GWR_METRICS_FILE") or os.path.join(DATA_DIR, 'cache', 'metrics_histograms.json')
+
+# ขอบบนของแต่ละช่อง histogram (วินาที) ช่องสุดท้ายคือ +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WINDOW_SECONDS = 3600          # ไฟล์แบ่งหน้าต่างละ 1 ชั่วโมง
+ROLLING_WINDOWS = 24 * 7       # เก็บย้อนหลัง 7 วัน หน้าต่างที่เก่ากว่านั้นทิ้ง
+FLUSH_SECONDS = 60             # โปรเซสที่เปิดค้าง (Streamlit/daemon) เขียนไฟล์อย่างน้อยทุกเท่านี้
+EXPORTER_PORT = int(os.environ.get("GWR_METRICS_PORT", "9464"))
+PREFIX = "gwr"
+
+# agent ปัจจุบัน: ContextVar ตามไปถึง asyncio task / asyncio.to_thread ได้เอง
+_agent = contextvars.ContextVar("metrics_agent", default="")
+
+_lock = threading.Lock()
+_totals = {"timings": {}, "counters": {}}   # สะสมตั้งแต่เปิดโปรเซส (ใช้ตอบ endpoint)
+_pending = {}                               # window -> {"timings", "counters"} ที่ยังไม่ลงไฟล์
+_last_flush = time.time()
+
+
+def _key(agent, stage, upstream):
+    return f"{agent}|{stage}|{upstream}"
+
+
+def _split(key):
+    agent, stage, upstream = key.split("|", 2)
+    return {"agent": agent, "stage": stage, "upstream": upstream}
+
+
+def _bucket_index(seconds):
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(BUCKETS)
+
+
+def _add_timing(store, key, index, seconds):
+    hist = store.setdefault(key, {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0})
+    hist["buckets"][index] += 1
+    hist["sum"] += seconds
+    hist["count"] += 1
+
+
+def _pending_window(now):
+    window = str(int(now // WINDOW_SECONDS * WINDOW_SECONDS))
+    return _pending.setdefault(window, {"timings": {}, "counters": {}})
+
+
+def observe(stage, seconds, agent=None, upstream=""):
+    key = _key(agent if agent is not None else _agent.get(), stage, upstream)
+    index = _bucket_index(seconds)
+    now = time.time()
+    with _lock:
+        _add_timing(_totals["timings"], key, index, seconds)
+        _add_timing(_pending_window(now)["timings"], key, index, seconds)
+        due = now - _last_flush >= FLUSH_SECONDS
+    if due:
+        flush()
+
+
+def count(name, value=1, stage="", agent=None, upstream=""):
+    # ตัวนับสะสม: bytes / rows / cache_hits / cache_misses / errors
+    key = f"{name}|" + _key(agent if agent is not None else _agent.get(), stage, upstream)
+    with _lock:
+        _totals["counters"][key] = _totals["counters"].get(key, 0) + value
+        counters = _pending_window(time.time())["counters"]
+        counters[key] = counters.get(key, 0) + value
+
+
+@contextmanager
+def timer(stage, agent=None, upstream=""):
+    # ใช้ได้ทั้ง with และ @decorator; ระบุ agent ที่ชั้นนอกสุด ชั้นในไม่ต้องใส่ซ้ำ
+    token = _agent.set(agent) if agent is not None else None
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        count("errors", stage=stage, upstream=upstream)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - started, upstream=upstream)
+        if token is not None:
+            _agent.reset(token)
+
+
+# ==============================================================================
+# ไฟล์ histogram แบบหน้าต่างเลื่อน: {"buckets": [...], "windows": {epoch: {"timings", "counters"}}}
+# ==============================================================================
+
+def _load_file(path=None):
+    try:
+        with open(path or METRICS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"buckets": list(BUCKETS), "windows": {}}
+    if data.get("buckets") != list(BUCKETS):
+        # เปลี่ยนขอบช่องแล้ว ของเก่ารวมกับของใหม่ไม่ได้ -> เริ่มใหม่
+        return {"buckets": list(BUCKETS), "windows": {}}
+    return data
+
+
+def _merge_into(target, source):
+    for key, hist in source.get("timings", {}).items():
+        old = target["timings"].setdefault(key, {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0})
+        old["buckets"] = [a + b for a, b in zip(old["buckets"], hist["buckets"])]
+        old["sum"] += hist["sum"]
+        old["count"] += hist["count"]
+    for key, value in source.get("counters", {}).items():
+        target["counters"][key] = target["counters"].get(key, 0) + value
+
+
+@contextmanager
+def _file_lock(path):
+    # lock ข้ามโปรเซส: orchestrator / scheduler / Streamlit flush ไฟล์เดียวกันได้พร้อมกัน
+    # ไม่ล็อก = ต่างคนต่างโหลด-รวม-เขียนทับ แล้วยอดของอีกโปรเซสหายไป
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # รอได้ราว 10 วินาทีแล้ว raise OSError
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def flush(path=None):
+    # รวมของที่ค้างเข้าไฟล์ แล้วตัดหน้าต่างที่เก่าเกิน ROLLING_WINDOWS ทิ้ง
+    global _pending, _last_flush
+    with _lock:
+        pending, _pending = _pending, {}
+        _last_flush = time.time()
+    if not pending:
+        return
+    path = path or METRICS_FILE
+    try:
+        with _file_lock(path):
+            data = _load_file(path)
+            for window, values in pending.items():
+                _merge_into(data["windows"].setdefault(window, {"timings": {}, "counters": {}}), values)
+            oldest = (time.time() // WINDOW_SECONDS - ROLLING_WINDOWS + 1) * WINDOW_SECONDS
+            data["windows"] = {w: v for w, v in data["windows"].items() if int(w) >= oldest}
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(path + ".tmp", path)
+    except OSError:
+        pass  # เขียนสถิติไม่ได้ไม่ควรทำให้ agent พัง
+
+
+atexit.register(flush)
+
+
+def load_totals(hours=None, path=None):
+    # รวมทุกหน้าต่างในไฟล์ (หรือเฉพาะ hours ชั่วโมงล่าสุด) เป็นก้อนเดียว
+    totals = {"timings": {}, "counters": {}}
+    since = time.time() - hours * 3600 if hours else 0
+    for window, values in _load_file(path)["windows"].items():
+        if int(window) + WINDOW_SECONDS > since:
+            _merge_into(totals, values)
+    return totals
+
+
+def snapshot():
+    with _lock:
+        return json.loads(json.dumps(_totals))
+
+
+def quantile(hist, q):
+    # ประมาณค่า quantile จากช่อง histogram (เส้นตรงภายในช่อง แบบ histogram_quantile ของ Prometheus)
+    target = q * hist["count"]
+    seen, lower = 0, 0.0
+    for i, n in enumerate(hist["buckets"]):
+        upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+        if n and seen + n >= target:
+            return lower + (upper - lower) * (target - seen) / n
+        seen += n
+        lower = upper
+    return lower
+
+
+# ==============================================================================
+# Prometheus text format
+# ==============================================================================
+
+def _labels(**labels):
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus(totals, latency=None):
+    lines = [
+        f"# HELP {PREFIX}_stage_duration_seconds เวลาแต่ละขั้นของ agent",
+        f"# TYPE {PREFIX}_stage_duration_seconds histogram",
+    ]
+    for key, hist in sorted(totals["timings"].items()):
+        labels = _split(key)
+        cumulative = 0
+        for i, n in enumerate(hist["buckets"]):
+            cumulative += n
+            le = f"{BUCKETS[i]:g}" if i < len(BUCKETS) else "+Inf"
+            lines.append(f"{PREFIX}_stage_duration_seconds_bucket{_labels(**labels, le=le)} {cumulative}")
+        lines.append(f"{PREFIX}_stage_duration_seconds_sum{_labels(**labels)} {hist['sum']:.6f}")
+        lines.append(f"{PREFIX}_stage_duration_seconds_count{_labels(**labels)} {hist['count']}")
+
+    by_name = {}
+    for key, value in totals["counters"].items():
+        name, rest = key.split("|", 1)
+        by_name.setdefault(name, []).append((rest, value))
+    for name, items in sorted(by_name.items()):
+        lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+        for rest, value in sorted(items):
+            lines.append(f"{PREFIX}_{name}_total{_labels(**_split(rest))} {value}")
+
+    if latency:
+        # สถิติจาก http_client (ทุกคำขอรวม retry) เป็น summary ต่อ endpoint
+        # แต่ละ metric ต้องมี TYPE และแถวของมันต้องอยู่ติดกัน -> วน endpoint แยกกันทีละ metric
+        lines.append(f"# TYPE {PREFIX}_http_latency_seconds summary")
+        for endpoint, s in sorted(latency.items()):
+            for q in ("p50", "p99"):
+                lines.append(f"{PREFIX}_http_latency_seconds{_labels(endpoint=endpoint, quantile=f'0.{q[1:]}')} {s[q]:.6f}")
+            lines.append(f"{PREFIX}_http_latency_seconds_sum{_labels(endpoint=endpoint)} {s['sum']:.6f}")
+            lines.append(f"{PREFIX}_http_latency_seconds_count{_labels(endpoint=endpoint)} {s['count']}")
+        lines.append(f"# TYPE {PREFIX}_http_errors_total counter")
+        for endpoint, s in sorted(latency.items()):
+            lines.append(f"{PREFIX}_http_errors_total{_labels(endpoint=endpoint)} {s['errors']}")
+    return "\n".join(lines) + "\n"
+
+
+def live_text():
+    # ของโปรเซสนี้เอง (เปิด endpoint ใน Streamlit/daemon ที่ agent รันอยู่ด้วย)
+    from http_client import get_latency_stats
+    return render_prometheus(snapshot(), get_latency_stats())
+
+
+def file_text():
+    # ของทุกโปรเซสที่เขียนไฟล์ (สำหรับ exporter ที่เปิดแยก); โปรเซสนี้ไม่ได้ยิงเน็ตเอง -> ไม่มี latency
+    return render_prometheus(load_totals())
+
+
+def serve(port=EXPORTER_PORT, source=live_text, host="127.0.0.1"):
+    # เปิด endpoint ใน thread พื้นหลัง (daemon) คืน server ไว้ให้ shutdown() เองได้
+    # (import http.server ตรงนี้: โมดูลนี้ถูก import ทุก agent และ War Room ที่ต้องเปิดเร็ว)
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = self.server.source().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # ไม่ต้องพิมพ์ทุกครั้งที่ Prometheus มาดึง
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.source = source
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    return server
+
+
+def print_summary(hours=24):
+    totals = load_totals(hours)
+    if not totals["timings"]:
+        print(f"🤷‍♂️ ยังไม่มีสถิติใน {METRICS_FILE}")
+        return
+    print(f"📈 เวลาแต่ละขั้น ({hours} ชั่วโมงล่าสุด)")
+    print(f"   {'agent':<22} {'stage':<10} {'upstream':<28} {'n':>6} {'p50':>9} {'p99':>9}")
+    for key, hist in sorted(totals["timings"].items()):
+        labels = _split(key)
+        print(f"   {labels['agent'] or '-':<22} {labels['stage']:<10} {labels['upstream'] or '-':<28} "
+              f"{hist['count']:>6} {quantile(hist, 0.5) * 1000:>7.0f}ms {quantile(hist, 0.99) * 1000:>7.0f}ms")
+    if totals["counters"]:
+        print("\n🔢 ตัวนับ")
+        for key, value in sorted(totals["counters"].items()):
+            name, rest = key.split("|", 1)
+            labels = _split(rest)
+            print(f"   {name:<13} {labels['agent'] or '-':<22} {labels['stage'] or '-':<10} {labels['upstream'] or '-':<28} {value:,}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="สถิติเวลาแต่ละขั้นของ agent")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--serve", action="store_true", help="เปิด endpoint แบบ Prometheus จากไฟล์สถิติ")
+    parser.add_argument("--port", type=int, default=EXPORTER_PORT)
+    args = parser.parse_args()
+
+    if args.serve:
+        server = serve(args.port, source=file_text)
+        print(f"📡 Prometheus endpoint: http://127.0.0.1:{args.port}/metrics (Ctrl+C เพื่อปิด)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+            sys.exit(0)
+    print_summary(args.hours)
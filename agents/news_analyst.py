@@ -0,0 +1,414 @@
+import re
+import json
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import analysis_cache
+import http_client
+import metrics
+
+# ==============================================================================
+# สมองวิเคราะห์ข่าวด้วย Gemini (ใช้ร่วมกันทั้ง app.py และ agent_001_intelligence)
+# ==============================================================================
+
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={key}"
+# แบบ streaming: ได้คำตอบทีละท่อนผ่าน Server-Sent Events (บรรทัด "data: {...}")
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent?alt=sse&key={key}"
+
+# 🛡️ "เกราะ" ให้ข่าวสงคราม/การเมืองผ่านตัวกรองของ Gemini ได้
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"}
+]
+
+# แก้ข้อความ prompt เมื่อไหร่ ให้เปลี่ยนเวอร์ชัน -> ผลใน cache ของ prompt เก่าจะไม่ถูกใช้
+PROMPT_VERSION = "v2"
+
+# โมเดลใช้เวลาคิดนานกว่า API ทั่วไป -> ให้ read timeout ยาวกว่าค่าเริ่มต้น แต่ต้องมีเพดาน
+GEMINI_TIMEOUT = (http_client.CONNECT_TIMEOUT, 90)
+AGENT_NAME = "news_analyst"  # ป้าย agent ใน metrics
+
+# --- แบ่งข่าวเป็นก้อนแล้วยิงขนานกัน: เวลารอ ~ ก้อนที่ช้าที่สุด ไม่ใช่ผลรวมของทุกข่าว ---
+CHARS_PER_TOKEN = 4          # ประมาณการหยาบสำหรับข่าวภาษาอังกฤษ
+MAX_CHUNK_TOKENS = 3000      # งบ token ของข่าวในหนึ่งก้อน (ไม่รวมคำสั่ง)
+MAX_CHUNK_ARTICLES = 12      # ต่อให้ข่าวสั้น ก็ไม่ให้คำตอบ JSON ยาวเกินไปต่อก้อน
+MAX_CONCURRENCY = 4          # จำนวนคำขอที่ยิงพร้อมกันได้สูงสุด (กัน rate limit)
+CHUNK_RETRIES = 2            # ก้อนที่พัง (HTTP/JSON เสีย) ลองใหม่เฉพาะก้อนนั้น
+# งบ retry มีชั้นเดียว: คำขอไป Gemini ไม่ให้ http_client ลองซ้ำเอง (ไม่งั้น 3 x 4 = 12 คำขอต่อก้อน)
+# -> ทุกความผิดพลาด (HTTP/JSON/สตรีมขาด) ลองใหม่ที่ระดับก้อนสูงสุด CHUNK_RETRIES ครั้ง
+GEMINI_HTTP_RETRIES = 0
+
+
+def clean_json_text(text):
+    if not text: return None
+    text = re.sub(r'```json\s*', '', text)
+    text = re.sub(r'```', '', text)
+    return text.strip()
+
+
+def format_article(i, n):
+    return f"ข่าวที่ {i+1} [เวลา: {n.get('publishedAt', '')}]: {n.get('title', '')} - {n.get('description') or ''}\n\n"
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def build_prompt(news_list):
+    news_input = ""
+    for i, n in enumerate(news_list):
+        news_input += format_article(i, n)
+
+    return f"""
+    ในฐานะนักกลยุทธ์ทองคำ วิเคราะห์ข่าวต่อไปนี้ โดยเน้นนโยบาย Trump (Tariff/Greenland)
+    และตอบในรูปแบบ JSON ภาษาไทยเท่านั้น:
+    {news_input}
+
+    รูปแบบที่ต้องการ (individual_news ต้องครบทุกข่าว และใส่ id ตามเลขข่าวที่):
+    {{
+        "individual_news": [
+            {{
+                "id": 1,
+                "title": "หัวข้อข่าวภาษาไทย",
+                "summary": "สรุปเนื้อหาสำคัญสั้นๆ",
+                "weight": 0-100
+            }}
+        ],
+        "overall_sentiment_score": 0-100,
+        "overall_summary": "สรุปสภาวะตลาด",
+        "action_plan": "คำแนะนำการลงทุน"
+    }}
+    """
+
+
+def build_chunk_prompt(news_list):
+    # ก้อนย่อย: ขอแค่ผลรายข่าว ภาพรวมจะสรุปรอบเดียวตอนท้ายจากผลของทุกก้อน
+    news_input = ""
+    for i, n in enumerate(news_list):
+        news_input += format_article(i, n)
+
+    return f"""
+    ในฐานะนักกลยุทธ์ทองคำ วิเคราะห์ข่าวต่อไปนี้ทีละข่าว โดยเน้นนโยบาย Trump (Tariff/Greenland)
+    และตอบในรูปแบบ JSON ภาษาไทยเท่านั้น:
+    {news_input}
+
+    รูปแบบที่ต้องการ (individual_news ต้องครบทุกข่าว และใส่ id ตามเลขข่าวที่):
+    {{
+        "individual_news": [
+            {{
+                "id": 1,
+                "title": "หัวข้อข่าวภาษาไทย",
+                "summary": "สรุปเนื้อหาสำคัญสั้นๆ",
+                "weight": 0-100
+            }}
+        ]
+    }}
+    """
+
+
+def build_synthesis_prompt(items, score):
+    # รอบสรุปภาพรวม: ส่งแค่ผลรายข่าวที่ย่อแล้ว (สั้นกว่าข่าวต้นฉบับมาก)
+    digest = ""
+    for i, item in enumerate(items):
+        digest += f"{i+1}. [{item.get('weight')}] {item.get('title')}: {item.get('summary')}\n"
+
+    return f"""
+    ในฐานะนักกลยุทธ์ทองคำ นี่คือผลวิเคราะห์รายข่าว (ตัวเลขในวงเล็บคือน้ำหนักผลต่อทองคำ 0-100)
+    คะแนนรวมเฉลี่ย {score}/100
+    {digest}
+
+    สรุปสภาวะตลาดและคำแนะนำ ตอบในรูปแบบ JSON ภาษาไทยเท่านั้น:
+    {{
+        "overall_summary": "สรุปสภาวะตลาด",
+        "action_plan": "คำแนะนำการลงทุน"
+    }}
+    """
+
+
+def _request_body(prompt):
+    return {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "safetySettings": SAFETY_SETTINGS
+    }
+
+
+def call_gemini(api_key, model_name, prompt):
+    # คืนข้อความดิบจาก Gemini; ผิดพลาดให้ raise ให้ฝั่ง UI ตัดสินใจเองว่าจะแสดงอย่างไร
+    model = model_name.replace("models/", "")
+    url = GEMINI_URL.format(model=model, key=api_key)
+    response = http_client.post(url, headers={'Content-Type': 'application/json'}, json=_request_body(prompt),
+                                timeout=GEMINI_TIMEOUT, retries=GEMINI_HTTP_RETRIES)
+    if response.status_code != 200:
+        raise RuntimeError(f"Gemini ตอบกลับ HTTP {response.status_code}")
+    return response.json()['candidates'][0]['content']['parts'][0]['text']
+
+
+def stream_gemini(api_key, model_name, prompt):
+    # generator คืนข้อความทีละท่อนตามที่โมเดลพิมพ์ออกมา
+    model = model_name.replace("models/", "")
+    url = GEMINI_STREAM_URL.format(model=model, key=api_key)
+    response = http_client.post(url, headers={'Content-Type': 'application/json'}, json=_request_body(prompt),
+                                timeout=GEMINI_TIMEOUT, stream=True, retries=GEMINI_HTTP_RETRIES)
+    with response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Gemini ตอบกลับ HTTP {response.status_code}")
+        # ถอด utf-8 เอง: text/event-stream ไม่บอก charset แล้ว requests จะเดาเป็น latin-1 (ภาษาไทยเพี้ยน)
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            event = json.loads(line[5:].decode("utf-8"))
+            for candidate in event.get('candidates', [])[:1]:
+                for part in candidate.get('content', {}).get('parts', []):
+                    if part.get('text'):
+                        yield part['text']
+
+
+def iter_json_items(chunks, key="individual_news"):
+    # ตัวแกะ JSON แบบทีละท่อน: ทันทีที่ object ใน array `key` ปิดวงเล็บครบ ก็ yield ("item", object)
+    # ไม่ต้องรอคำตอบทั้งก้อน; จบแล้ว yield ("done", ข้อความทั้งหมด) ให้ผู้เรียกแกะส่วนที่เหลือเอง
+    marker = f'"{key}"'
+    buf, pos, scan_from = "", 0, 0
+    phase, depth, start = "seek", 0, 0
+    in_string = escaped = False
+    for text in chunks:
+        buf += text
+        if phase == "seek":
+            found = buf.find(marker, scan_from)
+            bracket = buf.find("[", found + len(marker)) if found != -1 else -1
+            if bracket == -1:
+                scan_from = found if found != -1 else max(0, len(buf) - len(marker))
+                continue
+            phase, pos = "array", bracket + 1
+        if phase != "array":
+            continue
+        while pos < len(buf):
+            ch = buf[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                if depth == 0:
+                    start = pos
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        yield "item", json.loads(buf[start:pos + 1])
+                    except ValueError:
+                        pass  # object เสียชิ้นเดียว ข้ามไป (ข่าวนั้นจะถูกถามใหม่ตอน retry)
+            elif ch == "]" and depth == 0:
+                phase = "after"
+                break
+            pos += 1
+    yield "done", buf
+
+
+def article_key(article, model_name):
+    return analysis_cache.make_key(
+        "article", article.get('url'), article.get('title'), article.get('description'),
+        model_name.replace("models/", ""), PROMPT_VERSION
+    )
+
+
+def _weight(item):
+    try:
+        return int(float(item.get('weight', 50)))
+    except (TypeError, ValueError):
+        return 50
+
+
+def _item_index(item, order, count):
+    # จับคู่ผลกลับไปหาข่าวต้นทางด้วย id (ถ้าโมเดลไม่ใส่ id ก็ใช้ลำดับแทน)
+    try:
+        idx = int(item.get('id', order + 1)) - 1
+    except (TypeError, ValueError):
+        idx = order
+    return idx if 0 <= idx < count else None
+
+
+def chunk_articles(news_list, max_tokens=MAX_CHUNK_TOKENS, max_articles=MAX_CHUNK_ARTICLES):
+    # แบ่งตามงบ token ที่ประมาณไว้ (ข่าวเดียวที่ยาวเกินงบก็ได้ก้อนของตัวเอง)
+    chunks, current, used = [], [], 0
+    for i, n in enumerate(news_list):
+        cost = estimate_tokens(format_article(i, n))
+        if current and (used + cost > max_tokens or len(current) >= max_articles):
+            chunks.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def ask_json(api_key, model_name, prompt, retries=CHUNK_RETRIES):
+    # เรียกโมเดลแล้วแปลงเป็น JSON; พังเมื่อไหร่ลองใหม่เฉพาะคำขอนี้
+    for attempt in range(retries + 1):
+        try:
+            return json.loads(clean_json_text(call_gemini(api_key, model_name, prompt)))
+        except (RuntimeError, ValueError, KeyError, IndexError, TypeError, OSError):
+            if attempt == retries:
+                raise
+            time.sleep(http_client.backoff_delay(attempt))
+
+
+def _stream_chunk(api_key, model_name, articles, with_overall, emit, retries=CHUNK_RETRIES):
+    # สตรีมผลของข่าวหนึ่งก้อน: ส่ง emit(ตำแหน่งในก้อน, item) ทันทีที่แต่ละข่าวเสร็จ
+    # พังกลางทาง -> ลองใหม่เฉพาะข่าวในก้อนที่ยังไม่ได้ผล; คืนภาพรวม (ถ้าขอไว้และแกะได้) หรือ None
+    remaining = list(range(len(articles)))
+    overall, error = None, None
+    for attempt in range(retries + 1):
+        batch = [articles[i] for i in remaining]
+        prompt = build_prompt(batch) if with_overall else build_chunk_prompt(batch)
+        done, order = set(), 0
+        try:
+            # thread ของ pool ไม่ได้สืบทอด agent มา -> ระบุเอง; เวลานี้รวมตั้งแต่ส่งคำขอจนโมเดลพิมพ์จบ
+            with metrics.timer("stream", agent=AGENT_NAME, upstream="gemini"):
+                for kind, payload in iter_json_items(stream_gemini(api_key, model_name, prompt)):
+                    if kind == "item":
+                        local = _item_index(payload, order, len(batch))
+                        order += 1
+                        if local is not None and local not in done:
+                            done.add(local)
+                            emit(remaining[local], payload)
+                    elif with_overall and overall is None:
+                        result = json.loads(clean_json_text(payload))
+                        overall = {
+                            "overall_summary": result.get('overall_summary'),
+                            "action_plan": result.get('action_plan')
+                        }
+        except Exception as e:
+            error = e
+        remaining = [i for local, i in enumerate(remaining) if local not in done]
+        if not remaining:
+            break
+        if attempt < retries:
+            time.sleep(http_client.backoff_delay(attempt))
+    if len(remaining) == len(articles):
+        raise error or RuntimeError("Gemini ไม่ส่งผลรายข่าวกลับมา")
+    return overall
+
+
+def stream_articles(news_list, api_key, model_name, max_concurrency=MAX_CONCURRENCY):
+    # generator สำหรับหน้า UI: yield ("item", (ตำแหน่งใน news_list, ผลรายข่าว)) ทันทีที่แต่ละข่าวพร้อม
+    # (ข่าวใน cache มาก่อนเลย) แล้วปิดท้ายด้วย ("overall", {คะแนนรวม, สรุป, คำแนะนำ, ข่าวที่วิเคราะห์ไม่สำเร็จ})
+    # ข่าวใหม่แบ่งเป็นก้อนตามงบ token ยิงขนานกันใน thread แล้วส่งผลกลับผ่าน queue
+    # -> การวาดหน้าจอทั้งหมดอยู่ใน thread หลักของ Streamlit
+    # ผลรายข่าวเก็บใน analysis_cache (key = hash ของ URL/หัวข้อ/คำโปรย/โมเดล/เวอร์ชัน prompt)
+    # ทีละข่าวทันทีที่ได้ -> UI rerun/เลิกอ่านกลางทาง รอบหน้าไม่ต้องจ่ายค่าเรียกข่าวที่ได้ผลแล้วซ้ำ
+    keys = [article_key(n, model_name) for n in news_list]
+    cached = analysis_cache.get_many(keys)
+    missing = [i for i, k in enumerate(keys) if k not in cached]
+    metrics.count("cache_hits", len(news_list) - len(missing), stage="analysis_cache", agent=AGENT_NAME, upstream="gemini")
+    metrics.count("cache_misses", len(missing), stage="analysis_cache", agent=AGENT_NAME, upstream="gemini")
+
+    set_key = analysis_cache.make_key("overall", sorted(keys), model_name, PROMPT_VERSION)
+    overall = None
+
+    for i, k in enumerate(keys):
+        if k in cached:
+            yield "item", (i, cached[k])
+
+    fresh = {}
+    errors = []
+    if missing:
+        chunks = chunk_articles([news_list[i] for i in missing])
+        # ขอภาพรวมพร้อมผลรายข่าวได้เฉพาะตอนที่ก้อนเดียวครอบคลุมทุกข่าว
+        # (มีข่าวจาก cache ปนอยู่ -> ภาพรวมของก้อนนี้ไม่ได้เห็นข่าวเหล่านั้น ต้องสรุปใหม่จากผลทั้งหมด)
+        with_overall = len(chunks) == 1 and len(missing) == len(news_list)
+        events = queue.Queue()
+
+        def work(chunk):
+            try:
+                result = _stream_chunk(
+                    api_key, model_name, [news_list[missing[j]] for j in chunk], with_overall,
+                    lambda pos, item: events.put(("item", missing[chunk[pos]], item))
+                )
+                events.put(("done", result, None))
+            except Exception as e:
+                events.put(("error", e, None))
+
+        # ไม่ใช้ with: ถ้าผู้เรียกเลิกอ่าน (GeneratorExit) __exit__ จะรอ Gemini ทุกก้อนจนจบ -> rerun ค้าง
+        pool = ThreadPoolExecutor(max_workers=min(max_concurrency, len(chunks)))
+        try:
+            for chunk in chunks:
+                pool.submit(work, chunk)
+            pending = len(chunks)
+            while pending:
+                kind, value, item = events.get()
+                if kind == "item":
+                    entry = {
+                        "title": item.get('title'),
+                        "summary": item.get('summary'),
+                        "weight": _weight(item)
+                    }
+                    fresh[keys[value]] = cached[keys[value]] = entry
+                    analysis_cache.put(keys[value], entry)
+                    yield "item", (value, entry)
+                elif kind == "done":
+                    pending -= 1
+                    overall = overall or value
+                else:
+                    pending -= 1
+                    errors.append(value)
+        finally:
+            # ก้อนที่ยังไม่เริ่มถูกยกเลิก; ก้อนที่กำลังยิงอยู่ปล่อยให้จบเองใน thread โดยไม่มีใครรอ
+            pool.shutdown(wait=False, cancel_futures=True)
+        if errors and not fresh and len(missing) == len(news_list):
+            # ไม่ได้ผลเลยสักข่าว -> ให้ UI แสดงเป็นข้อผิดพลาด; ได้บางส่วนจะรายงานใน failed_articles แทน
+            raise errors[0]
+
+    # ก้อนที่พังหมด/ข่าวที่โมเดลไม่ส่งผลกลับหลังลองใหม่ครบ -> แจ้งผู้เรียกแทนการทิ้งเงียบๆ
+    failed = [i for i, k in enumerate(keys) if k not in cached]
+    if failed:
+        metrics.count("errors", len(failed), stage="stream", agent=AGENT_NAME, upstream="gemini")
+    individual = [cached[k] for k in keys if k in cached]
+    weights = [n['weight'] for n in individual]
+    # คะแนนรวมคิดเองจากน้ำหนักรายข่าว (รวมข่าวที่มาจาก cache ด้วย)
+    score = round(sum(weights) / len(weights)) if weights else 50
+
+    if overall is None and not missing:
+        # ข่าวชุดเดิมทั้งชุด -> ใช้ภาพรวมที่สรุปไว้แล้ว
+        overall = analysis_cache.get(set_key)
+    if overall is None and individual:
+        # สรุปภาพรวมรอบเดียวจากผลรายข่าวทั้งหมด (ทั้งจาก cache และที่เพิ่งได้) พังก็ยังได้ผลรายข่าว
+        try:
+            result = ask_json(api_key, model_name, build_synthesis_prompt(individual, score))
+            overall = {
+                "overall_summary": result.get('overall_summary'),
+                "action_plan": result.get('action_plan')
+            }
+        except Exception:
+            overall = None
+    if overall is not None and len(individual) == len(keys):
+        # จำภาพรวมไว้เฉพาะตอนที่ได้ผลครบทุกข่าวในชุด
+        analysis_cache.put(set_key, overall)
+    overall = overall or {}
+
+    yield "overall", {
+        "overall_sentiment_score": score,
+        "overall_summary": overall.get('overall_summary'),
+        "action_plan": overall.get('action_plan'),
+        "failed_articles": failed,
+        "error": str(errors[0]) if errors else ("Gemini ไม่ส่งผลรายข่าวกลับมา" if failed else None)
+    }
+
+
+def analyze_articles(news_list, api_key, model_name):
+    # แบบรอผลครบทีเดียว: รวบผลจาก stream_articles กลับเป็นรูปแบบเดิม (เรียงตามลำดับข่าว)
+    found, overall = {}, {}
+    for kind, payload in stream_articles(news_list, api_key, model_name):
+        if kind == "item":
+            found[payload[0]] = payload[1]
+        else:
+            overall = payload
+    return {"individual_news": [found[i] for i in sorted(found)], **overall}
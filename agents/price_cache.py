@@ -0,0 +1,308 @@
+import os
+import re
+import json
+import time
+import threading
+
+import metrics
+
+# pandas/yfinance import ในฟังก์ชันที่ใช้จริง: แค่ import โมดูลนี้ไม่ต้องจ่ายค่าโหลดราว 1 วินาที
+
+# --- ตั้งค่า Path ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache', 'prices')
+
+# ถ้าเพิ่งดึงมาไม่เกิน TTL วินาที ให้ใช้ของใน cache เลย (agent ที่รันในนาทีเดียวกันแชร์การดาวน์โหลดครั้งเดียว)
+DEFAULT_TTL = 60
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# เก็บย้อนหลังได้ไม่เกินกี่วันต่อ interval (ตัดตอนบันทึก) -> cache ไม่โตไม่สิ้นสุด และอ่านแบบ warm ไม่ต้องโหลดทั้งก้อน
+# (Yahoo ให้แท่ง 1 นาทีย้อนได้ราว 30 วันอยู่แล้ว; รายวันเผื่อ backtest 10 ปี)
+MAX_LOOKBACK_DAYS = {"1m": 8, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "60m": 730, "1h": 730, "1d": 15 * 366}
+# ดึงใหม่ไม่ได้: ใช้ cache เดิมต่อได้ถ้าดึงสำเร็จครั้งล่าสุดไม่เกินเท่านี้ (วินาที) เก่ากว่านั้นถือว่าไม่มีข้อมูล
+MAX_STALE_SECONDS = 2 * 24 * 3600
+MAX_STALE_SECONDS_INTRADAY = 60 * 60
+
+# กันไม่ให้ thread ใน process เดียวกัน (เช่นตอนรันผ่าน orchestrator) ยิงดาวน์โหลด symbol เดียวกันซ้อนกัน
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _symbol_lock(symbol, interval):
+    with _locks_guard:
+        return _locks.setdefault((symbol, interval), threading.Lock())
+
+
+def _cache_paths(symbol, interval):
+    safe = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+    base = os.path.join(CACHE_DIR, f"{safe}_{interval}")
+    return base + ".parquet", base + ".json"
+
+
+def _parse_period(period):
+    # รองรับรูปแบบเดียวกับ yfinance ที่ agent ใช้: "5d", "60d", "3mo", "2y"
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if not match:
+        raise ValueError(f"ไม่รองรับ period: {period}")
+    return int(match.group(1)), match.group(2)
+
+
+def _period_bars(period, interval="1d"):
+    # แท่งรายวัน + period หน่วย "d" = ต้องการ n แท่ง (agent นับ MA/เปลี่ยนแปลงเป็นจำนวนแท่ง)
+    # เช่น "60d" ต้องได้ 60 แท่งให้ MA50 คำนวณได้ ไม่ใช่ 60 วันปฏิทิน (~41 แท่ง)
+    n, unit = _parse_period(period)
+    return n if unit == "d" and interval == "1d" else None
+
+
+def _period_to_days(period, interval="1d"):
+    # จำนวนวันปฏิทินที่ cache ต้องครอบคลุม
+    n, unit = _parse_period(period)
+    if _period_bars(period, interval):
+        # เผื่อเสาร์อาทิตย์ (5 วันเทรดต่อ 7 วัน) + วันหยุดยาว
+        return n * 7 // 5 + 10
+    return n * {"d": 1, "wk": 7, "mo": 31, "y": 366}[unit]
+
+
+def _load(symbol, interval):
+    import pandas as pd
+
+    bars_path, meta_path = _cache_paths(symbol, interval)
+    if not (os.path.exists(bars_path) and os.path.exists(meta_path)):
+        return None, None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return pd.read_parquet(bars_path), meta
+    except Exception:
+        # cache เสียก็แค่ดึงใหม่แบบ cold
+        return None, None
+
+
+def _trim(bars, meta, interval):
+    # ตัดแท่งที่เก่ากว่า MAX_LOOKBACK_DAYS ของ interval นี้ทิ้ง (นับจากแท่งล่าสุด)
+    import pandas as pd
+
+    limit = MAX_LOOKBACK_DAYS.get(interval)
+    if not limit or bars.empty:
+        return bars, meta
+    bars = bars[bars.index >= bars.index[-1] - pd.Timedelta(days=limit)]
+    return bars, {**meta, "covered_days": min(meta["covered_days"], limit)}
+
+
+def _save(symbol, interval, bars, meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    bars_path, meta_path = _cache_paths(symbol, interval)
+    bars, meta = _trim(bars, meta, interval)
+    # เขียนไฟล์ชั่วคราวก่อนแล้วค่อย replace -> agent อื่นจะไม่เจอไฟล์ที่เขียนไม่เสร็จ
+    bars.to_parquet(bars_path + ".tmp")
+    os.replace(bars_path + ".tmp", bars_path)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _strip_tz(bars):
+    # Ticker.history() คืน index แบบมี timezone แต่ yf.download() คืนแบบไม่มี
+    # -> เก็บทุกอย่างเป็นเวลาท้องถิ่นของตลาดแบบไม่มี tz จะได้ต่อกันได้
+    if bars is not None and getattr(bars.index, "tz", None) is not None:
+        bars = bars.tz_localize(None)
+    return bars
+
+
+def _is_intraday(interval):
+    return interval.endswith(("m", "h")) and not interval.endswith("mo")
+
+
+def _to_utc(bars):
+    # แท่งรายนาที/ชั่วโมงเก็บเป็น UTC แบบไม่มี tz -> เทียบกับเวลาข่าว (UTC) ได้ตรงๆ
+    # (แท่งรายวันยังเก็บเป็นวันที่ของตลาดตาม _strip_tz เหมือนเดิม)
+    if bars is not None and getattr(bars.index, "tz", None) is not None:
+        bars = bars.tz_convert("UTC")
+    return bars
+
+
+def _merge(old, new):
+    import pandas as pd
+
+    old, new = _strip_tz(old), _strip_tz(new)
+    if old is None or old.empty:
+        merged = new
+    elif new is None or new.empty:
+        merged = old
+    else:
+        merged = pd.concat([old, new])
+    # แท่งล่าสุดของวันที่ยังไม่ปิดตลาดจะถูกดึงซ้ำ -> เก็บค่าใหม่สุด
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+
+def _slice(bars, days, count=None, utc=False):
+    # ตัดตามวันปฏิทินก่อน แล้วถ้าขอเป็นจำนวนแท่งค่อยเก็บ n แท่งท้าย (utc = index เป็น UTC แบบไม่มี tz)
+    import pandas as pd
+
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None) if utc else pd.Timestamp.now(tz=bars.index.tz)
+    cutoff = now - pd.Timedelta(days=days)
+    bars = bars[bars.index >= cutoff]
+    if count:
+        bars = bars.tail(count)
+    return bars.copy()
+
+
+def _is_fresh(meta, days, now, ttl):
+    return meta is not None and meta.get("covered_days", 0) >= days and now - meta["fetched_at"] < ttl
+
+
+def _check_stale(symbol, interval, meta, now):
+    # ดึงใหม่ไม่สำเร็จแต่มี cache: บอกให้รู้ว่ากำลังใช้ของเก่า (ไม่ใช่ส่งให้หน้าจอเหมือนราคาปัจจุบันเงียบๆ)
+    # เก่าเกินกำหนด -> RuntimeError ให้ agent ล้มเหลวแทนการแสดงราคาเมื่อหลายวันก่อน
+    age = now - meta["fetched_at"]
+    limit = MAX_STALE_SECONDS_INTRADAY if _is_intraday(interval) else MAX_STALE_SECONDS
+    metrics.count("stale_served", stage="price_cache", upstream="yahoo")
+    if age > limit:
+        raise RuntimeError(f"ราคา {symbol} ({interval}) ใน cache เก่า {age / 3600:.1f} ชม. ดึงใหม่ไม่สำเร็จ")
+    print(f"   ⚠️ price_cache: ใช้ราคา {symbol} ({interval}) จาก cache เมื่อ {age / 60:.0f} นาทีก่อน")
+
+
+def get_history(symbol, period="60d", interval="1d", ttl=DEFAULT_TTL):
+    # คืน DataFrame แท่งราคา OHLCV เหมือน yf.Ticker(symbol).history(period=...)
+    # แต่ดึงจากเน็ตเฉพาะแท่งที่ใหม่กว่าแท่งล่าสุดใน cache
+    import pandas as pd
+    import yfinance as yf
+
+    days = _period_to_days(period, interval)
+    count = _period_bars(period, interval)
+    now = time.time()
+
+    with _symbol_lock(symbol, interval):
+        cached, meta = _load(symbol, interval)
+        covered = cached is not None and not cached.empty and meta.get("covered_days", 0) >= days
+
+        # 1. ยังสดอยู่ในช่วง TTL -> ไม่แตะเน็ตเลย
+        if covered and now - meta["fetched_at"] < ttl:
+            metrics.count("cache_hits", stage="price_cache", upstream="yahoo")
+            return _slice(cached, days, count, _is_intraday(interval))
+        metrics.count("cache_misses", stage="price_cache", upstream="yahoo")
+
+        try:
+            with metrics.timer("http", upstream="yahoo"):
+                if covered:
+                    # 2. warm: ดึงเฉพาะตั้งแต่วันของแท่งล่าสุด (รวมแท่งล่าสุดที่อาจยังไม่ปิด)
+                    start = cached.index[-1].strftime("%Y-%m-%d")
+                    fresh = yf.Ticker(symbol).history(start=start, interval=interval)
+                    covered_days = meta["covered_days"]
+                else:
+                    # 3. cold: ดึงเต็มช่วง (period แบบนับแท่งขยายเป็นวันปฏิทินที่ครอบคลุม n แท่ง)
+                    fresh = yf.Ticker(symbol).history(period=f"{days}d" if count else period, interval=interval)
+                    covered_days = days
+        except Exception as e:
+            print(f"   ⚠️ price_cache: ดึง {symbol} ไม่สำเร็จ ({e})")
+            metrics.count("errors", stage="price_cache", upstream="yahoo")
+            fresh = None
+            covered_days = meta.get("covered_days", 0) if meta else 0
+
+        if fresh is not None and not fresh.empty:
+            fresh = fresh[[c for c in OHLCV_COLUMNS if c in fresh.columns]]
+            if _is_intraday(interval):
+                fresh = _to_utc(fresh)
+            bars = _merge(cached, fresh)
+            _save(symbol, interval, bars, {"fetched_at": now, "covered_days": covered_days})
+        elif cached is not None:
+            # เน็ตล่ม -> ใช้ของเก่าไปก่อนดีกว่าไม่มีอะไรเลย (ถ้ายังไม่เก่าเกินกำหนด)
+            _check_stale(symbol, interval, meta, now)
+            bars = cached
+        else:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+        return _slice(bars, days, count, _is_intraday(interval))
+
+
+def _download(symbols, interval, **kwargs):
+    # คำขอเดียวได้ทุก symbol -> แยกคืนเป็น {symbol: DataFrame OHLCV}
+    import pandas as pd
+    import yfinance as yf
+
+    with metrics.timer("http", upstream="yahoo"):
+        raw = yf.download(symbols, interval=interval, group_by="column", auto_adjust=True,
+                          threads=True, progress=False, **kwargs)
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+    for symbol in symbols:
+        if isinstance(raw.columns, pd.MultiIndex):
+            if symbol not in raw.columns.get_level_values(1):
+                continue
+            bars = raw.xs(symbol, axis=1, level=1)
+        else:
+            bars = raw
+        bars = bars[[c for c in OHLCV_COLUMNS if c in bars.columns]].dropna(how="all")
+        if not bars.empty:
+            frames[symbol] = bars
+    return frames
+
+
+def get_closes(symbols, period="5d", interval="1d", ttl=DEFAULT_TTL):
+    # คืนตารางกว้าง: index = วันที่, คอลัมน์ = symbol, ค่า = ราคาปิด
+    # symbol ที่หมด TTL ถูกรวบไปดึงใน yf.download ครั้งเดียว (แยกกลุ่ม warm/cold ไม่เกิน 2 คำขอ)
+    import pandas as pd
+
+    days = _period_to_days(period, interval)
+    count = _period_bars(period, interval)
+    now = time.time()
+    symbols = list(dict.fromkeys(symbols))
+
+    # จับ lock เรียงตามชื่อเสมอ กัน deadlock กับ get_history() ที่รันขนานกัน
+    locks = [_symbol_lock(s, interval) for s in sorted(symbols)]
+    for lock in locks:
+        lock.acquire()
+    try:
+        cache = {s: _load(s, interval) for s in symbols}
+        stale = [s for s in symbols if not _is_fresh(cache[s][1], days, now, ttl)]
+        warm = [s for s in stale if cache[s][1] and cache[s][1].get("covered_days", 0) >= days]
+        cold = [s for s in stale if s not in warm]
+        metrics.count("cache_hits", len(symbols) - len(stale), stage="price_cache", upstream="yahoo")
+        metrics.count("cache_misses", len(stale), stage="price_cache", upstream="yahoo")
+
+        fetched = {}
+        try:
+            if cold:
+                fetched.update(_download(cold, interval, period=f"{days}d" if count else period))
+            if warm:
+                start = min(_strip_tz(cache[s][0]).index[-1] for s in warm).strftime("%Y-%m-%d")
+                fetched.update(_download(warm, interval, start=start))
+        except Exception as e:
+            print(f"   ⚠️ price_cache: ดึงแบบกลุ่มไม่สำเร็จ ({e})")
+            metrics.count("errors", stage="price_cache", upstream="yahoo")
+
+        closes = {}
+        for s in symbols:
+            bars, meta = cache[s]
+            if s in fetched:
+                covered_days = meta["covered_days"] if s in warm else days
+                bars = _merge(bars, fetched[s])
+                _save(s, interval, bars, {"fetched_at": now, "covered_days": covered_days})
+            elif s in stale and bars is not None:
+                try:
+                    _check_stale(s, interval, cache[s][1], now)
+                except RuntimeError as e:
+                    # symbol เดียวเก่าเกินไม่ควรทำให้ทั้งตารางพัง -> ปล่อยเป็นคอลัมน์ว่าง
+                    print(f"   ⚠️ price_cache: {e}")
+                    bars = None
+            if bars is not None and not bars.empty:
+                # นับแท่งแยกทีละ symbol: BTC เทรดเสาร์อาทิตย์ n แท่งของมันจึงสั้นกว่าทองในแง่วันปฏิทิน
+                closes[s] = _strip_tz(_slice(bars, days, count))["Close"]
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+    # symbol ที่ไม่มีข้อมูลเลยยังได้คอลัมน์ว่าง (NaN) -> ฝั่งคำนวณจัดการทีละคอลัมน์ได้
+    return pd.DataFrame(closes).reindex(columns=symbols).sort_index()
+
+
+def get_quote(symbol):
+    # ราคาล่าสุดแบบเบา (ไม่อ่าน/เขียน cache แท่งราคา) สำหรับเก็บถี่ๆ ช่วงข่าวออก
+    import yfinance as yf
+
+    with metrics.timer("http", upstream="yahoo"):
+        price = yf.Ticker(symbol).fast_info["last_price"]
+    return float(price) if price is not None else None
@@ -0,0 +1,156 @@
+import os
+import json
+import threading
+
+# ==============================================================================
+# เครื่องคิดคะแนน War Room แบบประกาศใน config (config/scoring.json)
+# - signals : แต่ละ agent อ่านคอลัมน์ไหน ข้อความแบบไหนได้กี่แต้ม (กฎแรกที่ตรงชนะ) และน้ำหนักคูณ
+# - bands   : ช่วงคะแนน -> คำตัดสิน (เรียงจากสูงไปต่ำ; inclusive = นับค่าขอบด้วยไหม)
+#             position = สถานะที่ถือในช่วงนั้น (1 = ซื้อเต็ม, -1 = ขาย) ใช้ใน backtester
+# มีสองทาง: คิดแถวล่าสุดแบบ python ล้วน (War Room ไม่ต้องโหลด pandas)
+# กับคิดทั้งประวัติทีเดียวแบบ vectorized (score_history) ได้คะแนนย้อนหลังรายวัน
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCORING_CONFIG = os.path.join(BASE_DIR, 'config', 'scoring.json')
+
+# cache ในโปรเซส: path -> (mtime_ns, config)
+_configs = {}
+_lock = threading.Lock()
+
+
+def load_config(path=SCORING_CONFIG):
+    # อ่านใหม่เฉพาะตอนไฟล์ config ถูกแก้
+    mtime = os.stat(path).st_mtime_ns
+    with _lock:
+        hit = _configs.get(path)
+        if hit is None or hit[0] != mtime:
+            with open(path, 'r', encoding='utf-8') as f:
+                hit = (mtime, json.load(f))
+            _configs[path] = hit
+        return hit[1]
+
+
+def rule_points(signal, text):
+    # แต้มดิบ (ยังไม่คูณน้ำหนัก) ของข้อความหนึ่งค่า; ไม่ตรงกฎไหนเลย/ไม่มีข้อมูล = 0
+    if not isinstance(text, str):
+        return 0
+    for rule in signal['rules']:
+        if rule['contains'] in text:
+            return rule['points']
+    return 0
+
+
+def signal_points(config, name, record):
+    # แต้มของ agent หนึ่งตัวจากแถวล่าสุด (dict จาก CSV) หรือ 0 ถ้าไม่มีข้อมูล
+    signal = config['signals'][name]
+    if not record:
+        return 0
+    return rule_points(signal, record.get(signal['column'])) * signal.get('weight', 1.0)
+
+
+def signal_share(config, name):
+    # สัดส่วนที่สัญญาณนี้ขยับคะแนนรวมได้สูงสุด (แต้มสูงสุดของกฎ x น้ำหนัก / max_score)
+    signal = config['signals'][name]
+    top = max((abs(rule['points']) for rule in signal['rules']), default=0)
+    return top * signal.get('weight', 1.0) / config['max_score'] if config['max_score'] else 0
+
+
+def band_for(config, score):
+    for band in config['bands']:
+        if band['min'] is None:
+            return band
+        if score > band['min'] or (band['inclusive'] and score == band['min']):
+            return band
+    return config['bands'][-1]
+
+
+# ==============================================================================
+# ทางแบบ vectorized: ประวัติจาก history_store -> ตารางรายวัน -> คะแนนทุกวันในครั้งเดียว
+# (import pandas/numpy/history_store ในฟังก์ชัน เพื่อให้ทางแถวล่าสุดด้านบนเปิดเร็ว)
+# ==============================================================================
+
+def load_signal_history(config, start=None, end=None):
+    # คืน {ชื่อ signal: Series ข้อความรายวัน (ค่าสุดท้ายของวัน)}
+    import pandas as pd
+    from history_store import read_history
+
+    series = {}
+    for name, signal in config['signals'].items():
+        where = signal.get('where', {})
+        time_col = signal['time_column']
+        frame = read_history(signal['dataset'], columns=[time_col, signal['column'], *where], start=start, end=end)
+        if frame.empty or signal['column'] not in frame:
+            series[name] = pd.Series(dtype=object)
+            continue
+        mask = pd.Series(True, index=frame.index)
+        for column, value in where.items():
+            mask &= frame[column] == value
+        frame = frame[mask]
+        days = pd.to_datetime(frame[time_col]).dt.normalize()
+        series[name] = frame[signal['column']].groupby(days).last()
+    return series
+
+
+def align_signals(config, series):
+    # รวมทุก signal บนปฏิทินรายวันเดียวกัน; ค่าล่าสุดใช้ต่อได้ไม่เกิน hold_days วัน
+    # (COT ออกสัปดาห์ละครั้ง ส่วนราคาออกทุกวันทำการ)
+    import pandas as pd
+
+    non_empty = [s.index for s in series.values() if len(s)]
+    if not non_empty:
+        return pd.DataFrame(columns=list(config['signals']))
+    days = pd.date_range(min(i.min() for i in non_empty), max(i.max() for i in non_empty), freq='D')
+    aligned = {}
+    for name, signal in config['signals'].items():
+        s = series.get(name, pd.Series(dtype=object))
+        aligned[name] = s.reindex(days).ffill(limit=signal.get('hold_days'))
+    return pd.DataFrame(aligned, index=days)
+
+
+def points_frame(config, aligned):
+    # แต้มดิบต่อ signal ต่อวัน: ข้อความที่ต่างกันจริงๆ มีไม่กี่แบบ
+    # -> คิดกฎเฉพาะค่าที่ไม่ซ้ำ (factorize) แล้วกระจายกลับด้วย take ไม่วนทีละแถว
+    import numpy as np
+    import pandas as pd
+
+    points = {}
+    for name, signal in config['signals'].items():
+        codes, uniques = pd.factorize(aligned[name])
+        lookup = np.array([rule_points(signal, u) for u in uniques] + [0], dtype=float)
+        points[name] = lookup[codes]  # code -1 (ไม่มีข้อมูล) ชี้ไปช่องท้าย = 0
+    return pd.DataFrame(points, index=aligned.index)
+
+
+def weights_vector(config):
+    import numpy as np
+    return np.array([s.get('weight', 1.0) for s in config['signals'].values()], dtype=float)
+
+
+def classify_bands(config, scores):
+    # คะแนน (array) -> key ของช่วงคำตัดสิน ทีละทั้งชุด
+    import numpy as np
+
+    conditions, keys = [], []
+    for band in config['bands']:
+        if band['min'] is None:
+            break
+        conditions.append(scores >= band['min'] if band['inclusive'] else scores > band['min'])
+        keys.append(band['key'])
+    return np.select(conditions, keys, default=config['bands'][-1]['key'])
+
+
+def score_history(start=None, end=None, config=None):
+    # ตารางรายวัน: แต้มของแต่ละ agent (คูณน้ำหนักแล้ว), Score รวม และ Verdict
+    config = config or load_config()
+    aligned = align_signals(config, load_signal_history(config, start, end))
+    raw = points_frame(config, aligned)
+    weighted = raw * weights_vector(config)
+    weighted['Score'] = weighted.sum(axis=1)
+    weighted['Verdict'] = classify_bands(config, weighted['Score'].to_numpy())
+    return weighted
+
+
+if __name__ == "__main__":
+    history = score_history()
+    print(f"📊 คะแนน War Room ย้อนหลัง {len(history)} วัน")
+    print(history.tail(20).to_string())
@@ -0,0 +1,145 @@
+import os
+import csv
+import hashlib
+import threading
+from array import array
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# ==============================================================================
+# ดัชนี "ข่าวที่เคยบันทึกแล้ว" แบบถาวร: เก็บ hash 8 ไบต์ (blake2b) ของลิงก์ที่ normalize แล้ว
+# ต่อท้ายไฟล์ binary ทีละ 8 ไบต์ -> ขนาดโตตามจำนวนข่าวที่ไม่ซ้ำ ไม่ใช่จำนวนรอบที่รัน
+# hash 64 บิต: โอกาสชนกัน (ข่าวใหม่ถูกมองว่าเคยเห็น) ~ n^2 / 2^65 ซึ่งยังต่ำกว่า 1e-9 ที่หลักแสนข่าว
+# ==============================================================================
+DIGEST_SIZE = 8
+
+# query string ที่เปลี่ยนไปมาแต่ไม่ได้ทำให้เป็นข่าวใหม่
+TRACKING_PARAMS = ("utm_", "oc", "ved", "usg", "fbclid", "gclid")
+
+# cache ในโปรเซส: path -> (ขนาดไฟล์ที่โหลดถึง, set ของ digest)
+_indexes = {}
+_lock = threading.Lock()
+
+
+def normalize_link(link):
+    # ลิงก์เดียวกันที่ต่างกันแค่ตัวพิมพ์ host, #fragment, / ท้าย หรือพารามิเตอร์ติดตาม -> key เดียวกัน
+    link = (link or "").strip()
+    if not link:
+        return ""
+    parts = urlsplit(link)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith(TRACKING_PARAMS)]
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path.rstrip("/") or "/",
+        urlencode(sorted(query)),
+        "",
+    ))
+
+
+def news_key(item):
+    # ใช้ลิงก์เป็นหลัก (มีใน CSV เสมอ) ถ้าไม่มีค่อยใช้ GUID แล้วค่อยหัวข้อข่าว
+    return (normalize_link(item.get("Link") or item.get("link"))
+            or (item.get("id") or "").strip()
+            or (item.get("Title") or item.get("title") or "").strip().lower())
+
+
+def digest(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=DIGEST_SIZE).digest(), "little")
+
+
+def _load(path):
+    # อ่านเฉพาะส่วนที่ต่อท้ายมาหลังการโหลดครั้งก่อน (มีโปรเซสอื่นเขียนเพิ่มก็เห็น)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    loaded, seen = _indexes.get(path, (0, set()))
+    if size < loaded:  # ไฟล์ถูก compact/ลบไปแล้ว -> โหลดใหม่ทั้งหมด
+        loaded, seen = 0, set()
+    if size > loaded:
+        usable = size - size % DIGEST_SIZE
+        with open(path, "rb") as f:
+            f.seek(loaded)
+            chunk = array("Q")
+            chunk.frombytes(f.read(usable - loaded))
+        seen.update(chunk)
+        loaded = usable
+    _indexes[path] = (loaded, seen)
+    return seen
+
+
+def filter_unseen(path, items, key_fn=news_key):
+    # คืนเฉพาะรายการที่ยังไม่เคยเห็น (ตัดตัวซ้ำในชุดเดียวกันด้วย) -> อ่านอย่างเดียว ไม่แตะดัชนี
+    # ผู้เรียกต้อง mark_seen() เองหลังบันทึกข้อมูลสำเร็จ (บันทึกพังกลางทาง ข่าวจะได้ไม่หายไปตลอดกาล)
+    with _lock:
+        seen = _load(path)
+        fresh, batch = [], set()
+        for item in items:
+            d = digest(key_fn(item))
+            if d in seen or d in batch:
+                continue
+            batch.add(d)
+            fresh.append(item)
+    return fresh
+
+
+def mark_seen(path, items, key_fn=news_key):
+    # ต่อท้าย digest ของรายการที่บันทึกเสร็จแล้วลงดัชนี (ข้ามตัวที่มีอยู่แล้ว)
+    with _lock:
+        seen = _load(path)
+        new_digests = array("Q")
+        for item in items:
+            d = digest(key_fn(item))
+            if d in seen:
+                continue
+            seen.add(d)
+            new_digests.append(d)
+
+        if new_digests:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as f:
+                f.write(new_digests.tobytes())
+            loaded, _ = _indexes[path]
+            _indexes[path] = (loaded + len(new_digests) * DIGEST_SIZE, seen)
+    return len(new_digests)
+
+
+def _write_index(path, digests):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = array("Q", digests)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data.tobytes())
+    os.replace(path + ".tmp", path)
+    _indexes[path] = (len(data) * DIGEST_SIZE, set(data))
+
+
+def compact_csv(csv_path, index_path, key_fn=news_key, encoding="utf-8"):
+    # ล้างแถวซ้ำใน CSV เดิม (เก็บแถวแรกที่เจอ) แล้วสร้างดัชนีใหม่ให้ตรงกับไฟล์
+    # อ่าน/เขียนทีละแถว ไม่ต้องโหลดทั้งไฟล์เข้าหน่วยความจำ
+    # คืน (จำนวนแถวเดิม, จำนวนแถวที่เหลือ)
+    with _lock:
+        if not os.path.exists(csv_path):
+            _write_index(index_path, [])
+            return 0, 0
+
+        seen, order = set(), []
+        total = kept = 0
+        with open(csv_path, "r", encoding=encoding, newline="") as src:
+            reader = csv.DictReader(src)
+            if not reader.fieldnames:
+                # ไฟล์ว่าง/ไม่มีหัวตาราง -> ไม่มีอะไรให้ล้าง และไม่เขียนหัวตารางเปล่าทับไฟล์
+                _write_index(index_path, [])
+                return 0, 0
+            with open(csv_path + ".tmp", "w", encoding=encoding, newline="") as dst:
+                writer = csv.DictWriter(dst, fieldnames=reader.fieldnames, lineterminator="\n")
+                writer.writeheader()
+                for row in reader:
+                    total += 1
+                    d = digest(key_fn(row))
+                    if d in seen:
+                        continue
+                    seen.add(d)
+                    order.append(d)
+                    writer.writerow(row)
+                    kept += 1
+        os.replace(csv_path + ".tmp", csv_path)
+        _write_index(index_path, order)
+    return total, kept
@@ -0,0 +1,575 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import contextlib
+import subprocess
+import tempfile
+from datetime import datetime
+
+# ==============================================================================
+# ชุดวัดความเร็วแบบออฟไลน์: ใช้ข้อมูลที่อัดไว้ใน benchmarks/fixtures แทน Yahoo/NewsAPI/Gemini/Forex Factory
+# จับเวลาแยกขั้น parse / compute / write ของแต่ละ agent ที่ขนาดข้อมูล 1x, 100x, 10000x
+# ผลเก็บใน benchmarks/results/<commit>.json แล้วเทียบข้าม commit ได้ด้วย --compare
+#
+#   python benchmarks/run_benchmarks.py                      # วัดทุกขั้น บันทึกผลของ commit ปัจจุบัน
+#   python benchmarks/run_benchmarks.py --scales 1,100       # เลือกขนาดเอง
+#   python benchmarks/run_benchmarks.py --only scout,gemini  # เฉพาะบาง agent
+#   python benchmarks/run_benchmarks.py --compare HEAD~1     # เทียบกับผลที่บันทึกไว้ของ commit อื่น
+#   python benchmarks/run_benchmarks.py --importtime agent_002_financial  # ดูว่า import อะไรกินเวลาตอนเริ่ม
+# ==============================================================================
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+AGENTS_DIR = os.path.join(BASE_DIR, 'agents')
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+for path in (AGENTS_DIR, BASE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+DEFAULT_SCALES = [1, 100, 10000]
+DEFAULT_REPEAT = 5
+MAX_INPUT_BYTES = 256 * 1024 * 1024   # ขนาดที่ขยายแล้วเกินนี้ให้ข้าม (กันเครื่องแรมหมด)
+REGRESSION_THRESHOLD = 0.25           # ช้าลงเกิน 25% = ถือว่าถดถอย
+STARTUP_BUDGET_MS = 100               # War Room CLI ต้องพิมพ์คำตัดสินได้ภายในเวลานี้
+STARTUP_MODULES = ["main_war_room", "agent_001_scout", "agent_002_financial", "agent_002_intermarket",
+                   "agent_003_macro", "agent_004_whale", "agent_005_spdr"]
+
+
+def read_fixture(name, mode="rb"):
+    with open(os.path.join(FIXTURES_DIR, name), mode) as f:
+        return f.read()
+
+
+# ==============================================================================
+# ขยายข้อมูลตัวอย่างเป็น N เท่า (ทุกชิ้นยังไม่ซ้ำกัน เพื่อไม่ให้ dedup ตัดทิ้ง)
+# ==============================================================================
+
+def scale_rss(scale):
+    content = read_fixture("google_news_rss.xml").decode("utf-8")
+    head, rest = content.split("<item>", 1)
+    items = re.findall(r"<item>.*?</item>", "<item>" + rest, re.S)
+    tail = content[content.rindex("</item>") + len("</item>"):]
+    body = []
+    for copy in range(scale):
+        for item in items:
+            body.append(item if copy == 0 else re.sub(r"(CBMi\w+)", rf"\1x{copy}", item))
+    return (head + "".join(body) + tail).encode("utf-8")
+
+
+def scale_ff_calendar(scale):
+    content = read_fixture("ff_calendar_thisweek.xml").decode("utf-8")
+    events = re.findall(r"\t<event>.*?</event>\n", content, re.S)
+    head = content[:content.index("\t<event>")]
+    return (head + "".join(events * scale) + "</weeklyevents>\n").encode("utf-8")
+
+
+def scale_cot(scale):
+    with open(os.path.join(AGENTS_DIR, 'deacomes.txt'), 'rb') as f:
+        return f.read() * scale
+
+
+def scale_bars(scale):
+    import pandas as pd
+    import numpy as np
+
+    bars = pd.read_csv(os.path.join(FIXTURES_DIR, "gc_f_history.csv"), index_col="Date", parse_dates=True)
+    if scale == 1:
+        return bars
+    # ต่อแท่งเดิมซ้ำเป็นแท่งรายนาที (แท่งรายวัน 600,000 แท่งย้อนไปเกินช่วงวันที่ที่ pandas รองรับ)
+    frame = pd.DataFrame(np.tile(bars.to_numpy(), (scale, 1)), columns=bars.columns,
+                         index=pd.date_range(end=bars.index[-1], periods=len(bars) * scale, freq='min'))
+    return frame
+
+
+def scale_closes(scale):
+    import pandas as pd
+
+    closes = pd.read_csv(os.path.join(FIXTURES_DIR, "intermarket_closes.csv"), index_col="Date", parse_dates=True)
+    if scale == 1:
+        return closes
+    # ขยายเป็นตารางกว้าง: เพิ่ม symbol (คอลัมน์) ไม่ใช่จำนวนวัน เพราะ agent ใช้แค่ 5 วันล่าสุดเสมอ
+    copies = [closes.add_suffix("" if i == 0 else f"#{i}") for i in range(scale)]
+    return pd.concat(copies, axis=1).copy()  # รวม block เป็นก้อนเดียวแบบที่ get_closes คืนมา
+
+
+def scale_gemini(scale):
+    reply = json.loads(read_fixture("gemini_reply.json").decode("utf-8"))
+    text = reply['candidates'][0]['content']['parts'][0]['text']
+    body = json.loads(text.strip("`").removeprefix("json"))
+    body['individual_news'] = [dict(item, id=i + 1) for i, item in enumerate(body['individual_news'] * scale)]
+    reply['candidates'][0]['content']['parts'][0]['text'] = "```json\n" + json.dumps(body, ensure_ascii=False, indent=2) + "\n```"
+    return reply
+
+
+def scale_csv(scale):
+    # CSV ประวัติแบบที่ War Room อ่าน (แถวล่าสุดอยู่ท้ายไฟล์) ยาว 100 x N แถว
+    header = "Date,Asset,Price,Change,Pct_Change,Trend,Signal\n"
+    row = "2025-01-14 16:00:00,Gold,2712.40,12.30,0.46,🔥 UPTREND (ขาขึ้นแข็งแกร่ง),BUY\n"
+    return (header + row * (100 * scale)).encode("utf-8")
+
+
+# ==============================================================================
+# ของปลอมแทนเครือข่าย: ตอบด้วย fixture ทันที
+# ==============================================================================
+
+class FakeResponse:
+    def __init__(self, content, status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.content)
+
+
+@contextlib.contextmanager
+def patched(module, **attrs):
+    old = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(module, name, value)
+
+
+@contextlib.contextmanager
+def sandbox():
+    # ทุกไฟล์ที่ agent เขียน (CSV, cache, history) ไปลงโฟลเดอร์ชั่วคราว ไม่แตะ data/ จริง
+    import metrics
+    import history_store
+    import indicator_engine
+    with tempfile.TemporaryDirectory(prefix="gwr-bench-") as tmp:
+        with patched(history_store, HISTORY_DIR=os.path.join(tmp, 'history')), \
+                patched(indicator_engine, STATE_DIR=os.path.join(tmp, 'indicators')), \
+                patched(metrics, METRICS_FILE=os.path.join(tmp, 'metrics.json')):
+            try:
+                yield tmp
+            finally:
+                metrics.flush()  # สถิติจากรอบวัดไม่ปนกับของจริง
+
+
+# ==============================================================================
+# ขั้นที่วัด: setup(scale, tmp) เตรียมข้อมูล (ไม่จับเวลา) -> run(ctx) คือส่วนที่จับเวลา
+# ==============================================================================
+
+def _scout_parse(ctx):
+    import agent_001_scout as scout
+    return sum(1 for _ in scout.iter_feed_items(ctx['content']))
+
+
+def _scout_filter(ctx):
+    import keyword_matcher
+    import agent_001_scout as scout
+    matcher = keyword_matcher.get_matcher(scout.WATCHLIST_NAME, scout.KEYWORDS)
+    return sum(1 for t in ctx['titles'] if keyword_matcher.find_matches(matcher, t))
+
+
+def _scout_setup(scale, tmp):
+    import agent_001_scout as scout
+    content = scale_rss(scale)
+    titles = [item['title'] for _, item in scout.iter_feed_items(content)]
+    return {"content": content, "titles": titles, "tmp": tmp}
+
+
+def _scout_end_to_end(ctx):
+    import http_client
+    import agent_001_scout as scout
+
+    async def fake_aget(url, **kwargs):
+        return FakeResponse(ctx['content'])
+
+    tmp = tempfile.mkdtemp(dir=ctx['tmp'])
+    with patched(http_client, aget=fake_aget), \
+            patched(scout, FEED_STATE_FILE=os.path.join(tmp, 'state.json'), RSS_FEEDS=scout.RSS_FEEDS[:1]):
+        return len(scout.fetch_and_filter_news()[0])
+
+
+def _scout_write_setup(scale, tmp):
+    ctx = _scout_setup(scale, tmp)
+    ctx['news'] = [
+        {"Timestamp": "2025-01-14 16:00:00", "Title": t, "Matched_Keywords": "Trump",
+         "Link": f"https://news.google.com/rss/articles/{i}", "Source": "Bench"}
+        for i, t in enumerate(ctx['titles'])
+    ]
+    return ctx
+
+
+def _scout_write(ctx):
+    import agent_001_scout as scout
+    tmp = tempfile.mkdtemp(dir=ctx['tmp'])
+    with patched(scout, DATA_FOLDER=tmp, SEEN_INDEX_FILE=os.path.join(tmp, 'seen.idx')):
+        scout.save_intelligence(ctx['news'])
+    return len(ctx['news'])
+
+
+def _macro_setup(scale, tmp):
+    return {"content": scale_ff_calendar(scale), "tmp": tmp}
+
+
+def _macro_parse(ctx):
+    # แกะทุก event ไม่กรอง (เทียบได้กับการโหลดทั้งไฟล์)
+    import agent_003_macro as macro
+    return sum(1 for _ in macro.iter_calendar_events(ctx['content']))
+
+
+def _macro_end_to_end(ctx):
+    # ทั้ง 3 feed ได้ไฟล์เดียวกัน -> วัดการแกะ 3 รอบ + รวม/ตัดซ้ำด้วย
+    import http_client
+    import agent_003_macro as macro
+    with patched(http_client, get=lambda url, **kw: FakeResponse(ctx['content'])), \
+            patched(macro, FEED_STATE_FILE=os.path.join(ctx['tmp'], 'ff_calendar_state.json')):
+        ctx['rows'] = macro.fetch_economic_data()
+    return len(ctx['rows'])
+
+
+def _macro_write_setup(scale, tmp):
+    ctx = _macro_setup(scale, tmp)
+    _macro_end_to_end(ctx)
+    return ctx
+
+
+def _macro_write(ctx):
+    import agent_003_macro as macro
+    with patched(macro, DATA_FOLDER=tempfile.mkdtemp(dir=ctx['tmp'])):
+        macro.save_data(ctx['rows'])
+    return len(ctx['rows'])
+
+
+def _financial_setup(scale, tmp):
+    return {"bars": scale_bars(scale), "tmp": tmp}
+
+
+def _financial_compute(ctx):
+    import indicator_engine
+    import agent_002_financial as financial
+    state = indicator_engine.new_state(financial.SYMBOL)
+    snap = indicator_engine.feed_bars(state, ctx['bars'])
+    financial.classify_trend(snap)
+    return len(ctx['bars'])
+
+
+def _financial_end_to_end(ctx):
+    import indicator_engine
+    import agent_002_financial as financial
+    # state ใหม่ทุกรอบ: วัดการป้อนแท่งทั้งหมด ไม่ใช่รอบที่ไม่มีแท่งใหม่
+    tmp = tempfile.mkdtemp(dir=ctx['tmp'])
+    with patched(financial, get_history=lambda symbol, period=None: ctx['bars'],
+                 DATA_DIR=tmp, OUTPUT_FILE=os.path.join(tmp, 'market_price_data.csv')), \
+            patched(indicator_engine, STATE_DIR=os.path.join(tmp, 'indicators')):
+        financial.analyze_market_price()
+    return len(ctx['bars'])
+
+
+def _intermarket_setup(scale, tmp):
+    return {"closes": scale_closes(scale), "tmp": tmp}
+
+
+def _intermarket_compute(ctx):
+    import agent_002_intermarket as intermarket
+    return len(intermarket.compute_changes(ctx['closes']))
+
+
+def _intermarket_end_to_end(ctx):
+    import agent_002_intermarket as intermarket
+    tmp = tempfile.mkdtemp(dir=ctx['tmp'])
+    closes = ctx['closes']
+    with patched(intermarket, get_closes=lambda symbols, period=None: closes,
+                 DATA_DIR=tmp, OUTPUT_FILE=os.path.join(tmp, 'intermarket_analysis.csv')):
+        intermarket.analyze_intermarket()
+    return closes.shape[1]
+
+
+def _whale_setup(scale, tmp):
+    path = os.path.join(tmp, 'deacomes.txt')
+    with open(path, 'wb') as f:
+        f.write(scale_cot(scale))
+    return {"path": path}
+
+
+def _whale_parse(ctx):
+    import agent_004_whale as whale
+    return len(whale.read_cot_markets(ctx['path'], latest_only=False, use_index_cache=False))
+
+
+def _whale_history_setup(scale, tmp):
+    # ทุกตลาดในรายงานจริง x scale ชุด ย้อนหลัง 10 ปีรายสัปดาห์ (MM_Net เดินสุ่ม)
+    import numpy as np
+    import pandas as pd
+    import cot_history
+    codes = sorted({row[0] for row in cot_history.parse_archive_file(os.path.join(AGENTS_DIR, 'deacomes.txt'))})
+    codes = [f"{code}-{copy}" for copy in range(scale) for code in codes]
+    dates = pd.date_range(end="2026-01-13", periods=520, freq="7D")
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "CFTC_Code": np.repeat(codes, len(dates)),
+        "Date": np.tile(dates, len(codes)),
+        "MM_Net": rng.normal(0, 1000, len(codes) * len(dates)).reshape(len(codes), -1).cumsum(axis=1).ravel(),
+    })
+    return {"frame": frame}
+
+
+def _whale_history(ctx):
+    import cot_history
+    return len(cot_history.compute_positioning(ctx['frame']))
+
+
+def _gemini_setup(scale, tmp):
+    reply = scale_gemini(scale)
+    text = reply['candidates'][0]['content']['parts'][0]['text']
+    return {"raw": json.dumps(reply, ensure_ascii=False), "text": text,
+            "pieces": [text[i:i + 64] for i in range(0, len(text), 64)]}
+
+
+def _gemini_parse(ctx):
+    import news_analyst
+    reply = json.loads(ctx['raw'])
+    text = reply['candidates'][0]['content']['parts'][0]['text']
+    return len(json.loads(news_analyst.clean_json_text(text))['individual_news'])
+
+
+def _gemini_stream_parse(ctx):
+    import news_analyst
+    return sum(1 for kind, _ in news_analyst.iter_json_items(iter(ctx['pieces'])) if kind == "item")
+
+
+def _war_room_setup(scale, tmp):
+    with open(os.path.join(tmp, 'market_price_data.csv'), 'wb') as f:
+        f.write(scale_csv(scale))
+    return {"tmp": tmp}
+
+
+def _war_room_load(ctx):
+    import latest_record
+    import main_war_room as war_room
+    latest_record.clear_cache()  # วัดการอ่านจริง ไม่ใช่ cache hit
+    with patched(war_room, DATA_DIR=ctx['tmp']):
+        return 1 if war_room.load_data('market_price_data.csv') else 0
+
+
+# --- เวลาเริ่มโปรแกรม: รันใน process ใหม่ทุกรอบ (import ที่ค้างใน process นี้จะไม่ปนผล) ---
+
+def _python(*args, cwd=BASE_DIR):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([AGENTS_DIR, BASE_DIR]),
+               GWR_METRICS_FILE=os.path.join(tempfile.gettempdir(), 'gwr_bench_metrics.json'))
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def import_times(module):
+    # คืน [(เวลาสะสม µs, ชื่อโมดูล)] จาก python -X importtime เรียงจากมากไปน้อย
+    proc = _python("-X", "importtime", "-c", f"import {module}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match:
+            rows.append((int(match.group(1)), match.group(3)))
+    return sorted(rows, reverse=True)
+
+
+def _startup_setup(scale, tmp):
+    return {}
+
+
+def _war_room_cli(ctx):
+    proc = _python(os.path.join(BASE_DIR, 'main_war_room.py'))
+    return 1 if proc.returncode == 0 else 0
+
+
+def _import_agents(ctx):
+    # import ทุก agent ทีละ process (แบบ --help / ถูก scheduler เรียก) -> หน่วย = จำนวน agent ที่ import ผ่าน
+    return sum(1 for module in STARTUP_MODULES[1:] if import_times(module))
+
+
+# agent, stage (parse / compute / write / total), ฟังก์ชันของ agent ที่ขั้นนี้ครอบคลุม
+# "scales": (1,) = ขั้นที่ไม่ขึ้นกับขนาดข้อมูล วัดแค่ 1x
+STAGES = [
+    {"agent": "scout", "stage": "parse", "target": "fetch_and_filter_news", "setup": _scout_setup, "run": _scout_parse},
+    {"agent": "scout", "stage": "compute", "target": "fetch_and_filter_news", "setup": _scout_setup, "run": _scout_filter},
+    {"agent": "scout", "stage": "write", "target": "save_intelligence", "setup": _scout_write_setup, "run": _scout_write},
+    {"agent": "scout", "stage": "total", "target": "fetch_and_filter_news", "setup": _scout_setup, "run": _scout_end_to_end},
+    {"agent": "macro", "stage": "parse", "target": "fetch_economic_data", "setup": _macro_setup, "run": _macro_parse},
+    {"agent": "macro", "stage": "total", "target": "fetch_economic_data", "setup": _macro_setup, "run": _macro_end_to_end},
+    {"agent": "macro", "stage": "write", "target": "save_data", "setup": _macro_write_setup, "run": _macro_write},
+    {"agent": "financial", "stage": "compute", "target": "analyze_market_price", "setup": _financial_setup, "run": _financial_compute},
+    {"agent": "financial", "stage": "total", "target": "analyze_market_price", "setup": _financial_setup, "run": _financial_end_to_end},
+    {"agent": "intermarket", "stage": "compute", "target": "analyze_intermarket", "setup": _intermarket_setup, "run": _intermarket_compute},
+    {"agent": "intermarket", "stage": "total", "target": "analyze_intermarket", "setup": _intermarket_setup, "run": _intermarket_end_to_end},
+    {"agent": "whale", "stage": "parse", "target": "read_cot_markets", "setup": _whale_setup, "run": _whale_parse},
+    {"agent": "whale", "stage": "compute", "target": "compute_positioning", "setup": _whale_history_setup, "run": _whale_history},
+    {"agent": "gemini", "stage": "parse", "target": "clean_json_text", "setup": _gemini_setup, "run": _gemini_parse},
+    {"agent": "gemini", "stage": "stream", "target": "iter_json_items", "setup": _gemini_setup, "run": _gemini_stream_parse},
+    {"agent": "war_room", "stage": "read", "target": "load_data", "setup": _war_room_setup, "run": _war_room_load},
+    {"agent": "startup", "stage": "war_room_cli", "target": "python main_war_room.py", "setup": _startup_setup,
+     "run": _war_room_cli, "scales": (1,)},
+    {"agent": "startup", "stage": "import_agents", "target": "python -X importtime", "setup": _startup_setup,
+     "run": _import_agents, "scales": (1,)},
+]
+
+# ขนาดข้อมูล 1x ของแต่ละ agent (ไว้ข้ามสเกลที่ใหญ่เกิน MAX_INPUT_BYTES)
+BASE_BYTES = {
+    "scout": lambda: len(read_fixture("google_news_rss.xml")),
+    "macro": lambda: len(read_fixture("ff_calendar_thisweek.xml")),
+    "whale": lambda: os.path.getsize(os.path.join(AGENTS_DIR, 'deacomes.txt')),
+    "gemini": lambda: len(read_fixture("gemini_reply.json")),
+    "financial": lambda: len(read_fixture("gc_f_history.csv")),
+    "intermarket": lambda: len(read_fixture("intermarket_closes.csv")),
+    "war_room": lambda: len(scale_csv(1)),
+    "startup": lambda: 0,
+}
+
+
+def stage_name(spec):
+    return f"{spec['agent']}.{spec['stage']}"
+
+
+def time_stage(spec, scale, repeat):
+    # agent พิมพ์ log เยอะ -> เก็บทิ้ง ไม่ให้เวลาเขียนจอปนผล
+    with sandbox() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        ctx = spec['setup'](scale, tmp)
+        samples, units = [], 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            units = spec['run'](ctx)
+            samples.append(time.perf_counter() - started)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "repeat": repeat,
+        "units": units,
+    }
+
+
+def current_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def resolve_ref(ref):
+    # รับได้ทั้งชื่อไฟล์ผล, hash สั้น หรือ ref ของ git (HEAD~1, main, ...)
+    if os.path.exists(os.path.join(RESULTS_DIR, f"{ref}.json")):
+        return ref
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", ref], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ref
+
+
+def save_results(results):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_results(ref):
+    path = os.path.join(RESULTS_DIR, f"{resolve_ref(ref)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    # เทียบเวลา min ของแต่ละขั้น/สเกลที่มีทั้งสองฝั่ง; คืนรายการที่ช้าลงเกินเกณฑ์
+    print(f"\n--- ⚖️  เทียบ {baseline['commit']} → {current['commit']} (เวลา min) ---")
+    regressions = []
+    for name, scales in current['stages'].items():
+        for scale, now in scales.items():
+            before = baseline['stages'].get(name, {}).get(scale)
+            if not before or "min" not in before or "min" not in now:
+                continue
+            ratio = now['min'] / before['min'] if before['min'] > 0 else 1.0
+            mark = "🔴" if ratio > 1 + threshold else ("🟢" if ratio < 1 - threshold else "  ")
+            print(f"   {mark} {name:<22} {scale:>6}x  {before['min'] * 1000:10.3f} ms → {now['min'] * 1000:10.3f} ms  ({ratio:5.2f}x)")
+            if ratio > 1 + threshold:
+                regressions.append((name, scale, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="วัดความเร็วแต่ละขั้นของ agent แบบออฟไลน์")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="ขนาดข้อมูลคั่นด้วย comma (ค่าเริ่มต้น 1,100,10000)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", help="เฉพาะ agent หรือ agent.stage คั่นด้วย comma")
+    parser.add_argument("--compare", metavar="REF", help="เทียบกับผลที่บันทึกไว้ของ commit/ref นี้")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--no-save", action="store_true", help="ไม่บันทึกผลลง benchmarks/results")
+    parser.add_argument("--importtime", metavar="MODULE", help="แสดงโมดูลที่ import ช้าที่สุดของ MODULE แล้วจบ")
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        rows = import_times(args.importtime)
+        print(f"🐢 import ที่ช้าที่สุดของ {args.importtime} (เวลาสะสม)")
+        for us, name in rows[:20]:
+            print(f"   {us / 1000:9.1f} ms  {name}")
+        return 0
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    only = {s.strip() for s in args.only.split(",")} if args.only else None
+    specs = [s for s in STAGES if not only or s['agent'] in only or stage_name(s) in only]
+
+    results = {
+        "commit": current_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpu)",
+        "stages": {},
+    }
+    print(f"🏁 Benchmark @ {results['commit']} | สเกล {scales} | ทำซ้ำ {args.repeat} รอบ")
+    for spec in specs:
+        name = stage_name(spec)
+        results['stages'][name] = {}
+        for scale in scales:
+            if scale not in spec.get('scales', (scale,)):
+                continue
+            if BASE_BYTES[spec['agent']]() * scale > MAX_INPUT_BYTES:
+                results['stages'][name][str(scale)] = {"skipped": "input too large"}
+                print(f"   ⏭️  {name:<22} {scale:>6}x  (ข้าม: ข้อมูลใหญ่เกิน {MAX_INPUT_BYTES // 2**20} MB)")
+                continue
+            # สเกลใหญ่ทำซ้ำน้อยลง จะได้ไม่รอนาน
+            repeat = args.repeat if scale < 1000 else max(1, args.repeat // 5)
+            stat = time_stage(spec, scale, repeat)
+            results['stages'][name][str(scale)] = stat
+            print(f"   ⏱️  {name:<22} {scale:>6}x  min {stat['min'] * 1000:10.3f} ms | "
+                  f"median {stat['median'] * 1000:10.3f} ms | {stat['units']:,} หน่วย  [{spec['target']}]")
+            if name == "startup.war_room_cli" and stat['min'] * 1000 > STARTUP_BUDGET_MS:
+                print(f"   ⚠️  War Room CLI ช้ากว่างบ {STARTUP_BUDGET_MS} ms (ดูตัวการด้วย --importtime main_war_room)")
+
+    if not args.no_save:
+        print(f"\n💾 บันทึกผลที่: {save_results(results)}")
+
+    if args.compare:
+        baseline = load_results(args.compare)
+        if baseline is None:
+            print(f"⚠️ ไม่พบผลที่บันทึกไว้ของ {args.compare} (รัน benchmark ที่ commit นั้นก่อน)")
+            return 1
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n🔴 ช้าลงเกิน {args.threshold:.0%}: {len(regressions)} รายการ")
+            return 1
+        print("\n✅ ไม่มีขั้นไหนช้าลงเกินเกณฑ์")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import queue
+import locale
+import curses
+from datetime import datetime
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+import main_war_room as war_room
+
+# ==============================================================================
+# War Room แบบจอสด (curses): เปิดค้างไว้ได้เลย ไม่ต้องรันใหม่
+# ให้ระบบปฏิบัติการแจ้งเมื่อไฟล์ใน data/ เปลี่ยน (inotify/FSEvents/ReadDirectoryChangesW ผ่าน watchdog)
+# แล้วคำนวณใหม่เฉพาะแผงของไฟล์นั้น + คะแนนรวม
+# ==============================================================================
+DEBOUNCE_SECONDS = 0.15   # agent เขียนไฟล์หลายจังหวะ -> รวบ event ที่มาติดๆ กันเป็นรอบเดียว
+TICK_MS = 200             # รอบเช็กคีย์บอร์ด/คิว event (ไม่ได้อ่านไฟล์ทุกรอบ)
+
+PANEL_BY_FILE = {panel['file']: panel for panel in war_room.PANELS}
+
+
+class CsvChangeHandler(FileSystemEventHandler):
+    # ส่งชื่อไฟล์ที่เปลี่ยนเข้าคิว (เฉพาะไฟล์ที่มีแผงรออยู่)
+    def __init__(self, changes):
+        self.changes = changes
+
+    def on_any_event(self, event):
+        # เขียนแบบ atomic (.tmp แล้ว rename) มาเป็น moved -> ดูปลายทางด้วย
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            name = os.path.basename(path or '')
+            if name in PANEL_BY_FILE:
+                self.changes.put(name)
+
+
+def _put(stdscr, row, text, attr=0):
+    # เขียนหนึ่งบรรทัด ตัดส่วนที่ล้นจอทิ้ง (จอเล็กก็ไม่ล่ม)
+    height, width = stdscr.getmaxyx()
+    if row >= height:
+        return
+    try:
+        stdscr.addstr(row, 0, text[:max(0, width - 1)], attr)
+    except curses.error:
+        pass
+
+
+def draw(stdscr, results, updated_at):
+    stdscr.erase()
+    score = sum(results[panel['key']]['score'] for panel in war_room.PANELS)
+    headline, action = war_room.verdict(score)
+
+    row = 0
+    _put(stdscr, row, "🚀 GOLD WAR ROOM: LIVE", curses.A_BOLD); row += 1
+    _put(stdscr, row, f"📅 {datetime.now().strftime('%d %B %Y | %H:%M:%S')}   (q = ออก)"); row += 2
+
+    for panel in war_room.PANELS:
+        result = results[panel['key']]
+        _put(stdscr, row, war_room.panel_title(panel), curses.A_BOLD); row += 1
+        for line in result['lines']:
+            _put(stdscr, row, f"   {line}"); row += 1
+        _put(stdscr, row, f"   ⏱️ อัปเดต {updated_at[panel['key']]}  | คะแนน {result['score']:+g}", curses.A_DIM); row += 1
+        _put(stdscr, row, "-" * 50); row += 1
+
+    row += 1
+    _put(stdscr, row, f"🎖️  คะแนนรวมสัญญาณรบ: {score:g} / {war_room.scoring_engine.load_config()['max_score']}", curses.A_BOLD); row += 2
+    _put(stdscr, row, f"    {headline}"); row += 1
+    _put(stdscr, row, f"    {action}")
+    stdscr.refresh()
+
+
+def _drain(changes, first):
+    # เก็บชื่อไฟล์ที่เปลี่ยนทั้งหมดในช่วง DEBOUNCE_SECONDS หลัง event แรก
+    names = {first}
+    deadline = time.monotonic() + DEBOUNCE_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return names
+        try:
+            names.add(changes.get(timeout=remaining))
+        except queue.Empty:
+            return names
+
+
+def run_live(stdscr):
+    curses.curs_set(0)
+    stdscr.timeout(TICK_MS)
+
+    changes = queue.Queue()
+    observer = Observer()
+    os.makedirs(war_room.DATA_DIR, exist_ok=True)
+    observer.schedule(CsvChangeHandler(changes), war_room.DATA_DIR, recursive=False)
+    observer.start()
+
+    stamp = datetime.now().strftime('%H:%M:%S')
+    results = {panel['key']: war_room.evaluate_panel(panel) for panel in war_room.PANELS}
+    updated_at = {panel['key']: stamp for panel in war_room.PANELS}
+    try:
+        draw(stdscr, results, updated_at)
+        while True:
+            key = stdscr.getch()
+            if key in (ord('q'), ord('Q')):
+                break
+            try:
+                first = changes.get_nowait()
+            except queue.Empty:
+                if key == curses.KEY_RESIZE:
+                    draw(stdscr, results, updated_at)
+                continue
+            stamp = datetime.now().strftime('%H:%M:%S')
+            for name in _drain(changes, first):
+                panel = PANEL_BY_FILE[name]
+                results[panel['key']] = war_room.evaluate_panel(panel)
+                updated_at[panel['key']] = stamp
+            draw(stdscr, results, updated_at)
+    finally:
+        observer.stop()
+        observer.join()
+
+
+if __name__ == "__main__":
+    locale.setlocale(locale.LC_ALL, "")
+    try:
+        curses.wrapper(run_live)
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,225 @@
+import os
+import sys
+import time
+import queue
+import threading
+import importlib
+from datetime import datetime
+
+# --- Path ข้อมูล ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(BASE_DIR, 'agents')
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# agent แต่ละตัวเป็นสคริปต์ใน agents/ -> ใส่ path ไว้ให้ import เป็นโมดูลได้
+if AGENTS_DIR not in sys.path:
+    sys.path.insert(0, AGENTS_DIR)
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+# ==============================================================================
+# แผนผังกองทัพ (DAG): ใครผลิตไฟล์อะไร และต้องรอใครก่อน
+# ==============================================================================
+# run     : ฟังก์ชันที่รับโมดูลของ agent แล้วสั่งทำงาน 1 รอบ (คืน False = ล้มเหลว)
+#           โหนดที่มี deps รับ argument ที่ 2 = ชุดไฟล์ของ dep ที่ข้อมูลอาจเก่า (dep หมดเวลา)
+# outputs : ไฟล์ใน data/ ที่ agent เขียนออกมา
+# deps    : ชื่อโหนดที่ต้องเสร็จ (หรือหมดเวลา) ก่อนถึงจะเริ่มได้
+# timeout : วินาทีสูงสุดที่ยอมรอ agent ตัวนี้
+AGENT_GRAPH = {
+    "agent_001_scout": {
+        "module": "agent_001_scout",
+        "run": lambda m: m.run_scout(),
+        "outputs": ["political_intelligence.csv"],
+        "deps": [],
+        "timeout": 60,
+    },
+    "agent_002_financial": {
+        "module": "agent_002_financial",
+        "run": lambda m: m.analyze_market_price(),
+        "outputs": ["market_price_data.csv"],
+        "deps": [],
+        "timeout": 45,
+    },
+    "agent_002_intermarket": {
+        "module": "agent_002_intermarket",
+        "run": lambda m: m.analyze_intermarket(),
+        "outputs": ["intermarket_analysis.csv"],
+        "deps": [],
+        "timeout": 60,
+    },
+    "agent_003_macro": {
+        "module": "agent_003_macro",
+        "run": lambda m: m.save_data(m.fetch_economic_data()),
+        "outputs": ["economic_calendar.csv"],
+        "deps": [],
+        "timeout": 45,
+    },
+    "agent_004_whale": {
+        "module": "agent_004_whale",
+        "run": lambda m: m.analyze_whale_positions(),
+        "outputs": ["whale_cot_report.csv"],
+        "deps": [],
+        "timeout": 30,
+    },
+    "agent_005_spdr": {
+        "module": "agent_005_spdr",
+        "run": lambda m: m.fetch_and_save_spdr(),
+        "outputs": ["spdr_gold_flows.csv"],
+        "deps": [],
+        "timeout": 45,
+    },
+    # ห้องบัญชาการ: คำนวณคำตัดสินทันทีที่ข้อมูลรายใหญ่ + SPDR + กราฟเทคนิคมาถึง
+    # (ไม่ต้องรอ agent ที่ War Room ไม่ได้ใช้ เช่น scout / macro)
+    "war_room": {
+        "module": "main_war_room",
+        "run": lambda m, stale: m.start_war_room(stale_files=stale),
+        "outputs": [],
+        "deps": ["agent_004_whale", "agent_005_spdr", "agent_002_financial"],
+        "timeout": 30,
+    },
+}
+
+# สถานะที่ถือว่า "จบงานแล้ว" (โหนดลูกเริ่มต่อได้)
+DONE = "✅ DONE"
+FAILED = "❌ FAILED"
+TIMEOUT = "⏰ TIMEOUT"
+
+
+def validate_graph(graph):
+    # ตรวจว่า deps ชี้ไปหาโหนดที่มีอยู่จริง และไม่มีวงวน
+    for name, node in graph.items():
+        for dep in node["deps"]:
+            if dep not in graph:
+                raise ValueError(f"โหนด {name} อ้างถึง {dep} ที่ไม่มีในแผนผัง")
+
+    visiting, visited = set(), set()
+
+    def visit(name):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"แผนผังมีวงวนที่โหนด {name}")
+        visiting.add(name)
+        for dep in graph[name]["deps"]:
+            visit(dep)
+        visiting.discard(name)
+        visited.add(name)
+
+    for name in graph:
+        visit(name)
+
+
+def call_node(node, module, stale=frozenset()):
+    # agent จับ exception เองแล้วพิมพ์ -> ใช้ค่าคืน False เป็นสัญญาณล้มเหลวแทน
+    ok = node["run"](module, stale) if node["deps"] else node["run"](module)
+    if ok is False:
+        raise RuntimeError("agent รายงานว่าทำงานไม่สำเร็จ")
+
+
+def _run_node(name, node, results, stale=frozenset()):
+    # ทำงานใน thread แยก: import โมดูลที่นี่ เพื่อให้ agent ที่ dependency ไม่ครบพังแค่ตัวเดียว
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(node["module"])
+        call_node(node, module, stale)
+        results.put((name, DONE, time.perf_counter() - started, None))
+    except BaseException as e:
+        results.put((name, FAILED, time.perf_counter() - started, e))
+
+
+def run_pipeline(graph=None, only=None):
+    graph = graph or AGENT_GRAPH
+
+    # เลือกรันเฉพาะบางโหนด (พร้อมทุกโหนดที่มันต้องพึ่ง)
+    if only:
+        wanted = set()
+        stack = list(only)
+        while stack:
+            name = stack.pop()
+            if name in wanted:
+                continue
+            if name not in graph:
+                raise ValueError(f"ไม่รู้จักโหนด {name}")
+            wanted.add(name)
+            stack.extend(graph[name]["deps"])
+        graph = {name: node for name, node in graph.items() if name in wanted}
+
+    validate_graph(graph)
+
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+
+    print(f"\n🛰️  Orchestrator: ปล่อยกองทัพ {len(graph)} หน่วยพร้อมกัน ({datetime.now().strftime('%H:%M:%S')})")
+
+    results = queue.Queue()
+    status = {}     # name -> DONE / FAILED / TIMEOUT
+    durations = {}
+    running = {}    # name -> เวลาที่ต้องเสร็จ (deadline)
+    # หน่วยที่หมดเวลาแต่ thread ยังวิ่งอยู่ (อาจกำลังเขียนไฟล์) -> โหนดลูกรอจนมันจบ
+    # หรือจนหมดเวลาผ่อนผันอีก 1 รอบ timeout แล้วค่อยเริ่มโดยถือว่าไฟล์ของมันเก่า
+    lingering = {}  # name -> เวลาที่เลิกรอ
+    stale = set()   # โหนดที่ข้อมูลอาจเก่า
+    pipeline_started = time.perf_counter()
+
+    def launch_ready():
+        for name, node in graph.items():
+            if name in status or name in running:
+                continue
+            if all(dep in status and dep not in lingering for dep in node["deps"]):
+                stale_files = frozenset(f for dep in node["deps"] if dep in stale for f in graph[dep]["outputs"])
+                # ใช้ daemon thread: agent ที่ค้างจะไม่ดึงให้โปรแกรมปิดไม่ได้
+                t = threading.Thread(target=_run_node, args=(name, node, results, stale_files), name=name, daemon=True)
+                running[name] = time.perf_counter() + node["timeout"]
+                t.start()
+
+    launch_ready()
+    while running or lingering:
+        wait_for = max(0.0, min(list(running.values()) + list(lingering.values())) - time.perf_counter())
+        try:
+            name, state, elapsed, error = results.get(timeout=wait_for)
+        except queue.Empty:
+            # ตัดหน่วยที่เกินเวลาทิ้ง แล้วปล่อยให้โหนดลูกเดินต่อด้วยข้อมูลเท่าที่มี
+            now = time.perf_counter()
+            for name in [n for n, deadline in running.items() if deadline <= now]:
+                del running[name]
+                status[name] = TIMEOUT
+                durations[name] = graph[name]["timeout"]
+                lingering[name] = now + graph[name]["timeout"]
+                print(f"   ⏰ {name} เกินเวลา {graph[name]['timeout']} วินาที -> ข้ามไปก่อน (โหนดลูกรอให้เขียนไฟล์เสร็จ)")
+            for name in [n for n, give_up in lingering.items() if give_up <= now]:
+                del lingering[name]
+                stale.add(name)
+                print(f"   ⚠️ {name} ยังค้างอยู่ -> เริ่มโหนดลูกโดยถือว่า {', '.join(graph[name]['outputs']) or '-'} เป็นข้อมูลเก่า")
+            launch_ready()
+            continue
+
+        if name in lingering:
+            # หน่วยที่หมดเวลาไปแล้วเพิ่งจบ: ไฟล์นิ่งแล้ว โหนดลูกเริ่มได้ (สถานะยังนับเป็น TIMEOUT)
+            del lingering[name]
+            print(f"   🐢 {name} จบช้ากว่ากำหนด ({elapsed:.2f}s)")
+            launch_ready()
+            continue
+        if name not in running:
+            # ผลของหน่วยที่เลิกรอไปแล้ว มาถึงช้าเกินไป
+            continue
+        del running[name]
+        status[name] = state
+        durations[name] = elapsed
+        if error is not None:
+            print(f"   ❌ {name} ล้มเหลว: {error}")
+        launch_ready()
+
+    total = time.perf_counter() - pipeline_started
+    print("\n" + "═" * 75)
+    print("🛰️  สรุปผลการปฏิบัติการ (Orchestrator)")
+    for name, node in graph.items():
+        outputs = ", ".join(node["outputs"]) or "-"
+        print(f"   {status.get(name, '-'):<12} {name:<24} {durations.get(name, 0):6.2f}s  → {outputs}")
+    print(f"   ⏱️  ใช้เวลารวม {total:.2f} วินาที (ผลรวมถ้ารันทีละตัว ≈ {sum(durations.values()):.2f} วินาที)")
+    print("═" * 75)
+    return status
+
+
+if __name__ == "__main__":
+    # ใช้งาน: python main_orchestrator.py [ชื่อโหนด ...]  เช่น  python main_orchestrator.py war_room
+    run_pipeline(only=sys.argv[1:] or None)
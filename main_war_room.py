@@ -1,94 +1,126 @@
-import pandas as pd
 import os
 import sys
 from datetime import datetime
 
-os.system('cls' if os.name == 'nt' else 'clear')
-
 # --- Path ข้อมูล ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
+AGENTS_DIR = os.path.join(BASE_DIR, 'agents')
+if AGENTS_DIR not in sys.path:
+    sys.path.insert(0, AGENTS_DIR)
+
+from latest_record import read_latest_record
+import scoring_engine
+import metrics
 
 def load_data(filename):
-    path = os.path.join(DATA_DIR, filename)
-    if os.path.exists(path):
-        try:
-            return pd.read_csv(path)
-        except:
-            return None
-    return None
-
-def start_war_room():
+    # War Room ใช้แค่แถวล่าสุด -> อ่านจากท้ายไฟล์ (และจำผลไว้จนกว่าไฟล์จะเปลี่ยน)
+    return read_latest_record(os.path.join(DATA_DIR, filename))
+
+# --- แผงของแต่ละ Agent: อ่านแถวล่าสุด -> (บรรทัดที่แสดง, คะแนน) ---
+# แยกเป็นแผงเพื่อให้หน้าจอสด (live_war_room.py) คำนวณใหม่เฉพาะแผงที่ไฟล์เปลี่ยน
+# น้ำหนัก/กฎให้คะแนน/ช่วงคำตัดสิน อยู่ใน config/scoring.json (signal = ชื่อใน config)
+
+def whale_lines(latest):
+    lines = [
+        f"► สถานะ: {latest['Status']}",
+        f"► Net Position: {float(latest['Net_Position']):,.0f} สัญญา",
+    ]
+    # ไฟล์รุ่นเก่า/ยังไม่มีประวัติพอ -> ไม่มีคอลัมน์นี้หรือเป็นค่าว่าง
+    if latest.get('Net_Pct_3Y'):
+        lines.append(f"► เทียบ 3 ปี: เปอร์เซ็นไทล์ {float(latest['Net_Pct_3Y']):.0%} | z-score {float(latest['Net_Z_3Y'] or 0):+.2f}")
+    return lines
+
+def spdr_lines(latest):
+    return [
+        f"► ราคา GLD: ${latest['Price']}",
+        f"► อาการวันนี้: {latest['Status']}",
+    ]
+
+def trend_lines(latest):
+    return [
+        f"► ราคา Spot: ${latest['Price']}",
+        f"► แนวโน้ม: {latest['Trend']}",
+    ]
+
+PANELS = [
+    {
+        "key": "whale",
+        "file": "whale_cot_report.csv",
+        "title": "🐳 [1] Agent 004: รายใหญ่ (COT Report)",
+        "missing": "⚠️ ไม่มีข้อมูล (รัน agent_004 ก่อน)",
+        "signal": "whale",
+        "lines": whale_lines,
+    },
+    {
+        "key": "spdr",
+        "file": "spdr_gold_flows.csv",
+        "title": "📦 [2] Agent 005: กองทุนโลก (SPDR ETF)",
+        "missing": "⚠️ ไม่มีข้อมูล (รัน agent_005 ก่อน)",
+        "signal": "spdr",
+        "lines": spdr_lines,
+    },
+    {
+        "key": "trend",
+        "file": "market_price_data.csv",
+        "title": "📈 [3] Agent 002: กราฟเทคนิค (Technical Trend)",
+        "missing": "⚠️ ไม่มีข้อมูล (รัน agent_002 ก่อน)",
+        "signal": "trend",
+        "lines": trend_lines,
+    },
+]
+
+def panel_title(panel):
+    # น้ำหนักคิดจาก config ทุกครั้ง: ปรับกฎ/น้ำหนักใน scoring.json แล้วหัวแผงตรงตามเสมอ
+    share = scoring_engine.signal_share(scoring_engine.load_config(), panel['signal'])
+    return f"{panel['title']} - [น้ำหนัก {share:.0%}]"
+
+def evaluate_panel(panel):
+    # คืน {"lines": [...], "score": n, "ok": มีข้อมูลไหม}
+    latest = load_data(panel['file'])
+    if not latest:
+        return {"lines": [panel['missing']], "score": 0, "ok": False}
+    score = scoring_engine.signal_points(scoring_engine.load_config(), panel['signal'], latest)
+    return {"lines": panel['lines'](latest), "score": score, "ok": True}
+
+def verdict(score):
+    # คืน (คำตัดสิน, แผนปฏิบัติ) ตามช่วงคะแนนใน config
+    band = scoring_engine.band_for(scoring_engine.load_config(), score)
+    return band['headline'], band['action']
+
+@metrics.timer("run", agent="war_room")
+def start_war_room(stale_files=()):
     print("\n" + "═"*75)
     print("      🚀 GOLD WAR ROOM: ULTIMATE INTELLIGENCE SYSTEM")
     print(f"      📅 ข้อมูล ณ วันที่: {datetime.now().strftime('%d %B %Y | %H:%M:%S')}")
     print("═"*75 + "\n")
 
     score = 0
-    
-    # --- 1. Agent 004: เจ้ามือ (น้ำหนัก 4 คะแนน) ---
-    print("🐳 [1] Agent 004: รายใหญ่ (COT Report) - [น้ำหนัก 40%]")
-    whale = load_data('whale_cot_report.csv')
-    if whale is not None and not whale.empty:
-        latest = whale.iloc[-1]
-        print(f"   ► สถานะ: {latest['Status']}")
-        print(f"   ► Net Position: {float(latest['Net_Position']):,.0f} สัญญา")
-        
-        if "BULLISH" in latest['Status']: score += 4
-        elif "BEARISH" in latest['Status']: score -= 4
-    else:
-        print("   ⚠️ ไม่มีข้อมูล (รัน agent_004 ก่อน)")
-    print("-" * 50)
-
-    # --- 2. Agent 005: กองทุน SPDR (น้ำหนัก 3 คะแนน) ---
-    print("📦 [2] Agent 005: กองทุนโลก (SPDR ETF) - [น้ำหนัก 30%]")
-    spdr = load_data('spdr_gold_flows.csv')
-    if spdr is not None and not spdr.empty:
-        latest = spdr.iloc[-1]
-        print(f"   ► ราคา GLD: ${latest['Price']}")
-        print(f"   ► อาการวันนี้: {latest['Status']}")
-        
-        if "BUY" in latest['Status']: score += 3
-        elif "SELL" in latest['Status']: score -= 3
-    else:
-        print("   ⚠️ ไม่มีข้อมูล (รัน agent_005 ก่อน)")
-    print("-" * 50)
-
-    # --- 3. Agent 002: กราฟเทคนิค (น้ำหนัก 3 คะแนน) ---
-    print("📈 [3] Agent 002: กราฟเทคนิค (Technical Trend) - [น้ำหนัก 30%]")
-    price = load_data('market_price_data.csv')
-    if price is not None and not price.empty:
-        latest = price.iloc[-1]
-        print(f"   ► ราคา Spot: ${latest['Price']}")
-        print(f"   ► แนวโน้ม: {latest['Trend']}")
-        
-        if "UPTREND" in latest['Trend']: score += 3
-        elif "RECOVERY" in latest['Trend']: score += 1
-        elif "DOWNTREND" in latest['Trend']: score -= 3
-        elif "CORRECTION" in latest['Trend']: score -= 1
-    else:
-        print("   ⚠️ ไม่มีข้อมูล (รัน agent_002 ก่อน)")
-    print("-" * 50)
+    for panel in PANELS:
+        print(panel_title(panel))
+        if panel['file'] in stale_files:
+            # orchestrator แจ้งว่า agent เจ้าของไฟล์หมดเวลาและยังค้างอยู่ -> ข้อมูลอาจเป็นของรอบก่อน
+            print("   ⚠️ ข้อมูลอาจเก่า (agent ต้นทางหมดเวลา)")
+        result = evaluate_panel(panel)
+        for line in result['lines']:
+            print(f"   {line}")
+        score += result['score']
+        print("-" * 50)
 
     # --- สรุปผลการรบ (Final Verdict) ---
     print("\n" + "═"*75)
-    print(f"             🎖️  คะแนนรวมสัญญาณรบ: {score} / 10  🎖️")
+    print(f"             🎖️  คะแนนรวมสัญญาณรบ: {score:g} / {scoring_engine.load_config()['max_score']}  🎖️")
     print("═"*75)
 
-    if score >= 7:
-        print("\n    🚀 EXTREME BULLISH (กระทิงดุ) - บุกเต็มกำลัง!")
-        print("    [Action]: เน้นเปิดสถานะ BUY / ถือ Run Trend ยาวๆ")
-    elif 3 <= score < 7:
-        print("\n    ✅ MODERATE BULLISH (กระทิงหนุ่ม) - ย่อซื้อ")
-        print("    [Action]: รอราคาย่อตัวแล้วค่อยเข้า Buy (อย่าไล่ราคา)")
-    elif -3 < score < 3:
-        print("\n    ✋ NEUTRAL / SIDEWAY (ตลาดเลือกทาง)")
-        print("    [Action]: นั่งทับมือรอ หรือเทรดสั้นๆ ในกรอบ")
-    elif score <= -3:
-        print("\n    🔻 BEARISH (หมีตะปบ) - เด้งขาย")
-        print("    [Action]: หาจังหวะเปิดสถานะ SELL หรือลดพอร์ต")
+    headline, action = verdict(score)
+    print(f"\n    {headline}")
+    print(f"    {action}")
     
     print("\n" + "═"*75)
 
 if __name__ == "__main__":
+    # ล้างหน้าจอเฉพาะตอนรันตรงๆ (ตอนถูก import จาก orchestrator จะได้ไม่ลบ log ของ agent อื่น)
+    # ใช้ ANSI escape แทน os.system('clear'): ไม่ต้องเปิด shell ใหม่ (~10-30 ms)
+    if sys.stdout.isatty():
+        sys.stdout.write("\033[2J\033[H")
     start_war_room()
\ No newline at end of file
@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import time
+import random
+import signal
+import argparse
+import threading
+import importlib
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import main_orchestrator as orchestrator
+import metrics
+
+# ==============================================================================
+# ตัวจัดตารางแบบอยู่ยาว: import ทุก agent ครั้งเดียว แล้วเรียกแต่ละตัวตามจังหวะของมันเอง
+# (COT รายสัปดาห์, ปฏิทินข่าวไม่กี่ครั้งต่อวัน, ราคาทุกนาที, RSS ทุกไม่กี่นาที)
+# -> ต้นทุนต่อรอบเหลือแค่งานจริง ไม่มีค่าเปิด interpreter / import pandas-yfinance ซ้ำ
+#
+# ตารางอยู่ใน config/schedule.json (ชื่อ = ชื่อโหนดใน main_orchestrator.AGENT_GRAPH):
+#   every   : ทุกกี่วินาที            cron   : "นาที ชั่วโมง วัน เดือน วันในสัปดาห์" (เวลาเครื่อง)
+#   jitter  : สุ่มเลื่อนช้าไม่เกินกี่วินาที (ไม่ให้ทุกตัวยิงพร้อมกันตรงต้นนาที)
+#   catch_up: ถ้าพลาดรอบ (ปิดเครื่อง/รอบก่อนยังไม่จบ) ให้รันชดเชย 1 ครั้งทันที (ค่าเริ่มต้น true)
+#   enabled : false = ไม่รัน
+#
+# agent_004_whale ไม่อยู่ในตาราง: รายงาน COT (agents/deacomes.txt) ไม่มีขั้นดาวน์โหลดอัตโนมัติ
+# รันตามเวลาก็แค่แกะไฟล์เดิมซ้ำแล้วโชว์สถานะเก่าเหมือนของใหม่ -> วางรายงานฉบับใหม่ของ CFTC (ออกวันศุกร์)
+# ทับไฟล์เองแล้วค่อยรัน python agents/agent_004_whale.py (หรือ main_orchestrator.py)
+# ==============================================================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEDULE_FILE = os.path.join(BASE_DIR, 'config', 'schedule.json')
+STATE_FILE = os.path.join(orchestrator.DATA_DIR, 'cache', 'scheduler_state.json')
+
+MAX_SLEEP = 30   # ตื่นมาเช็กอย่างน้อยทุกเท่านี้ (เผื่อนาฬิกาเครื่องถูกปรับ/เครื่อง sleep)
+
+CRON_FIELDS = [
+    # (ชื่อ, ค่าต่ำสุด, ค่าสูงสุด)
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),  # 0 และ 7 = อาทิตย์
+]
+
+
+def parse_cron_field(text, low, high):
+    # รองรับ *, 5, 1-5, */15, 1-30/5, 1,15,30
+    values = set()
+    for part in text.split(","):
+        spec, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(v) for v in spec.split("-", 1))
+        else:
+            start = end = int(spec)
+            if step > 1:
+                end = high
+        if not (low <= start <= end <= high) or step < 1:
+            raise ValueError(f"ค่า cron ไม่ถูกต้อง: {text}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr):
+    parts = expr.split()
+    if len(parts) != 5:
+        raise ValueError(f"cron ต้องมี 5 ช่อง: {expr}")
+    cron = {name: parse_cron_field(p, low, high) for p, (name, low, high) in zip(parts, CRON_FIELDS)}
+    if 7 in cron["weekday"]:
+        cron["weekday"] = (cron["weekday"] - {7}) | {0}
+    # กติกา cron: ถ้าจำกัดทั้งวันที่และวันในสัปดาห์ ตรงอย่างใดอย่างหนึ่งก็พอ
+    cron["day_or_weekday"] = parts[2] != "*" and parts[4] != "*"
+    return cron
+
+
+def _day_matches(cron, moment):
+    day_ok = moment.day in cron["day"]
+    weekday_ok = (moment.weekday() + 1) % 7 in cron["weekday"]  # python: จันทร์ = 0
+    if cron["day_or_weekday"]:
+        return day_ok or weekday_ok
+    return day_ok and weekday_ok
+
+
+def next_cron_time(cron, after):
+    # นาทีแรกที่ตรงตาราง หลังเวลา after (ข้ามทีละวัน/ชั่วโมงที่ไม่ตรง ไม่ไล่ทีละนาทีทั้งปี)
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = moment + timedelta(days=366 * 5)
+    while moment < limit:
+        if moment.month not in cron["month"] or not _day_matches(cron, moment):
+            moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if moment.hour not in cron["hour"]:
+            moment = moment.replace(minute=0) + timedelta(hours=1)
+            continue
+        if moment.minute not in cron["minute"]:
+            moment += timedelta(minutes=1)
+            continue
+        return moment
+    raise ValueError("ตาราง cron ไม่มีวันถึงรอบ")
+
+
+def load_schedule(path=SCHEDULE_FILE, only=None):
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    jobs = {}
+    for name, spec in raw.items():
+        if not spec.get("enabled", True) or (only and name not in only):
+            continue
+        if name not in orchestrator.AGENT_GRAPH:
+            raise ValueError(f"ไม่รู้จัก agent {name} ใน {path}")
+        if ("every" in spec) == ("cron" in spec):
+            raise ValueError(f"{name}: ต้องระบุ every หรือ cron อย่างใดอย่างหนึ่ง")
+        jobs[name] = {
+            "every": spec.get("every"),
+            "cron": parse_cron(spec["cron"]) if "cron" in spec else None,
+            "cron_text": spec.get("cron"),
+            "jitter": spec.get("jitter", 0),
+            "catch_up": spec.get("catch_up", True),
+            "next_run": None,
+            "future": None,
+            "pending": False,
+            "last_run": None,
+            "last_status": "-",
+            "last_duration": 0.0,
+        }
+    return jobs
+
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(jobs, path=STATE_FILE):
+    state = {name: {"last_run": job["last_run"], "last_status": job["last_status"]} for name, job in jobs.items()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def next_slot(job, after):
+    # เวลารอบถัดไป (epoch) หลัง after ยังไม่รวม jitter
+    if job["every"]:
+        return after + job["every"]
+    return next_cron_time(job["cron"], datetime.fromtimestamp(after)).timestamp()
+
+
+def plan_next(job, now):
+    job["next_run"] = next_slot(job, now) + random.uniform(0, job["jitter"])
+
+
+def plan_first(job, last_run, now):
+    # ตอนเปิด daemon: ถ้ารอบที่ควรเกิดหลังการรันครั้งล่าสุดเลยมาแล้ว (ปิดเครื่องไป) -> ชดเชยทันที
+    # ไม่เคยรันเลย = ยังไม่มีข้อมูล -> รันทันทีเช่นกัน
+    if last_run is None or (job["catch_up"] and next_slot(job, last_run) <= now):
+        job["next_run"] = now + random.uniform(0, min(job["jitter"], 5))
+    else:
+        plan_next(job, last_run)
+        if job["next_run"] <= now:
+            plan_next(job, now)
+
+
+def import_agents(names):
+    # import ครั้งเดียวตอนเริ่ม: รอบต่อๆ ไปเรียกฟังก์ชันในโมดูลที่อุ่นอยู่แล้วได้เลย
+    modules = {}
+    for name in names:
+        node = orchestrator.AGENT_GRAPH[name]
+        started = time.perf_counter()
+        try:
+            modules[name] = importlib.import_module(node["module"])
+            print(f"   📦 import {node['module']} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+        except Exception as e:
+            print(f"   ❌ import {node['module']} ไม่สำเร็จ: {e} -> ข้าม agent นี้")
+    return modules
+
+
+def run_job(name, module):
+    started = time.perf_counter()
+    try:
+        orchestrator.call_node(orchestrator.AGENT_GRAPH[name], module)
+        return orchestrator.DONE, time.perf_counter() - started, None
+    except BaseException as e:
+        return orchestrator.FAILED, time.perf_counter() - started, e
+    finally:
+        metrics.observe("scheduled", time.perf_counter() - started, agent=name)
+        metrics.flush()
+
+
+def _fmt(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts else "-"
+
+
+def print_schedule(jobs):
+    print(f"   {'agent':<24} {'ตาราง':<18} {'รอบถัดไป':<20} {'ล่าสุด':<20} สถานะ")
+    for name, job in jobs.items():
+        rule = f"ทุก {job['every']} วิ" if job["every"] else f"cron {job['cron_text']}"
+        print(f"   {name:<24} {rule:<18} {_fmt(job['next_run']):<20} {_fmt(job['last_run']):<20} {job['last_status']}")
+
+
+def run_daemon(only=None, once=False):
+    jobs = load_schedule(only=only)
+    if not jobs:
+        print("🤷‍♂️ ไม่มี agent ที่เปิดใช้ใน config/schedule.json")
+        return
+
+    print(f"\n🗓️  Scheduler: โหลด agent {len(jobs)} ตัวครั้งเดียว ({datetime.now().strftime('%H:%M:%S')})")
+    modules = import_agents(jobs)
+    jobs = {name: job for name, job in jobs.items() if name in modules}
+
+    now = time.time()
+    state = load_state()
+    for name, job in jobs.items():
+        last = state.get(name, {})
+        job["last_run"] = last.get("last_run")
+        job["last_status"] = last.get("last_status", "-")
+        plan_first(job, job["last_run"], now)
+        if once:
+            job["next_run"] = now
+    print_schedule(jobs)
+
+    stop = threading.Event()
+    wake = threading.Event()
+
+    def handle_stop(signum, frame):
+        print("\n🛑 ได้รับสัญญาณหยุด: รอ agent ที่กำลังทำงานให้จบก่อน...")
+        stop.set()
+        wake.set()
+
+    signal.signal(signal.SIGINT, handle_stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_stop)
+
+    def finished(name, future):
+        job = jobs[name]
+        status, elapsed, error = future.result()
+        job["last_status"], job["last_duration"] = status, elapsed
+        print(f"   {status} {name} ({elapsed:.2f}s) รอบถัดไป {_fmt(job['next_run'])}")
+        if error is not None:
+            print(f"   ❌ {name} ล้มเหลว: {error}")
+        wake.set()
+
+    # thread ละ agent: ตัวช้า (เช่นรอ Yahoo) ไม่บล็อกตัวอื่น และแต่ละตัวมีได้ทีละรอบเท่านั้น
+    with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="agent") as pool:
+        while not stop.is_set():
+            now = time.time()
+            for name, job in jobs.items():
+                if job["next_run"] > now:
+                    continue
+                if job["future"] is not None and not job["future"].done():
+                    # รอบก่อนยังไม่จบ -> ข้าม (ถ้า catch_up จะรันทันทีที่รอบก่อนจบ)
+                    metrics.count("skipped_runs", stage="scheduled", agent=name)
+                    print(f"   ⏭️  {name}: รอบก่อนยังไม่จบ ข้ามรอบ {_fmt(job['next_run'])}")
+                    job["pending"] = job["catch_up"]
+                    plan_next(job, now)
+                    continue
+                late = now - job["next_run"]
+                if late > MAX_SLEEP * 2:
+                    print(f"   ⏰ {name}: รันชดเชยรอบที่พลาด (ช้าไป {late:.0f} วินาที)")
+                job["last_run"] = now
+                job["pending"] = False
+                # รอบที่พลาดหลายรอบรวบเป็นครั้งเดียว: รอบถัดไปนับจากตอนนี้
+                plan_next(job, now)
+                job["future"] = pool.submit(run_job, name, modules[name])
+                job["future"].add_done_callback(lambda f, name=name: finished(name, f))
+
+            # รอบที่ถูกข้ามเพราะตัวเก่ายังไม่จบ: รันชดเชยทันทีที่ว่าง
+            for job in jobs.values():
+                if job["pending"] and job["future"].done():
+                    job["next_run"] = now
+
+            try:
+                save_state(jobs)
+            except OSError:
+                pass
+
+            if once:
+                # --once: รันครบทุกตัว 1 รอบแล้วจบ (ไว้ทดสอบตาราง/agent)
+                for job in jobs.values():
+                    if job["future"] is not None:
+                        job["future"].result()
+                break
+
+            soonest = min(job["next_run"] for job in jobs.values())
+            wake.clear()
+            wake.wait(max(0.0, min(MAX_SLEEP, soonest - time.time())))
+
+    save_state(jobs)
+    print("\n🗓️  สรุปสถานะ Scheduler")
+    print_schedule(jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="รัน agent แต่ละตัวตามจังหวะใน config/schedule.json แบบอยู่ยาว")
+    parser.add_argument("agents", nargs="*", help="เลือกเฉพาะบาง agent (ค่าเริ่มต้น: ทุกตัวที่เปิดใช้)")
+    parser.add_argument("--once", action="store_true", help="รันทุกตัว 1 รอบทันทีแล้วจบ")
+    parser.add_argument("--list", action="store_true", help="แสดงตารางรอบถัดไปแล้วจบ (ไม่ import agent)")
+    parser.add_argument("--metrics-port", type=int, help="เปิด endpoint Prometheus ของโปรเซสนี้ที่พอร์ตนี้")
+    args = parser.parse_args()
+
+    if args.list:
+        jobs = load_schedule(only=args.agents or None)
+        state = load_state()
+        for name, job in jobs.items():
+            job["last_run"] = state.get(name, {}).get("last_run")
+            job["last_status"] = state.get(name, {}).get("last_status", "-")
+            plan_first(job, job["last_run"], time.time())
+        print_schedule(jobs)
+        sys.exit(0)
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+        print(f"📡 Prometheus endpoint: http://127.0.0.1:{args.metrics_port}/metrics")
+    run_daemon(only=args.agents or None, once=args.once)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# โมดูลของ agent import กันเองแบบไฟล์ข้างเคียง (รันจากโฟลเดอร์ agents)
+AGENTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agents')
+if AGENTS_DIR not in sys.path:
+    sys.path.insert(0, AGENTS_DIR)
@@ -0,0 +1,53 @@
+import os
+from datetime import datetime
+
+import history_store
+
+
+class _Clock:
+    now_value = datetime(2026, 1, 1, 9, 0)
+
+    @classmethod
+    def now(cls):
+        return cls.now_value
+
+
+def _parts(root):
+    return {d: sorted(f for f in os.listdir(os.path.join(root, d)) if f.endswith(".parquet"))
+            for d in os.listdir(root) if d.startswith("date=")}
+
+
+def test_compacts_on_consecutive_days(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(history_store, "datetime", _Clock)
+    root = os.path.join(str(tmp_path), "spdr_flows")
+
+    # วันที่ 1: บันทึกหลายครั้ง (วันนี้ยังไม่ถูกรวม)
+    _Clock.now_value = datetime(2026, 1, 1, 9, 0)
+    for i in range(3):
+        history_store.append_records("spdr_flows", [{"Date": f"2026-01-01 0{i}:00", "Price": 100 + i, "Status": "BUY"}])
+    assert len(_parts(root)["date=2026-01-01"]) == 3
+
+    # วันที่ 2: บันทึกครั้งแรกของวันรวม part ของวันที่ 1
+    _Clock.now_value = datetime(2026, 1, 2, 9, 0)
+    for i in range(2):
+        history_store.append_records("spdr_flows", [{"Date": f"2026-01-02 0{i}:00", "Price": 200 + i, "Status": "SELL"}])
+    assert len(_parts(root)["date=2026-01-01"]) == 1
+    assert len(_parts(root)["date=2026-01-02"]) == 2
+
+    # วันที่ 3: marker ของวันก่อนอยู่ใน root แล้ว ต้องยังรวมวันที่ 2 ได้
+    _Clock.now_value = datetime(2026, 1, 3, 9, 0)
+    history_store.append_records("spdr_flows", [{"Date": "2026-01-03 00:00", "Price": 300, "Status": "BUY"}])
+    assert len(_parts(root)["date=2026-01-02"]) == 1
+    with open(os.path.join(root, history_store.COMPACT_MARKER), encoding="utf-8") as f:
+        assert f.read() == "2026-01-03"
+
+    frame = history_store.read_history("spdr_flows")
+    assert list(frame["Price"]) == [100, 101, 102, 200, 201, 300]
+
+
+def test_read_history_has_no_partition_column(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_DIR", str(tmp_path))
+    history_store.append_records("spdr_flows", [{"Date": "2026-01-01 00:00", "Price": 1.0, "Status": "BUY"}])
+    assert "date" not in history_store.read_history("spdr_flows").columns
+    assert list(history_store.read_history("spdr_flows", columns=["Price"]).columns) == ["Price"]
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicator_engine
+
+
+def _bars(n, start="2026-01-01", seed=0):
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 5, n))
+    index = pd.date_range(start, periods=n, freq="D")
+    return pd.DataFrame({"High": close + 3, "Low": close - 3, "Close": close}, index=index)
+
+
+def _fresh(bars):
+    state = indicator_engine.new_state("GC=F")
+    return state, indicator_engine.feed_bars(state, bars)
+
+
+def test_nan_bar_is_skipped():
+    bars = _bars(80)
+    broken = bars.copy()
+    broken.iloc[40] = np.nan
+    state, snap = _fresh(broken)
+    _, expected = _fresh(bars.drop(bars.index[40]))
+    assert all(math.isfinite(v) for v in state["sums"].values())
+    for key in ("sma10", "sma50", "ema20", "rsi", "atr"):
+        assert snap[key] == pytest.approx(expected[key])
+
+
+def test_nan_close_is_rejected_by_update():
+    state = indicator_engine.new_state("GC=F")
+    with pytest.raises(ValueError):
+        indicator_engine.update(state, "2026-01-01T00:00:00", 1.0, 1.0, float("nan"))
+    assert state["count"] == 0
+
+
+def test_continuous_history_extends_state():
+    bars = _bars(120)
+    state, _ = _fresh(bars.iloc[:60])
+    snap = indicator_engine.feed_bars(state, bars.iloc[30:])
+    _, expected = _fresh(bars)
+    assert snap["bars"] == 120
+    for key in ("sma10", "sma50", "ema20", "rsi", "atr"):
+        assert snap[key] == pytest.approx(expected[key])
+
+
+def test_gap_after_last_ts_rebuilds_state():
+    bars = _bars(130)
+    state, _ = _fresh(bars.iloc[:60])
+    # ดึงรอบใหม่ไม่มีแท่ง 59..69 -> ต่อกันไม่ได้ ต้องคำนวณใหม่จากชุดนี้
+    snap = indicator_engine.feed_bars(state, bars.iloc[70:])
+    _, expected = _fresh(bars.iloc[70:])
+    assert snap["bars"] == 60
+    for key in ("sma10", "sma50", "ema20", "rsi", "atr"):
+        assert snap[key] == pytest.approx(expected[key])
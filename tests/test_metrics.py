@@ -0,0 +1,69 @@
+import re
+
+import metrics
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+SUFFIXES = {"histogram": ("_bucket", "_sum", "_count"), "summary": ("", "_sum", "_count"), "counter": ("",)}
+
+
+def parse_exposition(text):
+    # ตรวจตามรูปแบบ text exposition: ทุกแถวต้องมี TYPE ของ family ประกาศไว้ก่อน และแถวของ family เดียวกันอยู่ติดกัน
+    # คืน {family: (type, {ชื่อ sample: [ค่า]})}
+    families, current, closed = {}, None, set()
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ", 3)
+            assert name not in families, f"TYPE ซ้ำ: {name}"
+            if current:
+                closed.add(current)
+            families[name], current = (kind, {}), name
+            continue
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"แถวผิดรูปแบบ: {line}"
+        name = match.group(1)
+        family = next((f for f, (kind, _) in families.items()
+                       if any(name == f + s for s in SUFFIXES[kind])), None)
+        assert family is not None, f"ไม่มี TYPE: {line}"
+        assert family == current and family not in closed, f"แถวของ {family} ไม่อยู่ติดกัน"
+        families[family][1].setdefault(name, []).append(float(match.group(3)))
+    return families
+
+
+def _totals():
+    totals = {"timings": {}, "counters": {}}
+    for seconds in (0.02, 0.3, 4.0):
+        metrics._add_timing(totals["timings"], metrics._key("agent_005_spdr", "fetch", "yahoo"),
+                            metrics._bucket_index(seconds), seconds)
+    totals["counters"]["errors|" + metrics._key("agent_005_spdr", "http", "yahoo")] = 2
+    totals["counters"]["rows|" + metrics._key("agent_005_spdr", "persist", "")] = 5
+    return totals
+
+
+def test_render_prometheus_is_valid_exposition():
+    latency = {
+        "query1.finance.yahoo.com/v8": {"count": 3, "errors": 1, "sum": 0.9, "avg": 0.3, "p50": 0.2, "p99": 0.5, "max": 0.5, "last": 0.2},
+        "newsapi.org/v2/everything": {"count": 1, "errors": 0, "sum": 0.4, "avg": 0.4, "p50": 0.4, "p99": 0.4, "max": 0.4, "last": 0.4},
+    }
+    families = parse_exposition(metrics.render_prometheus(_totals(), latency))
+
+    kind, samples = families["gwr_stage_duration_seconds"]
+    assert kind == "histogram"
+    assert samples["gwr_stage_duration_seconds_bucket"][-1] == 3
+    assert samples["gwr_stage_duration_seconds_count"] == [3]
+
+    kind, samples = families["gwr_http_latency_seconds"]
+    assert kind == "summary"
+    assert samples["gwr_http_latency_seconds_sum"] == [0.4, 0.9]
+    assert samples["gwr_http_latency_seconds_count"] == [1, 3]
+
+    assert families["gwr_http_errors_total"] == ("counter", {"gwr_http_errors_total": [0, 1]})
+    assert families["gwr_errors_total"][0] == "counter"
+    assert families["gwr_rows_total"][1] == {"gwr_rows_total": [5]}
+
+
+def test_render_prometheus_without_latency():
+    families = parse_exposition(metrics.render_prometheus(_totals()))
+    assert "gwr_http_latency_seconds" not in families
+    assert "gwr_http_errors_total" not in families